@@ -0,0 +1,211 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+from django.db import connection, transaction
+from django.utils import timezone
+
+from config.apps.search.outbox import update_index
+
+from .models import WalletActivity
+
+_buffer = ContextVar("wallet_activity_buffer", default=None)
+
+
+def buffer_activity(activity):
+    """
+    Queue an unsaved activity in the current buffer. Returns False when no
+    buffer is open, in which case the caller saves the activity itself.
+    """
+    pending = _buffer.get()
+    if pending is None:
+        return False
+    pending.append(activity)
+    return True
+
+
+@contextmanager
+def buffered_activities():
+    """
+    Collect the activities logged inside the block and write them with one
+    bulk INSERT when it exits.
+
+    The block runs in a transaction and the buffer is flushed before it
+    commits, so the activities commit with the balance changes they record
+    and are discarded with them on error. Nested blocks join the outer
+    buffer. Yields the list of queued activities.
+    """
+    pending = _buffer.get()
+    if pending is not None:
+        yield pending
+        return
+
+    pending = []
+    token = _buffer.set(pending)
+    try:
+        with transaction.atomic():
+            yield pending
+            _buffer.reset(token)
+            token = None
+            flush(pending)
+    finally:
+        if token is not None:
+            _buffer.reset(token)
+
+
+def flush(activities):
+    """
+    Bulk create queued activities and queue them for reindexing.
+    """
+    if not activities:
+        return []
+    created = WalletActivity.objects.bulk_create(activities)
+    update_index(WalletActivity, created)
+    return created
+
+
+def _month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def _partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def is_partitioned(table=None):
+    """
+    Whether the activity table is a partitioned PostgreSQL table.
+    """
+    if connection.vendor != "postgresql":
+        return False
+    table = table or WalletActivity._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)",
+            [connection.ops.quote_name(table)],
+        )
+        row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def _create_partition(cursor, table, name, bounds, has_default):
+    quote_name = connection.ops.quote_name
+    if not has_default:
+        cursor.execute(
+            f"CREATE TABLE {quote_name(name)} PARTITION OF {quote_name(table)} "
+            "FOR VALUES FROM (%s) TO (%s)",
+            bounds,
+        )
+        return
+
+    default = quote_name(f"{table}_default")
+    cursor.execute(f"LOCK TABLE {default} IN ACCESS EXCLUSIVE MODE")
+    cursor.execute(
+        f"CREATE TABLE {quote_name(name)} (LIKE {quote_name(table)} INCLUDING DEFAULTS)"
+    )
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {default} "
+        "WHERE timestamp >= %s AND timestamp < %s RETURNING *) "
+        f"INSERT INTO {quote_name(name)} SELECT * FROM moved",
+        bounds,
+    )
+    cursor.execute(
+        f"ALTER TABLE {quote_name(table)} ATTACH PARTITION {quote_name(name)} "
+        "FOR VALUES FROM (%s) TO (%s)",
+        bounds,
+    )
+
+
+@transaction.atomic
+def ensure_partitions(ahead=3, start=None):
+    """
+    Create the monthly partitions of the activity table from ``start`` (the
+    current month by default) up to ``ahead`` months later. Existing
+    partitions are left alone. Returns the names of the partitions created.
+
+    PostgreSQL refuses a new partition while the default partition holds
+    rows in its range, so those rows are moved into the new table before it
+    is attached.
+    """
+    table = WalletActivity._meta.db_table
+    quote_name = connection.ops.quote_name
+    month = _month_start(start or timezone.now().date())
+    last = _month_start(timezone.now().date()) + relativedelta(months=ahead)
+    created = []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [quote_name(f"{table}_default")])
+        has_default = cursor.fetchone()[0] is not None
+        while month <= last:
+            name = _partition_name(table, month)
+            bounds = [month, month + relativedelta(months=1)]
+            cursor.execute("SELECT to_regclass(%s)", [quote_name(name)])
+            if cursor.fetchone()[0] is None:
+                _create_partition(cursor, table, name, bounds, has_default)
+                created.append(name)
+            month += relativedelta(months=1)
+    return created
+
+
+@transaction.atomic
+def partition_table(ahead=3, keep_legacy=False):
+    """
+    Convert the activity table to an append-only table partitioned by month
+    on ``timestamp``.
+
+    The existing rows are copied into the new layout in one transaction.
+    The primary key becomes ``(id, timestamp)`` as PostgreSQL requires the
+    partition key in it; ids keep coming from the same identity sequence.
+    Rows outside the monthly partitions land in a default partition, out
+    of which ``ensure_partitions`` moves them once their month is created.
+    Returns the names of the partitions created.
+    """
+    table = WalletActivity._meta.db_table
+    legacy = f"{table}_legacy"
+    quote_name = connection.ops.quote_name
+    wallet_table = WalletActivity._meta.get_field("wallet").related_model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {quote_name(table)} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"SELECT MIN(timestamp), MAX(id) FROM {quote_name(table)}")
+        first, last_id = cursor.fetchone()
+        cursor.execute(
+            f"ALTER TABLE {quote_name(table)} RENAME TO {quote_name(legacy)}"
+        )
+        cursor.execute(
+            f"ALTER INDEX {quote_name('wallet_activity_recent_idx')} "
+            f"RENAME TO {quote_name('wallet_activity_recent_idx_legacy')}"
+        )
+        cursor.execute(
+            f"CREATE TABLE {quote_name(table)} (LIKE {quote_name(legacy)} "
+            "INCLUDING DEFAULTS INCLUDING IDENTITY) PARTITION BY RANGE (timestamp)"
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote_name(table)} ADD PRIMARY KEY (id, timestamp)"
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote_name(table)} ADD FOREIGN KEY (wallet_id) "
+            f"REFERENCES {quote_name(wallet_table)} (id) DEFERRABLE INITIALLY DEFERRED"
+        )
+        cursor.execute(
+            f"CREATE INDEX {quote_name('wallet_activity_recent_idx')} "
+            f"ON {quote_name(table)} (wallet_id, timestamp DESC, id DESC)"
+        )
+        cursor.execute(
+            f"CREATE TABLE {quote_name(table + '_default')} "
+            f"PARTITION OF {quote_name(table)} DEFAULT"
+        )
+
+    created = ensure_partitions(ahead=ahead, start=first and first.date())
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote_name(table)} SELECT * FROM {quote_name(legacy)}"
+        )
+        if last_id is not None:
+            cursor.execute(
+                "SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)",
+                [quote_name(table), last_id],
+            )
+        if not keep_legacy:
+            cursor.execute(f"DROP TABLE {quote_name(legacy)}")
+    return created
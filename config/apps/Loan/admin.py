@@ -1,8 +1,20 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import Loan, Wallet, WalletActivity
+from .models import (
+    BalanceSnapshot,
+    Installment,
+    LedgerAccount,
+    LedgerEntry,
+    Loan,
+    Wallet,
+    WalletActivity,
+)
 
 admin.site.register(Wallet)
 admin.site.register(Loan)
 admin.site.register(WalletActivity)
+admin.site.register(Installment)
+admin.site.register(LedgerAccount)
+admin.site.register(LedgerEntry)
+admin.site.register(BalanceSnapshot)
@@ -6,6 +6,4 @@ class LoarnConfig(AppConfig):
     name = "config.apps.Loan"
 
     def ready(self):
-        from . import signals
-
-        print(signals)
+        from . import metrics, signals  # noqa: F401
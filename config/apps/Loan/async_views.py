@@ -0,0 +1,240 @@
+import asyncio
+import hashlib
+import weakref
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import quote_etag
+from django.views import View
+from django_filters.filterset import filterset_factory
+from django_filters.rest_framework import FilterSet
+from django_filters.utils import translate_validation
+from elasticsearch.dsl import AsyncSearch
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    NotAuthenticated,
+    NotFound,
+)
+from rest_framework.renderers import JSONRenderer
+
+from config.apps.authantification.models import User
+
+from .cache import (
+    aget,
+    aget_cache_version,
+    arecord_cache_event,
+    aset,
+    etag_matches,
+    list_cache_key,
+    token_cache_key,
+    user_scope,
+)
+from .documents import LoanDocument
+from .models import Loan
+from .pagination import LoanCursorPagination
+from .serializers import LoanSerializer
+from .views import LoanSearchAPIView, LoanViewSet
+
+
+class Busy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many requests in flight, try again shortly."
+    default_code = "busy"
+
+
+class Slots:
+    """
+    At most ``setting`` concurrent holders per event loop.
+
+    A request waits up to ``ASYNC_QUEUE_TIMEOUT`` seconds for a free slot and
+    is then turned away with a 503, so a slow backend makes requests fail
+    fast instead of piling up in the worker.
+    """
+
+    def __init__(self, setting):
+        self.setting = setting
+        self.semaphores = weakref.WeakKeyDictionary()
+
+    @asynccontextmanager
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self.semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self.semaphores[loop] = asyncio.Semaphore(
+                getattr(settings, self.setting)
+            )
+        try:
+            await asyncio.wait_for(semaphore.acquire(), settings.ASYNC_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise Busy()
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+
+search_slots = Slots("ASYNC_SEARCH_CONCURRENCY")
+database_slots = Slots("ASYNC_DB_CONCURRENCY")
+
+
+async def authenticate(request):
+    """
+    The user of a request from its API token, else from its session.
+
+    Token lookups are cached for ``ASYNC_AUTH_CACHE_SECONDS``, so a cached
+    request needs no database call. The user is returned unsaved with only
+    its id and staff flag, which is all the async views read.
+    """
+    keyword, _, key = request.headers.get("Authorization", "").partition(" ")
+    if keyword != "Token":
+        async with database_slots.acquire():
+            user = await request.auser()
+        if not user.is_authenticated:
+            raise NotAuthenticated()
+        return user
+
+    cache_key = token_cache_key(key)
+    cached = await aget(cache_key)
+    if cached is None:
+        async with database_slots.acquire():
+            token = await Token.objects.select_related("user").filter(key=key).afirst()
+        if token is None or not token.user.is_active:
+            raise AuthenticationFailed("Invalid token.")
+        cached = (token.user_id, token.user.is_staff)
+        await aset(cache_key, cached, settings.ASYNC_AUTH_CACHE_SECONDS)
+    user_id, is_staff = cached
+    return User(id=user_id, is_staff=is_staff)
+
+
+class AsyncAPIView(View):
+    """
+    Base of the async read-only endpoints.
+
+    Requests are authenticated like the DRF views, from a token or the
+    session, and data and API errors are rendered as the DRF views render
+    them in JSON, so clients can switch between the two.
+    """
+
+    http_method_names = ["get"]
+
+    async def dispatch(self, request, *args, **kwargs):
+        # The pagination and search helpers shared with the DRF views read
+        # query_params.
+        request.query_params = request.GET
+        try:
+            request.user = await authenticate(request)
+            response = await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            detail = exc.detail
+            if not isinstance(detail, (list, dict)):
+                detail = {"detail": detail}
+            response = self.render(detail, exc.status_code)
+            if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+                response["WWW-Authenticate"] = "Token"
+            if isinstance(exc, Busy):
+                response["Retry-After"] = "1"
+        patch_vary_headers(response, ["Accept", "Authorization"])
+        return response
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(
+            JSONRenderer().render(data),
+            content_type="application/json",
+            status=status_code,
+        )
+
+    def get_queryset(self, request):
+        queryset = Loan.objects.prefetch_related("installments")
+        if request.user.is_staff:
+            return queryset
+        return queryset.filter(client_id=request.user.id)
+
+
+class AsyncLoanSearchView(AsyncAPIView):
+    """
+    ``LoanSearchAPIView`` on the async Elasticsearch client; the event loop
+    serves other requests while Elasticsearch answers.
+    """
+
+    search_view = LoanSearchAPIView()
+
+    async def get(self, request):
+        params = self.search_view.get_params(request.query_params)
+        search = self.search_view.get_search(params, request.user)
+        search = AsyncSearch(
+            index=LoanDocument._index._name, doc_type=[LoanDocument]
+        ).update_from_dict(search.to_dict())
+        async with search_slots.acquire():
+            response = await search.execute()
+        return self.render(self.search_view.get_results(request, params, response))
+
+
+class AsyncLoanListView(AsyncAPIView):
+    """
+    The loan list, filtered like ``LoanViewSet`` and paginated with keyset
+    cursors, which need no ``COUNT(*)``.
+
+    Responses are cached in the generations of the loan list cache, so the
+    same writes invalidate them; a cached page is served without touching
+    the database.
+    """
+
+    filterset_class = filterset_factory(
+        Loan, filterset=FilterSet, fields=LoanViewSet.filterset_fields
+    )
+
+    async def get(self, request):
+        prefix = LoanViewSet.list_cache_prefix
+        scope = f"{prefix}:{user_scope(request.user)}"
+        cache_key = list_cache_key(
+            scope, await aget_cache_version(scope), "async", request.GET
+        )
+        cached = await aget(cache_key)
+        if cached is None:
+            await arecord_cache_event(prefix, "miss")
+            response = self.render(await self.get_page(request))
+            etag = quote_etag(
+                hashlib.md5(response.content, usedforsecurity=False).hexdigest()
+            )
+            await aset(
+                cache_key,
+                (response.content, response["Content-Type"], etag),
+                LoanViewSet.list_cache_timeout,
+            )
+            x_cache = "MISS"
+        else:
+            await arecord_cache_event(prefix, "hit")
+            content, content_type, etag = cached
+            response = HttpResponse(content, content_type=content_type)
+            x_cache = "HIT"
+
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        response["ETag"] = etag
+        response["X-Cache"] = x_cache
+        return response
+
+    async def get_page(self, request):
+        filterset = self.filterset_class(
+            request.GET, queryset=self.get_queryset(request)
+        )
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+        paginator = LoanCursorPagination()
+        async with database_slots.acquire():
+            page = await paginator.apaginate_queryset(filterset.qs, request)
+        return paginator.get_paginated_data(LoanSerializer(page, many=True).data)
+
+
+class AsyncLoanDetailView(AsyncAPIView):
+    async def get(self, request, id):
+        async with database_slots.acquire():
+            loan = await self.get_queryset(request).filter(id=id).afirst()
+        if loan is None:
+            raise NotFound("No Loan matches the given query.")
+        return self.render(LoanSerializer(loan).data)
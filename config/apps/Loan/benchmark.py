@@ -0,0 +1,291 @@
+import random
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from elasticsearch.dsl import async_connections
+from elasticsearch.dsl.connections import connections
+from rest_framework.test import APIClient
+
+from config.apps.authantification.models import User
+from config.apps.search.fake import FakeAsyncElasticsearch, FakeElasticsearch
+
+from .documents import LoanDocument
+from .models import Loan, Wallet, WalletActivity
+
+# Latency regressions beyond this share of the baseline fail a comparison;
+# query counts are deterministic and may not grow at all.
+DEFAULT_TOLERANCE = 0.2
+
+
+def seed(users=100, loans_per_user=5, activities_per_wallet=20, seed=0):
+    """
+    Bulk create a staff user and ``users`` clients with a funded wallet,
+    loans in every status and wallet activities. Returns the staff user.
+    """
+    rng = random.Random(seed)
+    password = make_password("benchmark")
+    staff = User.objects.create(
+        username="bench-staff",
+        email="bench-staff@example.com",
+        password=password,
+        is_staff=True,
+    )
+    clients = User.objects.bulk_create(
+        [
+            User(
+                username=f"bench-{index}",
+                email=f"bench-{index}@example.com",
+                password=password,
+            )
+            for index in range(users)
+        ]
+    )
+    wallets = Wallet.objects.bulk_create(
+        [Wallet(user=user, balance=Decimal("1000000.00")) for user in [staff, *clients]]
+    )
+
+    today = timezone.now().date()
+    statuses = [
+        Loan.Status.PENDING,
+        Loan.Status.IN_PROGRESS,
+        Loan.Status.REPAID,
+        Loan.Status.OVERDUE,
+    ]
+    loans = []
+    for user in clients:
+        for _ in range(loans_per_user):
+            loan = Loan(
+                client=user,
+                amount=Decimal(rng.randrange(100, 10_000)),
+                interest_rate=rng.choice([5.0, 7.5, 10.5, 12.0]),
+                duration_months=rng.choice([6, 12, 24]),
+                start_date=today - timezone.timedelta(days=rng.randrange(0, 720)),
+                status=rng.choice(statuses),
+                description=rng.choice(["car", "house", "school", "business"]),
+            )
+            loan.total_amount = loan.total_amount_to_pay()
+            loans.append(loan)
+    Loan.objects.bulk_create(loans, batch_size=1000)
+
+    WalletActivity.objects.bulk_create(
+        [
+            WalletActivity.build(
+                wallet, rng.choice(["add", "subtract"]), Decimal(rng.randrange(1, 500))
+            )
+            for wallet in wallets
+            for _ in range(activities_per_wallet)
+        ],
+        batch_size=2000,
+    )
+    return staff
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    ordered = sorted(values)
+    rank = max(int(round(fraction * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class Scenario:
+    """
+    One endpoint call. ``setup`` prepares state outside the measured time,
+    then ``request`` returns the method, path and payload of the call.
+    """
+
+    def __init__(self, name, request, setup=None):
+        self.name = name
+        self.request = request
+        self.setup = setup
+
+
+def scenarios(staff):
+    """
+    The benchmarked hot paths, driven as the staff user.
+    """
+    wallet = staff.wallet
+    client = User.objects.filter(is_staff=False).order_by("id").first()
+    loan_ids = list(Loan.objects.order_by("id").values_list("id", flat=True))
+    rng = random.Random(0)
+    pending = []
+
+    def create_pending_loan():
+        pending.append(
+            Loan.objects.create(
+                client=client, amount=Decimal("1000.00"), duration_months=12
+            ).id
+        )
+
+    def approve():
+        return "post", f"/loans/{pending.pop()}/approve/", None
+
+    return {
+        scenario.name: scenario
+        for scenario in [
+            Scenario("loans.list", lambda: ("get", "/loans/", None), cache.clear),
+            Scenario("loans.list.cached", lambda: ("get", "/loans/", None)),
+            Scenario(
+                "loans.retrieve",
+                lambda: ("get", f"/loans/{rng.choice(loan_ids)}/", None),
+            ),
+            Scenario("loans.approve", approve, create_pending_loan),
+            Scenario(
+                "wallets.add_balance",
+                lambda: (
+                    "post",
+                    f"/wallets/{wallet.id}/add_balance/",
+                    {"amount": "10.00"},
+                ),
+            ),
+            Scenario(
+                "wallets.subtract_balance",
+                lambda: (
+                    "post",
+                    f"/wallets/{wallet.id}/subtract_balance/",
+                    {"amount": "10.00"},
+                ),
+            ),
+            Scenario(
+                "loans.search",
+                lambda: ("get", "/api/loans/search/?status=PENDING&page_size=20", None),
+            ),
+        ]
+    }
+
+
+@contextmanager
+def fake_elasticsearch():
+    """
+    Serve the loan index from a FakeElasticsearch filled with every loan, to
+    the sync and the async clients.
+    """
+    fake = FakeElasticsearch()
+    fake.index_documents(LoanDocument, Loan.objects.all())
+    clients = [
+        (connections, fake),
+        (async_connections.connections, FakeAsyncElasticsearch(fake)),
+    ]
+    previous = []
+    for registry, client in clients:
+        try:
+            previous.append(registry.get_connection())
+        except KeyError:
+            previous.append(None)
+        registry.add_connection("default", client)
+    try:
+        yield fake
+    finally:
+        for (registry, _), client in zip(clients, previous):
+            registry.remove_connection("default")
+            if client is not None:
+                registry.add_connection("default", client)
+
+
+def _prepare(scenario):
+    if scenario.setup:
+        scenario.setup()
+    return scenario.request()
+
+
+def _call(client, scenario, request):
+    method, path, data = request
+    response = getattr(client, method)(
+        path, data, format="json", HTTP_ACCEPT="application/json"
+    )
+    if response.status_code >= 400:
+        raise RuntimeError(
+            f"{scenario.name}: {method.upper()} {path} returned "
+            f"{response.status_code}"
+        )
+    return response
+
+
+def measure(client, scenario, iterations, warmup=5, allocations=False):
+    """
+    Drive a scenario and summarise its latency, queries and allocations.
+
+    Latencies and query counts come from one pass; allocation peaks are
+    traced in a separate, shorter pass as tracing slows every call down.
+    """
+    for _ in range(warmup):
+        _call(client, scenario, _prepare(scenario))
+
+    latencies, queries = [], []
+    for _ in range(iterations):
+        request = _prepare(scenario)
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            _call(client, scenario, request)
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured.captured_queries))
+
+    result = {
+        "iterations": iterations,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "queries": max(queries),
+    }
+
+    if allocations:
+        peaks = []
+        tracemalloc.start()
+        try:
+            for _ in range(max(iterations // 10, 1)):
+                request = _prepare(scenario)
+                tracemalloc.reset_peak()
+                baseline, _ = tracemalloc.get_traced_memory()
+                _call(client, scenario, request)
+                peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        finally:
+            tracemalloc.stop()
+        result["alloc_peak_kib"] = round(percentile(peaks, 0.50) / 1024, 1)
+    return result
+
+
+def run(staff, names=None, iterations=200, warmup=5, allocations=False):
+    """
+    Run the named scenarios, all by default, and return their results.
+    """
+    available = scenarios(staff)
+    client = APIClient()
+    client.force_authenticate(staff)
+    results = {}
+    with fake_elasticsearch():
+        for name in names or available:
+            results[name] = measure(
+                client, available[name], iterations, warmup, allocations
+            )
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Regressions of ``results`` against a baseline run: a p95 latency more
+    than ``tolerance`` above the baseline, or any extra query.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result["queries"] > before["queries"]:
+            regressions.append(
+                f"{name}: {result['queries']} queries, baseline {before['queries']}"
+            )
+        if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {result['p95_ms']}ms, baseline {before['p95_ms']}ms"
+            )
+    return regressions
@@ -0,0 +1,275 @@
+import asyncio
+import hashlib
+import weakref
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+
+STAFF_SCOPE = "all"
+
+
+def user_scope(user):
+    """
+    Cache scope of a user: staff share the unfiltered scope, everybody else
+    only sees their own rows.
+    """
+    if user.is_staff:
+        return STAFF_SCOPE
+    return f"user:{user.pk}"
+
+
+def _version_key(scope):
+    return f"cache_version:{scope}"
+
+
+def get_cache_version(scope):
+    """
+    Current generation of a cache scope.
+    """
+    return cache.get_or_set(_version_key(scope), 1, timeout=None)
+
+
+def bump_cache_version(scope):
+    """
+    Invalidate every cached entry of a scope in O(1) by moving to the next
+    generation; stale entries are never read again and simply expire.
+    """
+    try:
+        cache.incr(_version_key(scope))
+    except ValueError:
+        cache.add(_version_key(scope), 2, timeout=None)
+
+
+def invalidate_list_cache(key_prefix, user_ids):
+    """
+    Invalidate the cached lists of the given users and the staff list.
+    """
+    for user_id in set(user_ids):
+        bump_cache_version(f"{key_prefix}:user:{user_id}")
+    bump_cache_version(f"{key_prefix}:{STAFF_SCOPE}")
+
+
+# The async views read and write the entries of the sync views. Django's
+# async cache methods run the sync ones in a thread, so on Redis they talk
+# to the server directly, with the keys and encoding of django_redis.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _async_redis():
+    """
+    A ``redis.asyncio`` client on the server of the default cache, one per
+    event loop, or None when the default cache is not Redis.
+    """
+    config = settings.CACHES["default"]
+    if config["BACKEND"] != "django_redis.cache.RedisCache":
+        return None
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        from redis import asyncio as aioredis
+
+        location = config["LOCATION"]
+        if not isinstance(location, str):
+            location = location[0]
+        client = _async_clients[loop] = aioredis.Redis.from_url(location)
+    return client
+
+
+async def aget(key):
+    client = _async_redis()
+    if client is None:
+        return await cache.aget(key)
+    value = await client.get(cache.make_key(key))
+    return None if value is None else cache.client.decode(value)
+
+
+async def aset(key, value, timeout):
+    client = _async_redis()
+    if client is None:
+        return await cache.aset(key, value, timeout)
+    await client.set(cache.make_key(key), cache.client.encode(value), ex=timeout)
+
+
+async def _aincr(key, delta=1):
+    client = _async_redis()
+    if client is None:
+        try:
+            await cache.aincr(key, delta)
+        except ValueError:
+            if not await cache.aadd(key, delta, timeout=None):
+                await cache.aincr(key, delta)
+        return
+    await client.incrby(cache.make_key(key), delta)
+
+
+async def aget_cache_version(scope):
+    """
+    ``get_cache_version`` for async code.
+    """
+    client = _async_redis()
+    if client is None:
+        return await cache.aget_or_set(_version_key(scope), 1, timeout=None)
+    key = cache.make_key(_version_key(scope))
+    version = await client.get(key)
+    if version is None:
+        await client.set(key, 1, nx=True)
+        version = await client.get(key)
+    return cache.client.decode(version)
+
+
+def list_cache_key(scope, version, variant, query_params):
+    """
+    Cache key of a list response: its scope and generation, the variant of
+    the endpoint rendering it and the query parameters.
+    """
+    query = urlencode(sorted(query_params.lists()), doseq=True)
+    digest = hashlib.md5(
+        f"{variant}?{query}".encode(), usedforsecurity=False
+    ).hexdigest()
+    return f"list_response:{scope}:v{version}:{digest}"
+
+
+def token_cache_key(key):
+    """
+    Cache key of an API token looked up by the async views.
+    """
+    return f"auth_token:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def _incr(key, delta=1):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+def record_cache_event(key_prefix, event):
+    """
+    Count a cache ``hit`` or ``miss`` for a list endpoint.
+    """
+    _incr(f"cache_stats:{key_prefix}:{event}")
+
+
+async def arecord_cache_event(key_prefix, event):
+    await _aincr(f"cache_stats:{key_prefix}:{event}")
+
+
+def get_cache_stats(key_prefixes):
+    """
+    Hit and miss counters of the given list endpoints.
+    """
+    keys = {
+        f"cache_stats:{prefix}:{event}": (prefix, event)
+        for prefix in key_prefixes
+        for event in ("hit", "miss")
+    }
+    values = cache.get_many(keys)
+    stats = {prefix: {"hit": 0, "miss": 0} for prefix in key_prefixes}
+    for key, (prefix, event) in keys.items():
+        stats[prefix][event] = values.get(key, 0)
+    return stats
+
+
+def record_task_timing(task_name, state, elapsed):
+    """
+    Count a finished background task and add its run time in milliseconds.
+    """
+    _incr(f"task_stats:{task_name}:{state}")
+    _incr(f"task_stats:{task_name}:ms", int(elapsed * 1000))
+
+
+def get_task_stats(task_names, states=("SUCCESS", "FAILURE")):
+    """
+    Run counts per state and total run time of the given tasks.
+    """
+    keys = {
+        f"task_stats:{name}:{field}": (name, field)
+        for name in task_names
+        for field in (*states, "ms")
+    }
+    values = cache.get_many(keys)
+    stats = {name: {field: 0 for field in (*states, "ms")} for name in task_names}
+    for key, (name, field) in keys.items():
+        stats[name][field] = values.get(key, 0)
+    return stats
+
+
+def etag_matches(request, etag):
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return "*" in etags or etag in etags
+
+
+class CachedListMixin:
+    """
+    Cache rendered ``list`` responses of a viewset.
+
+    Entries are keyed on the user scope and its generation, the query
+    parameters (filters, page, ordering) and the renderer, and hold the
+    rendered bytes with an ETag so conditional requests get a 304. Only JSON
+    responses are cached; the browsable API embeds per-request CSRF tokens.
+    """
+
+    list_cache_prefix = None
+    list_cache_timeout = 60 * 15
+
+    def get_list_cache_scope(self, request):
+        return f"{self.list_cache_prefix}:{user_scope(request.user)}"
+
+    def get_list_cache_key(self, request):
+        scope = self.get_list_cache_scope(request)
+        return list_cache_key(
+            scope,
+            get_cache_version(scope),
+            request.accepted_renderer.format,
+            request.query_params,
+        )
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != "json":
+            return super().list(request, *args, **kwargs)
+
+        cache_key = self.get_list_cache_key(request)
+        cached = cache.get(cache_key)
+        if cached is None:
+            record_cache_event(self.list_cache_prefix, "miss")
+            self._list_cache_key = cache_key
+            return super().list(request, *args, **kwargs)
+
+        record_cache_event(self.list_cache_prefix, "hit")
+        content, content_type, etag = cached
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type=content_type)
+        response["ETag"] = etag
+        response["X-Cache"] = "HIT"
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        cache_key = getattr(self, "_list_cache_key", None)
+        if cache_key is not None and response.status_code == 200:
+            response.render()
+            etag = quote_etag(
+                hashlib.md5(response.content, usedforsecurity=False).hexdigest()
+            )
+            cache.set(
+                cache_key,
+                (response.content, response["Content-Type"], etag),
+                self.list_cache_timeout,
+            )
+            if etag_matches(request, etag):
+                response = HttpResponseNotModified()
+            response["ETag"] = etag
+            response["X-Cache"] = "MISS"
+        if self.action == "list":
+            patch_vary_headers(response, ["Accept", "Authorization"])
+        return response
@@ -1,56 +1,74 @@
 # documents.py
 
-from django_elasticsearch_dsl import Document
+from django_elasticsearch_dsl import Document, fields
 from django_elasticsearch_dsl.registries import registry
 
 from .models import Loan, Wallet, WalletActivity
 
 
+class IndexedDocument(Document):
+    """
+    Document base that keeps the field preparers on the instance.
+
+    elasticsearch.dsl 9 routes attribute writes whose class attribute has no
+    setter into the document body, so the ``_prepared_fields`` assigned by
+    django_elasticsearch_dsl never shadows the empty class default and every
+    document would be indexed with an empty ``_source``. The stray entries
+    are moved out of the body too, or search hits would serialize them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in ("_prepared_fields", "_related_instance_to_ignore"):
+            object.__setattr__(self, name, self._d_.pop(name, None))
+        object.__setattr__(self, "_prepared_fields", self.init_prepare())
+
+
 @registry.register_document
-class LoanDocument(Document):
+class LoanDocument(IndexedDocument):
+    id = fields.LongField()
+    client = fields.LongField(attr="client_id")
+    amount = fields.ScaledFloatField(scaling_factor=100)
+    interest_rate = fields.FloatField()
+    status = fields.KeywordField()
+    description = fields.TextField()
+    penalty_rate = fields.FloatField()
+    start_date = fields.DateField()
+
     class Index:
-        # Name of the Elasticsearch index
+        # Alias of the Elasticsearch index; the reindex command builds
+        # versioned indexes behind it
         name = "loans"
         # Do not specify shards or replicas for serverless Elasticsearch
         settings = {}
 
     class Django:
         model = Loan  # The model associated with this Document
-        # The fields of the model you want to be indexed in Elasticsearch
-        fields = [
-            "amount",
-            "interest_rate",
-            "status",
-            "description",
-            "penalty_rate",
-        ]
 
 
 @registry.register_document
-class WalletDocument(Document):
+class WalletDocument(IndexedDocument):
+    wallet_type = fields.KeywordField()
+    balance = fields.ScaledFloatField(scaling_factor=100)
+    notifications_enabled = fields.BooleanField()
+
     class Index:
         name = "wallets"
         settings = {}
 
     class Django:
         model = Wallet
-        fields = [
-            "wallet_type",
-            "balance",
-            "notifications_enabled",
-        ]
 
 
 @registry.register_document
-class WalletActivityDocument(Document):
+class WalletActivityDocument(IndexedDocument):
+    activity_type = fields.KeywordField()
+    amount = fields.ScaledFloatField(scaling_factor=100)
+    timestamp = fields.DateField()
+
     class Index:
         name = "wallet_activities"
         settings = {}
 
     class Django:
         model = WalletActivity
-        fields = [
-            "activity_type",
-            "amount",
-            "timestamp",
-        ]
@@ -0,0 +1,292 @@
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import (
+    Case,
+    DecimalField,
+    F,
+    Max,
+    OuterRef,
+    ProtectedError,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import BalanceSnapshot, LedgerAccount, LedgerEntry
+
+MONEY = DecimalField(max_digits=20, decimal_places=2)
+ZERO = Value(Decimal("0.00"), output_field=MONEY)
+
+
+class HasLedgerHistory(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "This object has ledger entries and cannot be deleted."
+    default_code = "has_ledger_history"
+
+
+class LedgerProtectedDestroyMixin:
+    """
+    Answer a delete blocked by ledger accounts, which protect the wallets
+    and loans they belong to, with a 409 instead of a server error.
+    """
+
+    def perform_destroy(self, instance):
+        try:
+            with transaction.atomic():
+                super().perform_destroy(instance)
+        except ProtectedError:
+            raise HasLedgerHistory()
+
+
+_system_accounts = {}
+
+
+def system_account(kind):
+    """
+    The shared fee income or external funds account. They are opened with
+    the ledger and keep no running balance, so each process reads them once.
+    """
+    account = _system_accounts.get(kind)
+    if account is None:
+        account, created = LedgerAccount.objects.get_or_create(
+            kind=kind, wallet=None, loan=None
+        )
+        # An account created here could still be rolled back with the caller.
+        if not created:
+            _system_accounts[kind] = account
+    return account
+
+
+def _accounts_for(kind, field, objects):
+    def read(ids):
+        return {
+            getattr(account, f"{field}_id"): account
+            for account in LedgerAccount.objects.filter(**{f"{field}_id__in": ids})
+        }
+
+    ids = {obj.pk for obj in objects}
+    accounts = read(ids)
+    missing = ids - accounts.keys()
+    if missing:
+        LedgerAccount.objects.bulk_create(
+            [LedgerAccount(kind=kind, **{f"{field}_id": pk}) for pk in missing],
+            ignore_conflicts=True,
+        )
+        accounts.update(read(missing))
+    return accounts
+
+
+def wallet_accounts(wallets):
+    """
+    Ledger accounts of the given wallets keyed by wallet id, created as needed.
+    """
+    return _accounts_for(LedgerAccount.Kind.WALLET, "wallet", wallets)
+
+
+def loan_accounts(loans):
+    """
+    Receivable accounts of the given loans keyed by loan id, created as needed.
+    """
+    return _accounts_for(LedgerAccount.Kind.LOAN_RECEIVABLE, "loan", loans)
+
+
+def post(entries, chunk_size=500):
+    """
+    Write journal entries and apply them to the running account balances.
+
+    Entries are bulk created and every touched account is updated with one
+    set-based UPDATE per chunk, so a batch costs the same number of queries
+    whatever its size. Must run inside the transaction that made the change
+    the entries record. Returns the created entries.
+    """
+    if not entries:
+        return []
+    created = LedgerEntry.objects.bulk_create(entries)
+    deltas = defaultdict(Decimal)
+    for entry in entries:
+        for account, side in ((entry.credit_account, 1), (entry.debit_account, -1)):
+            if account.tracks_balance:
+                deltas[account.pk] += side * account.sign * entry.amount
+    account_ids = [pk for pk, delta in deltas.items() if delta]
+    for start in range(0, len(account_ids), chunk_size):
+        chunk = account_ids[start : start + chunk_size]
+        LedgerAccount.objects.filter(pk__in=chunk).update(
+            balance=F("balance")
+            + Case(
+                *[When(pk=pk, then=Value(deltas[pk])) for pk in chunk],
+                output_field=MONEY,
+            )
+        )
+    return created
+
+
+def deposit(wallet, amount):
+    """
+    Journal funds added to a wallet from outside the ledger.
+    """
+    return post(
+        [
+            LedgerEntry(
+                kind=LedgerEntry.Kind.DEPOSIT,
+                debit_account=system_account(LedgerAccount.Kind.EXTERNAL),
+                credit_account=wallet_accounts([wallet])[wallet.pk],
+                amount=amount,
+            )
+        ]
+    )
+
+
+def withdraw(wallet, amount):
+    """
+    Journal funds taken out of a wallet.
+    """
+    return post(
+        [
+            LedgerEntry(
+                kind=LedgerEntry.Kind.WITHDRAWAL,
+                debit_account=wallet_accounts([wallet])[wallet.pk],
+                credit_account=system_account(LedgerAccount.Kind.EXTERNAL),
+                amount=amount,
+            )
+        ]
+    )
+
+
+def _entry_total(side, since=None, until=None):
+    entries = LedgerEntry.objects.filter(**{side: OuterRef("pk")})
+    if since is not None:
+        entries = entries.filter(created_at__gt=since)
+    if until is not None:
+        entries = entries.filter(created_at__lte=until)
+    total = entries.order_by().values(side).annotate(total=Sum("amount"))
+    return Coalesce(Subquery(total.values("total")), ZERO, output_field=MONEY)
+
+
+def expected_balance(since=None, until=None):
+    """
+    Balance of each account computed from the ledger: its snapshot at
+    ``since`` (or zero) plus the entries created after it, up to ``until``.
+    Each account is one indexed range sum per side, so the expression can
+    annotate every account in a single statement.
+    """
+    credits = _entry_total("credit_account", since, until)
+    debits = _entry_total("debit_account", since, until)
+    base = ZERO
+    if since is not None:
+        snapshot = BalanceSnapshot.objects.filter(
+            account=OuterRef("pk"), taken_at=since
+        ).values("balance")
+        base = Coalesce(Subquery(snapshot), ZERO, output_field=MONEY)
+    return base + Case(
+        When(kind__in=LedgerAccount.CREDIT_NORMAL, then=credits - debits),
+        default=debits - credits,
+        output_field=MONEY,
+    )
+
+
+def latest_cutoff(before=None):
+    snapshots = BalanceSnapshot.objects.all()
+    if before is not None:
+        snapshots = snapshots.filter(taken_at__lt=before)
+    return snapshots.aggregate(cutoff=Max("taken_at"))["cutoff"]
+
+
+def balance_at(account, at):
+    """
+    Balance of an account at a point in time: its latest snapshot before
+    ``at`` plus the entries created since, read from the range indexes.
+    """
+    snapshot = account.snapshots.filter(taken_at__lte=at).order_by("-taken_at").first()
+    entries = LedgerEntry.objects.filter(
+        Q(credit_account=account) | Q(debit_account=account), created_at__lte=at
+    )
+    balance = Decimal("0.00")
+    if snapshot is not None:
+        entries = entries.filter(created_at__gt=snapshot.taken_at)
+        balance = snapshot.balance
+    totals = entries.aggregate(
+        credits=Sum("amount", filter=Q(credit_account=account)),
+        debits=Sum("amount", filter=Q(debit_account=account)),
+    )
+    delta = (totals["credits"] or 0) - (totals["debits"] or 0)
+    return balance + account.sign * delta
+
+
+@transaction.atomic
+def take_snapshots(cutoff=None, batch_size=2000):
+    """
+    Snapshot every account at ``cutoff``, midnight today by default, from the
+    previous snapshots and the entries created in between. Taking the same
+    cutoff twice is a no-op. Returns the number of snapshots written.
+
+    Entries are stamped when they are built, before their transaction
+    commits. On PostgreSQL the journal is locked against writes first, which
+    waits for the postings in flight, and the cutoff is capped at the
+    database clock, so no entry stamped before the cutoff commits after it.
+    """
+    cutoff = cutoff or timezone.localtime().replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"LOCK TABLE {connection.ops.quote_name(LedgerEntry._meta.db_table)} "
+                "IN SHARE MODE"
+            )
+            cursor.execute("SELECT clock_timestamp()")
+            cutoff = min(cutoff, cursor.fetchone()[0])
+    if BalanceSnapshot.objects.filter(taken_at=cutoff).exists():
+        return 0
+    previous = latest_cutoff(before=cutoff)
+    balances = (
+        LedgerAccount.objects.annotate(expected=expected_balance(previous, cutoff))
+        .values_list("pk", "expected")
+        .iterator(chunk_size=batch_size)
+    )
+    snapshots = BalanceSnapshot.objects.bulk_create(
+        (
+            BalanceSnapshot(account_id=pk, taken_at=cutoff, balance=balance)
+            for pk, balance in balances
+        ),
+        batch_size=batch_size,
+    )
+    return len(snapshots)
+
+
+def reconcile(full=False):
+    """
+    Check the running balances against the journal with set-based queries.
+
+    Each wallet and loan account balance is compared with its latest
+    snapshot plus the entries since then (every entry with ``full``), and
+    each wallet balance with its ledger account. Only the mismatching rows
+    are returned, together with the elapsed time in seconds.
+    """
+    started = time.perf_counter()
+    since = None if full else latest_cutoff()
+    accounts = list(
+        LedgerAccount.objects.exclude(kind__in=LedgerAccount.SYSTEM_KINDS)
+        .annotate(expected=expected_balance(since))
+        .exclude(balance=F("expected"))
+        .values("id", "kind", "balance", "expected")
+    )
+    wallets = list(
+        LedgerAccount.objects.filter(kind=LedgerAccount.Kind.WALLET)
+        .exclude(wallet__balance=F("balance"))
+        .values("id", "wallet_id", "balance", wallet_balance=F("wallet__balance"))
+    )
+    return {
+        "since": since,
+        "accounts": accounts,
+        "wallets": wallets,
+        "elapsed": time.perf_counter() - started,
+    }
@@ -0,0 +1,93 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from config.apps.Loan import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the loan and wallet API hot paths in-process against a "
+        "freshly seeded throwaway database. Run with --settings=config.django.test."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--loans-per-user", type=int, default=5)
+        parser.add_argument("--activities-per-wallet", type=int, default=20)
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            dest="scenarios",
+            help="Scenario to run, repeatable. Defaults to all of them.",
+        )
+        parser.add_argument(
+            "--allocations",
+            action="store_true",
+            help="Also trace the peak memory allocated per request.",
+        )
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+        parser.add_argument(
+            "--baseline", help="Fail on regressions against this JSON results file."
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=benchmark.DEFAULT_TOLERANCE,
+            help="Allowed p95 latency increase over the baseline, as a fraction.",
+        )
+
+    def handle(self, *args, **options):
+        if "locmem" not in settings.CACHES["default"]["BACKEND"].lower():
+            self.stderr.write(
+                self.style.WARNING(
+                    "The cache is not local memory; results include its round trips."
+                )
+            )
+
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            staff = benchmark.seed(
+                users=options["users"],
+                loans_per_user=options["loans_per_user"],
+                activities_per_wallet=options["activities_per_wallet"],
+            )
+            results = benchmark.run(
+                staff,
+                names=options["scenarios"],
+                iterations=options["iterations"],
+                warmup=options["warmup"],
+                allocations=options["allocations"],
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for name, result in results.items():
+            line = (
+                f"{name:28} p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms"
+                f"  p99 {result['p99_ms']:8.2f}ms  {result['queries']:3} queries"
+            )
+            if "alloc_peak_kib" in result:
+                line += f"  {result['alloc_peak_kib']:8.1f} KiB"
+            self.stdout.write(line)
+
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+
+        if options["baseline"]:
+            with open(options["baseline"]) as baseline:
+                regressions = benchmark.compare(
+                    results, json.load(baseline), options["tolerance"]
+                )
+            if regressions:
+                raise CommandError("Regressions:\n" + "\n".join(regressions))
+            self.stdout.write(
+                self.style.SUCCESS("No regressions against the baseline.")
+            )
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from config.apps.Loan.models import Installment, Loan
+from config.apps.Loan.portfolio import PortfolioCalculator
+from config.apps.Loan.repayments import COLLECTIBLE_STATUSES
+
+
+class Command(BaseCommand):
+    help = (
+        "Materialize installments for in-progress and overdue loans that do not "
+        "have any yet."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of loans materialized per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        loan_ids = list(
+            Loan.objects.filter(
+                status__in=COLLECTIBLE_STATUSES, installments__isnull=True
+            )
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        chunk_size = options["chunk_size"]
+        for start in range(0, len(loan_ids), chunk_size):
+            calculator = PortfolioCalculator.from_queryset(
+                Loan.objects.filter(id__in=loan_ids[start : start + chunk_size])
+            )
+            with transaction.atomic():
+                Installment.objects.bulk_create(calculator.build_installments())
+        self.stdout.write(
+            self.style.SUCCESS(f"Materialized installments for {len(loan_ids)} loans.")
+        )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from config.apps.Loan.activity import ensure_partitions, is_partitioned, partition_table
+
+
+class Command(BaseCommand):
+    help = (
+        "Partition the wallet activity table by month on PostgreSQL and create "
+        "the partitions of the coming months."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=3,
+            help="Number of months to create partitions for ahead of the current one.",
+        )
+        parser.add_argument(
+            "--keep-legacy",
+            action="store_true",
+            help="Keep the unpartitioned table, renamed with a _legacy suffix.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Partitioning needs PostgreSQL, the database is {connection.vendor}."
+                )
+            )
+            return
+
+        if is_partitioned():
+            created = ensure_partitions(ahead=options["ahead"])
+        else:
+            created = partition_table(
+                ahead=options["ahead"], keep_legacy=options["keep_legacy"]
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {len(created)} partitions: {', '.join(created)}"
+            )
+        )
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from config.apps.Loan.ledger import reconcile, take_snapshots
+
+
+class Command(BaseCommand):
+    help = "Check wallet and loan balances against the ledger journal."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Sum every entry instead of starting from the latest snapshots.",
+        )
+        parser.add_argument(
+            "--snapshot",
+            action="store_true",
+            help="Take the balance snapshots of today's cutoff first.",
+        )
+
+    def handle(self, *args, **options):
+        if options["snapshot"]:
+            taken = take_snapshots()
+            self.stdout.write(f"Took {taken} balance snapshots.")
+
+        report = reconcile(full=options["full"])
+        for row in report["accounts"]:
+            self.stdout.write(
+                f"Account {row['id']} ({row['kind']}): balance {row['balance']}, "
+                f"journal {row['expected']}"
+            )
+        for row in report["wallets"]:
+            self.stdout.write(
+                f"Wallet {row['wallet_id']}: balance {row['wallet_balance']}, "
+                f"ledger {row['balance']}"
+            )
+        mismatches = len(report["accounts"]) + len(report["wallets"])
+        if mismatches:
+            raise CommandError(f"{mismatches} balances do not reconcile.")
+        self.stdout.write(
+            self.style.SUCCESS(f"Ledger reconciled in {report['elapsed']:.2f}s.")
+        )
@@ -0,0 +1,41 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from config.apps.Loan.repayments import settle_due_installments
+
+
+class Command(BaseCommand):
+    help = (
+        "Debit wallets for due installments and accrue late fees on in-progress "
+        "and overdue loans."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--as-of",
+            type=date.fromisoformat,
+            default=None,
+            help="Settle installments due before this date (YYYY-MM-DD). Defaults to today.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of loans settled per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        report = settle_due_installments(
+            as_of=options["as_of"], chunk_size=options["chunk_size"]
+        )
+        elapsed = report["elapsed"]
+        rate = report["loans"] / elapsed if elapsed else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed {report['loans']} loans in {elapsed:.2f}s ({rate:.0f} loans/s): "
+                f"{report['installments_paid']} installments paid, "
+                f"{report['installments_overdue']} overdue, "
+                f"{report['amount_collected']} collected."
+            )
+        )
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from config.profiling import PROFILE_HEADER, sign_profile_header
+
+
+class Command(BaseCommand):
+    help = "Print a signed header that makes a request profiled."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{PROFILE_HEADER}: {sign_profile_header()}")
+        self.stderr.write(
+            f"Valid for {settings.PROFILE_HEADER_MAX_AGE} seconds.", ending="\n"
+        )
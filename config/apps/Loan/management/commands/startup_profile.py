@@ -0,0 +1,49 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from config.apps.Loan.startup import profile_role
+
+
+class Command(BaseCommand):
+    help = (
+        "Report the cold start time of each process role and the import time "
+        "spent in each app or package."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--role",
+            action="append",
+            dest="roles",
+            choices=settings.APP_ROLES,
+            help="Role to profile, repeatable. Defaults to all of them.",
+        )
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument(
+            "--top", type=int, default=15, help="Packages listed per role."
+        )
+        parser.add_argument(
+            "--json", action="store_true", help="Print the full report as JSON."
+        )
+
+    def handle(self, *args, **options):
+        report = {
+            role: profile_role(role, repeat=options["repeat"])
+            for role in options["roles"] or settings.APP_ROLES
+        }
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for role, profile in report.items():
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{role}: django.setup() in {profile['setup_s']:.3f}s "
+                    f"(best of {options['repeat']})"
+                )
+            )
+            top = list(profile["imports_ms"].items())[: options["top"]]
+            for name, milliseconds in top:
+                self.stdout.write(f"  {name:<40} {milliseconds:>8.1f} ms")
@@ -0,0 +1,26 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from config.apps.Loan.repayments import sweep_loan_statuses
+
+
+class Command(BaseCommand):
+    help = "Mark fully paid loans REPAID and past-due in-progress loans OVERDUE."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--as-of",
+            type=date.fromisoformat,
+            default=None,
+            help="Loans ending before this date (YYYY-MM-DD) are overdue. Defaults to today.",
+        )
+
+    def handle(self, *args, **options):
+        report = sweep_loan_statuses(as_of=options["as_of"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Marked {report['repaid']} loans repaid and {report['overdue']} "
+                f"overdue in {report['elapsed']:.2f}s."
+            )
+        )
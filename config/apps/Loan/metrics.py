@@ -0,0 +1,306 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .cache import _incr, get_cache_stats, get_task_stats
+
+# Upper bounds, in milliseconds, of the request latency histogram buckets.
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+FIELDS = (
+    "requests",
+    "request_us",
+    *(f"le_{bound}" for bound in LATENCY_BUCKETS),
+    "le_inf",
+    *(f"status_{status}" for status in STATUS_CLASSES),
+    "db_calls",
+    "db_us",
+    "es_calls",
+    "es_us",
+    "cache_hit",
+    "cache_miss",
+)
+SERIES_KEY = "metrics:series"
+
+_current = ContextVar("request_metrics", default=None)
+
+
+def record(name, value=1):
+    """
+    Add to a counter of the request being served; a no-op outside requests.
+    """
+    counters = _current.get()
+    if counters is not None:
+        counters[name] += value
+
+
+@contextmanager
+def timed(name):
+    """
+    Count a call under ``{name}_calls`` and its duration under ``{name}_us``.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(f"{name}_calls")
+        record(f"{name}_us", int((time.perf_counter() - started) * 1_000_000))
+
+
+def _time_query(execute, sql, params, many, context):
+    with timed("db"):
+        return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    """
+    Time every query of a database connection for the request it serves.
+
+    The wrapper stays installed for the life of the connection and costs a
+    context variable lookup outside requests. Connections are per thread and
+    under ASGI the ORM runs in threads of its own, so they are wrapped as
+    they connect rather than around each request.
+    """
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+class Registry:
+    """
+    Request counters of this worker, added to the shared cache in batches.
+
+    Series are ``view|method`` pairs. Their names are kept in one cache entry
+    that every flush extends; when two workers race to extend it the loser
+    adds its series back on its next flush.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = Counter()
+        self.series = set()
+        self.flushed_at = time.monotonic()
+
+    def add(self, series, counters):
+        self.collect(series, counters)
+        if self.due():
+            self.flush()
+
+    def collect(self, series, counters):
+        with self.lock:
+            self.series.add(series)
+            for name, value in counters.items():
+                self.pending[f"{series}:{name}"] += value
+
+    def due(self):
+        return time.monotonic() - self.flushed_at >= settings.METRICS_FLUSH_SECONDS
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, Counter()
+            series = set(self.series)
+            self.flushed_at = time.monotonic()
+        for key, value in pending.items():
+            if value:
+                _incr(f"metrics:{key}", value)
+        known = cache.get(SERIES_KEY) or set()
+        if not series <= known:
+            cache.set(SERIES_KEY, known | series, timeout=None)
+
+
+registry = Registry()
+
+
+def _bucket(elapsed_ms):
+    for bound in LATENCY_BUCKETS:
+        if elapsed_ms <= bound:
+            return f"le_{bound}"
+    return "le_inf"
+
+
+class MetricsMiddleware:
+    """
+    Count the latency, status, database queries, Elasticsearch calls and
+    list cache lookups of every request, labelled with its view name.
+
+    Queries are timed by ``time_queries``; Elasticsearch calls by the timed
+    transports; cache lookups are read from the ``X-Cache`` header set by
+    ``CachedListMixin`` and the async views. Under ASGI the counters are
+    flushed from a thread so the event loop never waits on Redis.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        counters = Counter()
+        token = _current.set(counters)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        registry.add(*self.count(request, response, counters, started))
+        return response
+
+    async def __acall__(self, request):
+        counters = Counter()
+        token = _current.set(counters)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        registry.collect(*self.count(request, response, counters, started))
+        if registry.due():
+            await sync_to_async(registry.flush, thread_sensitive=False)()
+        return response
+
+    def count(self, request, response, counters, started):
+        elapsed = time.perf_counter() - started
+        counters["requests"] += 1
+        counters["request_us"] += int(elapsed * 1_000_000)
+        counters[_bucket(elapsed * 1000)] += 1
+        counters[f"status_{response.status_code // 100}xx"] += 1
+        if response.has_header("X-Cache"):
+            counters[f"cache_{response['X-Cache'].lower()}"] += 1
+
+        match = request.resolver_match
+        view = match.view_name if match else "unmatched"
+        return f"{view}|{request.method}", counters
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _seconds(microseconds):
+    return f"{microseconds / 1_000_000:.6f}"
+
+
+def render(cached_lists=(), task_names=()):
+    """
+    Every counter in the Prometheus text exposition format, after flushing
+    the counters of this worker.
+    """
+    registry.flush()
+    series = sorted(cache.get(SERIES_KEY) or ())
+    keys = {
+        f"metrics:{name}:{field}": (name, field) for name in series for field in FIELDS
+    }
+    values = cache.get_many(keys)
+    stats = {name: Counter() for name in series}
+    for key, (name, field) in keys.items():
+        stats[name][field] = values.get(key, 0)
+
+    families = {
+        "http_requests_total": ("counter", "Requests by view, method and status."),
+        "http_request_duration_seconds": ("histogram", "Request latency by view."),
+        "db_queries_total": ("counter", "Database queries run by each view."),
+        "db_query_duration_seconds_total": ("counter", "Time spent in queries."),
+        "elasticsearch_requests_total": ("counter", "Elasticsearch calls by view."),
+        "elasticsearch_request_duration_seconds_total": (
+            "counter",
+            "Time spent waiting on Elasticsearch.",
+        ),
+        "cache_lookups_total": ("counter", "Cached list lookups by view."),
+        "list_cache_lookups_total": ("counter", "Cached list lookups by list."),
+        "celery_tasks_total": ("counter", "Finished background tasks by state."),
+        "celery_task_duration_seconds_total": ("counter", "Time spent in tasks."),
+    }
+    samples = {family: [] for family in families}
+
+    for name in series:
+        view, method = name.rsplit("|", 1)
+        counters = stats[name]
+        labels = _labels(view=view, method=method)
+        for status in STATUS_CLASSES:
+            if counters[f"status_{status}"]:
+                samples["http_requests_total"].append(
+                    f'http_requests_total{{{labels},status="{status}"}} '
+                    f"{counters[f'status_{status}']}"
+                )
+        histogram = samples["http_request_duration_seconds"]
+        cumulative = 0
+        for bound in LATENCY_BUCKETS:
+            cumulative += counters[f"le_{bound}"]
+            histogram.append(
+                f"http_request_duration_seconds_bucket{{{labels},"
+                f'le="{bound / 1000:g}"}} {cumulative}'
+            )
+        histogram.append(
+            f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} '
+            f"{cumulative + counters['le_inf']}"
+        )
+        histogram.append(
+            f"http_request_duration_seconds_sum{{{labels}}} "
+            f"{_seconds(counters['request_us'])}"
+        )
+        histogram.append(
+            f"http_request_duration_seconds_count{{{labels}}} {counters['requests']}"
+        )
+        samples["db_queries_total"].append(
+            f"db_queries_total{{{labels}}} {counters['db_calls']}"
+        )
+        samples["db_query_duration_seconds_total"].append(
+            f"db_query_duration_seconds_total{{{labels}}} "
+            f"{_seconds(counters['db_us'])}"
+        )
+        samples["elasticsearch_requests_total"].append(
+            f"elasticsearch_requests_total{{{labels}}} {counters['es_calls']}"
+        )
+        samples["elasticsearch_request_duration_seconds_total"].append(
+            f"elasticsearch_request_duration_seconds_total{{{labels}}} "
+            f"{_seconds(counters['es_us'])}"
+        )
+        for result in ("hit", "miss"):
+            if counters[f"cache_{result}"]:
+                samples["cache_lookups_total"].append(
+                    f'cache_lookups_total{{{labels},result="{result}"}} '
+                    f"{counters[f'cache_{result}']}"
+                )
+
+    for prefix, events in get_cache_stats(cached_lists).items():
+        for result, count in events.items():
+            samples["list_cache_lookups_total"].append(
+                f"list_cache_lookups_total{{{_labels(list=prefix, result=result)}}} "
+                f"{count}"
+            )
+
+    for task, fields in get_task_stats(task_names).items():
+        milliseconds = fields.pop("ms")
+        for state, count in fields.items():
+            samples["celery_tasks_total"].append(
+                f"celery_tasks_total{{{_labels(task=task, state=state)}}} {count}"
+            )
+        samples["celery_task_duration_seconds_total"].append(
+            f"celery_task_duration_seconds_total{{{_labels(task=task)}}} "
+            f"{_seconds(milliseconds * 1000)}"
+        )
+
+    lines = []
+    for family, (kind, description) in families.items():
+        lines.append(f"# HELP {family} {description}")
+        lines.append(f"# TYPE {family} {kind}")
+        lines.extend(samples[family])
+    return "\n".join(lines) + "\n"
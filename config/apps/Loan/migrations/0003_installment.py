@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:25
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Loan", "0002_remove_wallet_max_withdrawal_limit"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Installment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sequence", models.PositiveIntegerField()),
+                ("period", models.CharField(max_length=20)),
+                ("due_date", models.DateField()),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=20)),
+                (
+                    "amount_paid",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=20
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("unpaid", "Unpaid"),
+                            ("paid", "Paid"),
+                            ("overdue", "Overdue"),
+                        ],
+                        default="unpaid",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "late_payment_fee",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=10
+                    ),
+                ),
+                (
+                    "loan",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="installments",
+                        to="Loan.loan",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Installment",
+                "verbose_name_plural": "Installments",
+                "ordering": ["loan_id", "sequence"],
+                "indexes": [
+                    models.Index(
+                        fields=["due_date", "status"],
+                        name="Loan_instal_due_dat_fccbb7_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("loan", "sequence"), name="unique_installment_per_loan"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Loan", "0003_installment"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="walletactivity",
+            index=models.Index(
+                fields=["wallet", "-timestamp", "-id"],
+                name="wallet_activity_recent_idx",
+            ),
+        ),
+    ]
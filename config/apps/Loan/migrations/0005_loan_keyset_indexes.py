@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Loan", "0004_wallet_activity_recent_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="loan",
+            index=models.Index(
+                fields=["start_date", "id"], name="Loan_loan_start_d_64eb3d_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="loan",
+            index=models.Index(
+                fields=["client", "start_date", "id"],
+                name="Loan_loan_client__689857_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Loan", "0005_loan_keyset_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="loan",
+            index=models.Index(
+                condition=models.Q(("status__in", ["IN_PROGRESS", "OVERDUE"])),
+                fields=["end_date"],
+                name="loan_active_end_date_idx",
+            ),
+        ),
+    ]
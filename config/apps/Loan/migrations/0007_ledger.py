@@ -0,0 +1,195 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:04
+
+from decimal import Decimal
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Loan", "0006_loan_active_end_date_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LedgerAccount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("WALLET", "Wallet"),
+                            ("LOAN_RECEIVABLE", "Loan Receivable"),
+                            ("FEE_INCOME", "Fee Income"),
+                            ("EXTERNAL", "External Funds"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "balance",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=20
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "loan",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="ledger_account",
+                        to="Loan.loan",
+                    ),
+                ),
+                (
+                    "wallet",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="ledger_account",
+                        to="Loan.wallet",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Ledger Account",
+                "verbose_name_plural": "Ledger Accounts",
+            },
+        ),
+        migrations.CreateModel(
+            name="BalanceSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("taken_at", models.DateTimeField(db_index=True)),
+                ("balance", models.DecimalField(decimal_places=2, max_digits=20)),
+                (
+                    "account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="snapshots",
+                        to="Loan.ledgeraccount",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Balance Snapshot",
+                "verbose_name_plural": "Balance Snapshots",
+            },
+        ),
+        migrations.CreateModel(
+            name="LedgerEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("OPENING", "Opening Balance"),
+                            ("DEPOSIT", "Deposit"),
+                            ("WITHDRAWAL", "Withdrawal"),
+                            ("DISBURSEMENT", "Disbursement"),
+                            ("INTEREST", "Interest"),
+                            ("REPAYMENT", "Repayment"),
+                            ("LATE_FEE", "Late Payment Fee"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=20)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "credit_account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="credits",
+                        to="Loan.ledgeraccount",
+                    ),
+                ),
+                (
+                    "debit_account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="debits",
+                        to="Loan.ledgeraccount",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Ledger Entry",
+                "verbose_name_plural": "Ledger Entries",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="ledgeraccount",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("loan__isnull", True), ("wallet__isnull", True)),
+                fields=("kind",),
+                name="unique_system_ledger_account",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="balancesnapshot",
+            constraint=models.UniqueConstraint(
+                fields=("account", "taken_at"), name="unique_snapshot_per_cutoff"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ledgerentry",
+            index=models.Index(
+                fields=["debit_account", "created_at"], name="ledger_debit_range_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ledgerentry",
+            index=models.Index(
+                fields=["credit_account", "created_at"], name="ledger_credit_range_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="ledgerentry",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("amount__gt", 0)),
+                name="ledger_entry_positive_amount",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="ledgerentry",
+            constraint=models.CheckConstraint(
+                condition=models.Q(
+                    ("debit_account", models.F("credit_account")), _negated=True
+                ),
+                name="ledger_entry_distinct_accounts",
+            ),
+        ),
+    ]
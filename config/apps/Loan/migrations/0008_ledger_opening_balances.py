@@ -0,0 +1,71 @@
+from django.db import migrations
+
+ACTIVE_STATUSES = ["IN_PROGRESS", "OVERDUE"]
+
+
+def open_ledger(apps, schema_editor):
+    """
+    Create the shared accounts and journal the balances that existed before
+    the ledger: wallet funds and the amounts still owed on active loans,
+    both against external funds.
+    """
+    LedgerAccount = apps.get_model("Loan", "LedgerAccount")
+    LedgerEntry = apps.get_model("Loan", "LedgerEntry")
+    Wallet = apps.get_model("Loan", "Wallet")
+    Loan = apps.get_model("Loan", "Loan")
+
+    wallets = list(Wallet.objects.filter(balance__gt=0).only("id", "balance"))
+    loans = [
+        (loan, loan.total_amount + loan.late_payment_fee - (loan.amount_paid or 0))
+        for loan in Loan.objects.filter(status__in=ACTIVE_STATUSES).only(
+            "id", "total_amount", "late_payment_fee", "amount_paid"
+        )
+    ]
+    loans = [(loan, owed) for loan, owed in loans if owed > 0]
+
+    external = LedgerAccount.objects.create(kind="EXTERNAL")
+    LedgerAccount.objects.create(kind="FEE_INCOME")
+    wallet_accounts = LedgerAccount.objects.bulk_create(
+        [
+            LedgerAccount(kind="WALLET", wallet_id=wallet.id, balance=wallet.balance)
+            for wallet in wallets
+        ]
+    )
+    loan_accounts = LedgerAccount.objects.bulk_create(
+        [
+            LedgerAccount(kind="LOAN_RECEIVABLE", loan_id=loan.id, balance=owed)
+            for loan, owed in loans
+        ]
+    )
+    LedgerEntry.objects.bulk_create(
+        [
+            LedgerEntry(
+                kind="OPENING",
+                debit_account=external,
+                credit_account=account,
+                amount=account.balance,
+            )
+            for account in wallet_accounts
+        ]
+        + [
+            LedgerEntry(
+                kind="OPENING",
+                debit_account=account,
+                credit_account=external,
+                amount=account.balance,
+            )
+            for account in loan_accounts
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Loan", "0007_ledger"),
+    ]
+
+    operations = [
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
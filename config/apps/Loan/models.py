@@ -1,12 +1,127 @@
 from decimal import Decimal
 
 from django.db import models
+from django.db.models import ExpressionWrapper, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Floor, NullIf, TruncMonth
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from config.apps.authantification.models import User
 
 
+class DaysBetween(models.Func):
+    """
+    Whole days from ``start`` to ``end``, for two date expressions.
+    """
+
+    output_field = models.IntegerField()
+    arg_joiner = " - "
+    template = "(%(expressions)s)"
+
+    def __init__(self, end, start, **extra):
+        super().__init__(end, start, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler,
+            connection,
+            template="CAST(julianday(%(expressions)s) AS INTEGER)",
+            arg_joiner=") - julianday(",
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler,
+            connection,
+            function="DATEDIFF",
+            template="%(function)s(%(expressions)s)",
+            arg_joiner=", ",
+            **extra_context,
+        )
+
+
+class LoanQuerySet(models.QuerySet):
+    """
+    SQL counterparts of the Loan reporting methods, so reports over many
+    loans are computed by the database instead of per instance.
+    """
+
+    REPORT_GROUPS = {
+        "status": "status",
+        "payment_schedule": "payment_schedule",
+        "role": "client__role__name",
+        "month": "month",
+    }
+
+    def _overdue(self, today):
+        return ~models.Q(status__in=[Loan.Status.REPAID, Loan.Status.CANCELLED]) & (
+            models.Q(end_date__lt=today)
+        )
+
+    def with_reporting(self, today=None):
+        """
+        Annotate remaining_due, progress, overdue and days_overdue, matching
+        remaining_amount(), payment_progress() and is_overdue().
+        """
+        today = today or timezone.now().date()
+        money = models.DecimalField(max_digits=20, decimal_places=2)
+        total = Coalesce("total_amount", Value(Decimal("0.00")), output_field=money)
+        paid = Coalesce("amount_paid", Value(Decimal("0.00")), output_field=money)
+        return self.annotate(
+            remaining_due=ExpressionWrapper(total - paid, output_field=money),
+            progress=models.Case(
+                models.When(total_amount=0, then=Value(100)),
+                default=Cast(
+                    Floor(paid * Value(100) / NullIf(total, Value(0))),
+                    models.IntegerField(),
+                ),
+                output_field=models.IntegerField(),
+            ),
+            overdue=models.Case(
+                models.When(self._overdue(today), then=Value(True)),
+                default=Value(False),
+                output_field=models.BooleanField(),
+            ),
+            days_overdue=models.Case(
+                models.When(
+                    self._overdue(today),
+                    then=DaysBetween(
+                        Value(today, output_field=models.DateField()), "end_date"
+                    ),
+                ),
+                default=Value(0),
+                output_field=models.IntegerField(),
+            ),
+        )
+
+    def report(self, group_by, today=None):
+        """
+        Portfolio totals grouped by status, payment_schedule, role or month,
+        computed in one aggregate query.
+        """
+        field = self.REPORT_GROUPS[group_by]
+        queryset = self.with_reporting(today).order_by()
+        if group_by == "month":
+            queryset = queryset.annotate(month=TruncMonth("start_date"))
+        overdue = models.Q(overdue=True)
+        return (
+            queryset.values(field)
+            .annotate(
+                loans=models.Count("id"),
+                total_principal=Sum("amount"),
+                total_due=Sum("total_amount"),
+                total_paid=Sum("amount_paid"),
+                total_remaining=Sum("remaining_due"),
+                average_progress=models.Avg("progress"),
+                overdue_loans=models.Count("id", filter=overdue),
+                overdue_amount=Sum("remaining_due", filter=overdue),
+                max_days_overdue=models.Max("days_overdue"),
+            )
+            .order_by(field)
+        )
+
+
 class Loan(models.Model):
     # Status Choices
     class Status(models.TextChoices):
@@ -50,27 +165,28 @@ class Loan(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = LoanQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
+        # Dates assigned from timezone.now() are datetimes until reloaded.
+        for name in ("start_date", "approval_date", "end_date"):
+            setattr(
+                self, name, self._meta.get_field(name).to_python(getattr(self, name))
+            )
         self.total_amount = self.total_amount_to_pay()
-        self.update_status
+        self.update_status()
         if not self.end_date and self.approval_date:
             from dateutil.relativedelta import relativedelta
 
             self.end_date = self.approval_date + relativedelta(
                 months=self.duration_months
             )
-        if not self.client.wallet:
+        # Reuses the wallet cached by select_related("client__wallet"); a
+        # missing reverse one-to-one raises an AttributeError subclass.
+        if not hasattr(self.client, "wallet"):
             Wallet.objects.create(user=self.client)
         super().save(*args, **kwargs)
 
-    def _update_wallet_balance(self):
-        """Add loan amount to the client's wallet when loan is approved."""
-        try:
-            wallet = self.client.wallet
-            wallet.add_balance(self.amount)
-        except Wallet.DoesNotExist:
-            print(f"No wallet found for client {self.client.username}")
-
     def update_status(self):
         """Update loan status based on progress and overdue conditions."""
         if self.is_fully_repaid():
@@ -96,7 +212,7 @@ class Loan(models.Model):
 
     def is_fully_repaid(self):
         """Check if the loan is fully repaid."""
-        return self.total_amount <= self.amount_paid
+        return self.total_amount <= (self.amount_paid or Decimal("0.00"))
 
     def is_overdue(self):
         """Check if the loan is overdue."""
@@ -118,12 +234,70 @@ class Loan(models.Model):
         verbose_name_plural = _("Loans")
         indexes = [
             models.Index(fields=["client", "status"]),
+            models.Index(fields=["start_date", "id"]),
+            models.Index(fields=["client", "start_date", "id"]),
+            # Only active loans change status, so the sweep scans this
+            # small partial index instead of the whole table.
+            models.Index(
+                fields=["end_date"],
+                name="loan_active_end_date_idx",
+                condition=models.Q(status__in=["IN_PROGRESS", "OVERDUE"]),
+            ),
         ]
 
     def __str__(self):
         return f"Loan for {self.client.username} - {self.amount} ({self.status})"
 
 
+class Installment(models.Model):
+    """A single scheduled repayment of a loan, materialized at approval time."""
+
+    class Status(models.TextChoices):
+        UNPAID = "unpaid", _("Unpaid")
+        PAID = "paid", _("Paid")
+        OVERDUE = "overdue", _("Overdue")
+
+    loan = models.ForeignKey(
+        Loan, on_delete=models.CASCADE, related_name="installments"
+    )
+    sequence = models.PositiveIntegerField()
+    period = models.CharField(max_length=20)
+    due_date = models.DateField()
+    amount = models.DecimalField(max_digits=20, decimal_places=2)
+    amount_paid = models.DecimalField(
+        max_digits=20, decimal_places=2, default=Decimal("0.00")
+    )
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.UNPAID
+    )
+    late_payment_fee = models.DecimalField(
+        max_digits=10, decimal_places=2, default=Decimal("0.00")
+    )
+
+    def overdue_days(self, today=None):
+        """Number of days this installment is past its due date while unpaid."""
+        if self.status == self.Status.PAID:
+            return 0
+        today = today or timezone.now().date()
+        return max(0, (today - self.due_date).days)
+
+    class Meta:
+        ordering = ["loan_id", "sequence"]
+        verbose_name = _("Installment")
+        verbose_name_plural = _("Installments")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["loan", "sequence"], name="unique_installment_per_loan"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["due_date", "status"]),
+        ]
+
+    def __str__(self):
+        return f"{self.period} of loan {self.loan_id} - {self.amount} ({self.status})"
+
+
 class Wallet(models.Model):
     class WalletType(models.TextChoices):
         STANDARD = "STANDARD", _("Standard")
@@ -149,10 +323,10 @@ class Wallet(models.Model):
         Args:
             amount (Decimal): The amount to add to the wallet balance.
         """
+        from .services import credit_wallet
+
         if amount > 0:
-            self.balance += amount
-            self.save()
-            WalletActivity.log_activity(wallet=self, activity_type="add", amount=amount)
+            credit_wallet(self, amount)
 
     def subtract_balance(self, amount: Decimal):
         """
@@ -160,13 +334,14 @@ class Wallet(models.Model):
 
         Args:
             amount (Decimal): The amount to subtract from the wallet balance.
+
+        Raises:
+            InsufficientBalance: If the balance does not cover the amount.
         """
-        if amount > 0 and self.balance >= amount:
-            self.balance -= amount
-            self.save()
-            WalletActivity.log_activity(
-                wallet=self, activity_type="subtract", amount=amount
-            )
+        from .services import debit_wallet
+
+        if amount > 0:
+            debit_wallet(self, amount)
 
     class Meta:
         verbose_name = _("Wallet")
@@ -190,6 +365,14 @@ class WalletActivity(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     description = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["wallet", "-timestamp", "-id"],
+                name="wallet_activity_recent_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.wallet.user.email} - {self.activity_type} - {self.amount}"
 
@@ -198,16 +381,189 @@ class WalletActivity(models.Model):
         """
         Log an activity for a wallet.
 
+        Inside ``buffered_activities()`` the row is queued and written with
+        the rest of the buffer in one bulk INSERT; otherwise it is saved now.
+
         Args:
             wallet (Wallet): The wallet instance where the activity took place.
             activity_type (str): The type of activity (add, subtract, update, etc.).
             amount (Decimal): The amount involved in the activity.
         """
-        description = f"Wallet: {wallet.user.email}'s Wallet, Activity: {activity_type}, Amount: {amount}"
+        from .activity import buffer_activity
+
+        activity = WalletActivity.build(wallet, activity_type, amount)
+        if not buffer_activity(activity):
+            activity.save()
+
+    @staticmethod
+    def build(wallet, activity_type, amount):
+        """
+        Build an unsaved activity for a wallet, e.g. to be bulk created.
+        """
+        return WalletActivity(wallet=wallet, activity_type=activity_type, amount=amount)
 
-        WalletActivity.objects.create(
-            wallet=wallet,
-            activity_type=activity_type,
-            amount=amount,
-            description=description,
+    @staticmethod
+    def format_description(email, activity_type, amount):
+        return f"Wallet: {email}'s Wallet, Activity: {activity_type}, Amount: {amount}"
+
+    def get_description(self):
+        """
+        The stored description, or one derived from the activity when read.
+        """
+        if self.description:
+            return self.description
+        return self.format_description(
+            self.wallet.user.email, self.activity_type, self.amount
         )
+
+
+class LedgerAccount(models.Model):
+    """
+    An account of the double-entry ledger: one per wallet, one receivable
+    per loan, and the shared fee income and external funds accounts.
+
+    ``balance`` is the running balance of wallet and loan accounts, updated
+    in the transaction that posts each entry. The shared accounts are
+    touched by every posting, so they keep no running balance and are read
+    from their snapshots and entries instead.
+    """
+
+    class Kind(models.TextChoices):
+        WALLET = "WALLET", _("Wallet")
+        LOAN_RECEIVABLE = "LOAN_RECEIVABLE", _("Loan Receivable")
+        FEE_INCOME = "FEE_INCOME", _("Fee Income")
+        EXTERNAL = "EXTERNAL", _("External Funds")
+
+    # Liability and income accounts grow with credits, assets with debits.
+    CREDIT_NORMAL = [Kind.WALLET, Kind.FEE_INCOME]
+    SYSTEM_KINDS = [Kind.FEE_INCOME, Kind.EXTERNAL]
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    wallet = models.OneToOneField(
+        Wallet,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="ledger_account",
+    )
+    loan = models.OneToOneField(
+        Loan,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="ledger_account",
+    )
+    balance = models.DecimalField(
+        max_digits=20, decimal_places=2, default=Decimal("0.00")
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Ledger Account")
+        verbose_name_plural = _("Ledger Accounts")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind"],
+                condition=models.Q(wallet__isnull=True, loan__isnull=True),
+                name="unique_system_ledger_account",
+            ),
+        ]
+
+    def __str__(self):
+        owner = self.wallet_id or self.loan_id
+        return f"{self.get_kind_display()} {owner or ''}".strip()
+
+    @property
+    def sign(self):
+        return 1 if self.kind in self.CREDIT_NORMAL else -1
+
+    @property
+    def tracks_balance(self):
+        return self.kind not in self.SYSTEM_KINDS
+
+
+class LedgerEntry(models.Model):
+    """
+    An immutable journal line moving ``amount`` from ``credit_account`` to
+    ``debit_account``. Corrections are posted as new entries.
+    """
+
+    class Kind(models.TextChoices):
+        OPENING = "OPENING", _("Opening Balance")
+        DEPOSIT = "DEPOSIT", _("Deposit")
+        WITHDRAWAL = "WITHDRAWAL", _("Withdrawal")
+        DISBURSEMENT = "DISBURSEMENT", _("Disbursement")
+        INTEREST = "INTEREST", _("Interest")
+        REPAYMENT = "REPAYMENT", _("Repayment")
+        LATE_FEE = "LATE_FEE", _("Late Payment Fee")
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    debit_account = models.ForeignKey(
+        LedgerAccount, on_delete=models.PROTECT, related_name="debits"
+    )
+    credit_account = models.ForeignKey(
+        LedgerAccount, on_delete=models.PROTECT, related_name="credits"
+    )
+    amount = models.DecimalField(max_digits=20, decimal_places=2)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = _("Ledger Entry")
+        verbose_name_plural = _("Ledger Entries")
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(amount__gt=0), name="ledger_entry_positive_amount"
+            ),
+            models.CheckConstraint(
+                condition=~models.Q(debit_account=models.F("credit_account")),
+                name="ledger_entry_distinct_accounts",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["debit_account", "created_at"], name="ledger_debit_range_idx"
+            ),
+            models.Index(
+                fields=["credit_account", "created_at"],
+                name="ledger_credit_range_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.kind} {self.amount}: "
+            f"{self.credit_account_id} -> {self.debit_account_id}"
+        )
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Ledger entries are immutable.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Ledger entries are immutable.")
+
+
+class BalanceSnapshot(models.Model):
+    """
+    Balance of an account including every entry created up to ``taken_at``.
+    Snapshots are taken for every account at the same cutoff.
+    """
+
+    account = models.ForeignKey(
+        LedgerAccount, on_delete=models.PROTECT, related_name="snapshots"
+    )
+    taken_at = models.DateTimeField(db_index=True)
+    balance = models.DecimalField(max_digits=20, decimal_places=2)
+
+    class Meta:
+        verbose_name = _("Balance Snapshot")
+        verbose_name_plural = _("Balance Snapshots")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["account", "taken_at"], name="unique_snapshot_per_cutoff"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.account} at {self.taken_at:%Y-%m-%d %H:%M}: {self.balance}"
@@ -0,0 +1,185 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+
+from .models import Installment, Loan
+
+PERIODS = {
+    Loan.PaymentSchedule.MONTHLY: ("Month", 30, 1),
+    Loan.PaymentSchedule.QUARTERLY: ("Quarter", 90, 3),
+    Loan.PaymentSchedule.ANNUALLY: ("Year", 365, 12),
+}
+
+# Float results closer than this (in cents, plus a relative float error
+# bound) to a rounding boundary are recomputed with the Decimal path of
+# Loan.total_amount_to_pay.
+ROUNDING_TOLERANCE = 1e-6
+RELATIVE_TOLERANCE = 1e-13
+
+
+class PortfolioCalculator:
+    """
+    Vectorized payment plan arithmetic for many loans at once.
+
+    Takes columns of loan attributes instead of Loan instances and computes
+    totals, installment amounts and due dates with NumPy. Amounts are kept in
+    integer cents and agree to the cent with Loan.total_amount_to_pay.
+    """
+
+    FIELDS = (
+        "id",
+        "amount",
+        "interest_rate",
+        "duration_months",
+        "payment_schedule",
+        "start_date",
+    )
+
+    def __init__(
+        self,
+        amount,
+        interest_rate,
+        duration_months,
+        payment_schedule,
+        start_date,
+        ids=None,
+    ):
+        self.amount = list(amount)
+        self.amount_cents = np.fromiter(
+            (int(Decimal(str(value)).scaleb(2)) for value in self.amount),
+            dtype=np.int64,
+            count=len(self.amount),
+        )
+        self.interest_rate = np.asarray(interest_rate, dtype=np.float64)
+        self.duration_months = np.asarray(duration_months, dtype=np.int64)
+        self.payment_schedule = np.asarray(payment_schedule, dtype=object)
+        self.start_date = np.asarray(start_date, dtype="datetime64[D]")
+        self.ids = None if ids is None else np.asarray(ids, dtype=np.int64)
+
+        self.days_in_period = np.zeros(len(self), dtype=np.int64)
+        self.months_in_period = np.ones(len(self), dtype=np.int64)
+        for schedule, (_, days, months) in PERIODS.items():
+            mask = self.payment_schedule == schedule
+            self.days_in_period[mask] = days
+            self.months_in_period[mask] = months
+        self._total_cents = None
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        """
+        Build a calculator from a Loan queryset without instantiating models.
+        """
+        rows = list(queryset.values_list(*cls.FIELDS))
+        if not rows:
+            return cls([], [], [], [], [], ids=[])
+        ids, amount, interest_rate, duration, schedule, start_date = zip(*rows)
+        return cls(amount, interest_rate, duration, schedule, start_date, ids=ids)
+
+    @classmethod
+    def from_loans(cls, loans):
+        """
+        Build a calculator from Loan instances that are already in memory.
+        """
+        columns = [[getattr(loan, field) for loan in loans] for field in cls.FIELDS]
+        ids, amount, interest_rate, duration, schedule, start_date = columns
+        return cls(amount, interest_rate, duration, schedule, start_date, ids=ids)
+
+    def __len__(self):
+        return len(self.amount_cents)
+
+    @property
+    def total_cents(self):
+        """
+        Total amount to pay per loan, in cents.
+        """
+        if self._total_cents is None:
+            monthly_interest_rate = self.interest_rate / 12 / 100
+            exact = self.amount_cents * (
+                1 + monthly_interest_rate * self.duration_months
+            )
+            total = np.rint(exact)
+            # Exact-cents reconciliation: the float result can only disagree
+            # with the Decimal path when it sits on a half-cent boundary.
+            fraction = np.abs(exact - np.floor(exact) - 0.5)
+            tolerance = ROUNDING_TOLERANCE + np.abs(exact) * RELATIVE_TOLERANCE
+            ambiguous = np.flatnonzero(
+                (fraction < tolerance) | (np.abs(exact) >= 2**53)
+            )
+            total = total.astype(np.int64)
+            for index in ambiguous:
+                total[index] = self._decimal_total_cents(index)
+            self._total_cents = total
+        return self._total_cents
+
+    def _decimal_total_cents(self, index):
+        loan = Loan(
+            amount=Decimal(str(self.amount[index])),
+            interest_rate=float(self.interest_rate[index]),
+            duration_months=int(self.duration_months[index]),
+        )
+        return int(loan.total_amount_to_pay().scaleb(2))
+
+    @property
+    def periods(self):
+        """
+        Number of installments per loan.
+        """
+        return np.maximum(self.duration_months // self.months_in_period, 1)
+
+    @property
+    def payment_cents(self):
+        """
+        Regular installment amount per loan, in cents, rounded half to even.
+        """
+        quotient, remainder = np.divmod(self.total_cents, self.periods)
+        twice = 2 * remainder
+        round_up = (twice > self.periods) | (
+            (twice == self.periods) & (quotient % 2 == 1)
+        )
+        return quotient + round_up
+
+    @property
+    def last_payment_cents(self):
+        """
+        Last installment amount per loan, absorbing the rounding remainder.
+        """
+        return self.total_cents - self.payment_cents * (self.periods - 1)
+
+    def due_dates(self, sequence):
+        """
+        Due date of the ``sequence``-th installment (1-based) of every loan.
+        Loans with fewer installments get ``NaT``.
+        """
+        dates = self.start_date + (self.days_in_period * sequence).astype(
+            "timedelta64[D]"
+        )
+        return np.where(sequence <= self.periods, dates, np.datetime64("NaT"))
+
+    def build_installments(self):
+        """
+        Build unsaved Installment instances for every loan of the portfolio.
+        """
+        if self.ids is None:
+            raise ValueError("Loan ids are required to build installments.")
+        periods = self.periods
+        payment = self.payment_cents
+        last_payment = self.last_payment_cents
+        installments = []
+        for index, loan_id in enumerate(self.ids.tolist()):
+            period_name = PERIODS.get(self.payment_schedule[index], ("Period",))[0]
+            start_date = self.start_date[index].item()
+            days = int(self.days_in_period[index])
+            count = int(periods[index])
+            for sequence in range(1, count + 1):
+                cents = last_payment[index] if sequence == count else payment[index]
+                installments.append(
+                    Installment(
+                        loan_id=loan_id,
+                        sequence=sequence,
+                        period=f"{period_name} {sequence}",
+                        due_date=start_date + timedelta(days=days * sequence),
+                        amount=Decimal(int(cents)).scaleb(-2),
+                    )
+                )
+        return installments
@@ -0,0 +1,250 @@
+import time
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from config.apps.search.outbox import enqueue, update_index
+
+from . import ledger
+from .activity import buffered_activities
+from .models import (
+    Installment,
+    LedgerAccount,
+    LedgerEntry,
+    Loan,
+    Wallet,
+    WalletActivity,
+)
+from .signals import clear_loans_cache, clear_wallets_cache
+
+OPEN_STATUSES = [Installment.Status.UNPAID, Installment.Status.OVERDUE]
+# Loans still owing money: overdue loans keep being collected and charged
+# late fees until they are repaid.
+COLLECTIBLE_STATUSES = [Loan.Status.IN_PROGRESS, Loan.Status.OVERDUE]
+
+
+def due_installments(as_of):
+    """
+    Installments of collectible loans that are due before ``as_of`` and not paid yet.
+    """
+    return Installment.objects.filter(
+        due_date__lt=as_of,
+        status__in=OPEN_STATUSES,
+        loan__status__in=COLLECTIBLE_STATUSES,
+    )
+
+
+def settle_due_installments(as_of=None, chunk_size=500):
+    """
+    Collect every due installment from the client's wallet, chunk by chunk.
+
+    Loans are walked in primary key order; each chunk is settled in its own
+    transaction so a failure only rolls back that chunk. Returns a report
+    with the processed counts and the elapsed time in seconds.
+    """
+    as_of = as_of or timezone.now().date()
+    report = {
+        "loans": 0,
+        "installments_paid": 0,
+        "installments_overdue": 0,
+        "amount_collected": Decimal("0.00"),
+        "elapsed": 0.0,
+    }
+    started = time.perf_counter()
+    last_loan_id = 0
+    while True:
+        loan_ids = list(
+            due_installments(as_of)
+            .filter(loan_id__gt=last_loan_id)
+            .order_by("loan_id")
+            .values_list("loan_id", flat=True)
+            .distinct()[:chunk_size]
+        )
+        if not loan_ids:
+            break
+        last_loan_id = loan_ids[-1]
+        _settle_chunk(loan_ids, as_of, report)
+
+    report["elapsed"] = time.perf_counter() - started
+    return report
+
+
+@buffered_activities()
+def _settle_chunk(loan_ids, as_of, report):
+    """
+    Settle the due installments of one chunk of loans with bulk writes.
+    """
+    loans = {
+        loan.id: loan
+        for loan in Loan.objects.select_for_update().filter(
+            id__in=loan_ids, status__in=COLLECTIBLE_STATUSES
+        )
+    }
+    wallets = {
+        wallet.user_id: wallet
+        for wallet in Wallet.objects.select_for_update(of=("self",))
+        .select_related("user")
+        .filter(user_id__in={loan.client_id for loan in loans.values()})
+    }
+    installments = list(
+        Installment.objects.select_for_update()
+        .filter(loan_id__in=list(loans), due_date__lt=as_of, status__in=OPEN_STATUSES)
+        .order_by("loan_id", "sequence")
+    )
+
+    receivables = ledger.loan_accounts(loans.values())
+    wallet_accounts = ledger.wallet_accounts(wallets.values())
+    fee_income = ledger.system_account(LedgerAccount.Kind.FEE_INCOME)
+
+    entries = []
+    defaulted_loans = set()
+    for installment in installments:
+        loan = loans[installment.loan_id]
+        wallet = wallets.get(loan.client_id)
+        outstanding = installment.amount - installment.amount_paid
+        # Installments are paid oldest first: once one cannot be covered,
+        # the later ones of the same loan are left overdue as well.
+        if (
+            loan.id not in defaulted_loans
+            and wallet is not None
+            and wallet.balance >= outstanding
+        ):
+            wallet.balance -= outstanding
+            loan.amount_paid = (loan.amount_paid or Decimal(0)) + outstanding
+            installment.amount_paid = installment.amount
+            installment.status = Installment.Status.PAID
+            WalletActivity.log_activity(wallet, "subtract", outstanding)
+            entries.append(
+                LedgerEntry(
+                    kind=LedgerEntry.Kind.REPAYMENT,
+                    debit_account=wallet_accounts[wallet.id],
+                    credit_account=receivables[loan.id],
+                    amount=outstanding,
+                )
+            )
+            report["installments_paid"] += 1
+            report["amount_collected"] += outstanding
+        else:
+            defaulted_loans.add(loan.id)
+            late_payment_fee = (
+                Decimal(loan.penalty_rate) * installment.overdue_days(as_of)
+            ).quantize(Decimal("0.00"))
+            fee_change = late_payment_fee - installment.late_payment_fee
+            loan.late_payment_fee += fee_change
+            installment.late_payment_fee = late_payment_fee
+            if fee_change:
+                # A lower fee, e.g. after a backdated run, reverses the excess.
+                accounts = (receivables[loan.id], fee_income)
+                if fee_change < 0:
+                    accounts = accounts[::-1]
+                entries.append(
+                    LedgerEntry(
+                        kind=LedgerEntry.Kind.LATE_FEE,
+                        debit_account=accounts[0],
+                        credit_account=accounts[1],
+                        amount=abs(fee_change),
+                    )
+                )
+            installment.status = Installment.Status.OVERDUE
+            report["installments_overdue"] += 1
+
+    now = timezone.now()
+    for loan in loans.values():
+        if loan.is_fully_repaid():
+            loan.status = Loan.Status.REPAID
+        loan.updated_at = now
+
+    Installment.objects.bulk_update(
+        installments, ["amount_paid", "status", "late_payment_fee"]
+    )
+    Loan.objects.bulk_update(
+        loans.values(), ["amount_paid", "late_payment_fee", "status", "updated_at"]
+    )
+    Wallet.objects.bulk_update(wallets.values(), ["balance"])
+    ledger.post(entries)
+    update_index(Loan, list(loans.values()))
+    update_index(Wallet, list(wallets.values()))
+    user_ids = [loan.client_id for loan in loans.values()]
+    transaction.on_commit(lambda: clear_loans_cache(user_ids))
+    transaction.on_commit(lambda: clear_wallets_cache(user_ids))
+    report["loans"] += len(loans)
+
+
+def _update_statuses(queryset, status, now, chunk_size=2000):
+    """
+    Set ``status`` on the loans of the queryset and return the (id, client_id)
+    pairs of the changed rows.
+
+    PostgreSQL does it in one UPDATE ... RETURNING. Elsewhere the matching
+    loans are locked and updated ``chunk_size`` ids at a time, which keeps
+    the parameter lists under the database's limit.
+    """
+    if connection.vendor == "postgresql":
+        quote_name = connection.ops.quote_name
+        subquery, params = queryset.values("id").query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {quote_name(Loan._meta.db_table)} "
+                f"SET {quote_name('status')} = %s, {quote_name('updated_at')} = %s "
+                f"WHERE {quote_name('id')} IN ({subquery}) "
+                f"RETURNING {quote_name('id')}, {quote_name('client_id')}",
+                [status, now, *params],
+            )
+            return cursor.fetchall()
+
+    changed = []
+    last_id = 0
+    while True:
+        chunk = list(
+            queryset.select_for_update()
+            .filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", "client_id")[:chunk_size]
+        )
+        if not chunk:
+            return changed
+        Loan.objects.filter(id__in=[loan_id for loan_id, _ in chunk]).update(
+            status=status, updated_at=now
+        )
+        changed += chunk
+        last_id = chunk[-1][0]
+
+
+@transaction.atomic
+def sweep_loan_statuses(as_of=None, chunk_size=2000):
+    """
+    Flip active loans to REPAID or OVERDUE with set-based UPDATEs.
+
+    Fully paid loans are marked REPAID first, so a loan paid off after its
+    end date is never reported overdue. Returns the number of loans moved to
+    each status and the elapsed time in seconds.
+    """
+    as_of = as_of or timezone.now().date()
+    now = timezone.now()
+    started = time.perf_counter()
+    repaid = _update_statuses(
+        Loan.objects.filter(
+            status__in=COLLECTIBLE_STATUSES, amount_paid__gte=F("total_amount")
+        ),
+        Loan.Status.REPAID,
+        now,
+        chunk_size,
+    )
+    overdue = _update_statuses(
+        Loan.objects.filter(status=Loan.Status.IN_PROGRESS, end_date__lt=as_of),
+        Loan.Status.OVERDUE,
+        now,
+        chunk_size,
+    )
+
+    changed = repaid + overdue
+    enqueue(Loan, [loan_id for loan_id, _ in changed])
+    user_ids = {client_id for _, client_id in changed}
+    transaction.on_commit(lambda: clear_loans_cache(user_ids))
+    return {
+        "repaid": len(repaid),
+        "overdue": len(overdue),
+        "elapsed": time.perf_counter() - started,
+    }
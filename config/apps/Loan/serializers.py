@@ -2,11 +2,12 @@ from decimal import Decimal
 
 from rest_framework import serializers
 
-from .models import Loan, Wallet, WalletActivity
-from .utils import PaymentPlanCalculator
+from .models import Installment, Loan, Wallet, WalletActivity
 
 
 class WalletActivitySerializer(serializers.ModelSerializer):
+    description = serializers.CharField(source="get_description", read_only=True)
+
     class Meta:
         model = WalletActivity
         fields = [
@@ -19,24 +20,36 @@ class WalletActivitySerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
-class PaymentPlanSerializer(serializers.Serializer):
+class InstallmentSerializer(serializers.ModelSerializer):
     """
-    Serializer for generating and displaying the payment plan of a loan.
+    Serializer for displaying the persisted payment plan of a loan.
     """
 
-    period = serializers.CharField()
-    due_date = serializers.DateField()
-    payment_amount = serializers.DecimalField(max_digits=20, decimal_places=2)
-    amount_paid = serializers.DecimalField(max_digits=20, decimal_places=2)
-    status = serializers.CharField()
-    overdue_days = serializers.IntegerField(required=False)
-    late_payment_fee = serializers.DecimalField(
-        max_digits=10, decimal_places=2, required=False
+    payment_amount = serializers.DecimalField(
+        source="amount", max_digits=20, decimal_places=2
     )
+    overdue_days = serializers.IntegerField()
+
+    class Meta:
+        model = Installment
+        fields = [
+            "period",
+            "due_date",
+            "payment_amount",
+            "amount_paid",
+            "status",
+            "overdue_days",
+            "late_payment_fee",
+        ]
+        read_only_fields = fields
 
 
 class WalletSerializer(serializers.ModelSerializer):
-    activities = WalletActivitySerializer(many=True, read_only=True)
+    # Only the most recent activities are nested; the viewset prefetches them
+    # into ``recent_activities`` so a page of wallets costs a single query.
+    recent_activities_limit = 20
+
+    activities = serializers.SerializerMethodField()
 
     class Meta:
         model = Wallet
@@ -50,6 +63,14 @@ class WalletSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "balance", "activities"]
 
+    def get_activities(self, obj):
+        activities = getattr(obj, "recent_activities", None)
+        if activities is None:
+            activities = obj.activities.order_by("-timestamp", "-id")[
+                : self.recent_activities_limit
+            ]
+        return WalletActivitySerializer(activities, many=True).data
+
     def add_balance(self, amount: Decimal):
         wallet = self.instance
         wallet.add_balance(amount)
@@ -61,15 +82,48 @@ class WalletSerializer(serializers.ModelSerializer):
         return wallet
 
 
-class LoansforelasticSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Loan
-        fields = [
-            "amount",
-            "interest_rate",
-            "status",
-            "description",
-        ]
+class BulkApproveSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=10000
+    )
+    background = serializers.BooleanField(default=False)
+
+
+class LoanSearchSerializer(serializers.Serializer):
+    """
+    Query parameters of the loan search endpoint.
+    """
+
+    max_result_window = 10000
+
+    q = serializers.CharField(required=False, allow_blank=True)
+    status = serializers.MultipleChoiceField(
+        choices=Loan.Status.choices, required=False
+    )
+    amount_min = serializers.DecimalField(
+        max_digits=20, decimal_places=2, required=False
+    )
+    amount_max = serializers.DecimalField(
+        max_digits=20, decimal_places=2, required=False
+    )
+    interest_rate_min = serializers.FloatField(required=False)
+    interest_rate_max = serializers.FloatField(required=False)
+    client = serializers.IntegerField(min_value=1, required=False)
+    page_size = serializers.IntegerField(min_value=1, max_value=100, default=20)
+    search_after = serializers.CharField(required=False)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # "from" is a Python keyword, so it cannot be declared as an attribute.
+        fields["from"] = serializers.IntegerField(min_value=0, default=0)
+        return fields
+
+    def validate(self, attrs):
+        if attrs["from"] + attrs["page_size"] > self.max_result_window:
+            raise serializers.ValidationError(
+                {"from": "Use search_after to page beyond 10000 results."}
+            )
+        return attrs
 
 
 class LoanSerializer(serializers.ModelSerializer):
@@ -136,8 +190,6 @@ class LoanSerializer(serializers.ModelSerializer):
 
     def get_payment_plan(self, obj):
         """
-        Generate the payment plan for the loan instance.
+        Return the installments materialized when the loan was approved.
         """
-        calculator = PaymentPlanCalculator(obj)
-        payment_plan = calculator.get_payment_status()
-        return PaymentPlanSerializer(payment_plan, many=True).data
+        return InstallmentSerializer(obj.installments.all(), many=True).data
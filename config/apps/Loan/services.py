@@ -0,0 +1,209 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db import connection, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from config.apps.search.outbox import update_index
+
+from . import ledger
+from .activity import buffered_activities
+from .models import (
+    Installment,
+    LedgerAccount,
+    LedgerEntry,
+    Loan,
+    Wallet,
+    WalletActivity,
+)
+from .signals import clear_loans_cache, clear_wallets_cache
+
+
+class InsufficientBalance(ValueError):
+    """Raised when a debit would take a wallet balance below zero."""
+
+
+def _apply_balance_delta(wallet, delta: Decimal):
+    """
+    Add ``delta`` to the wallet balance in a single conditional UPDATE.
+
+    The ``balance + delta >= 0`` guard is evaluated by the database on the
+    locked row, so concurrent workers can never lose an update or overdraw
+    the wallet. Returns the new balance, or None when the guard rejected it.
+    PostgreSQL returns it from the UPDATE itself; elsewhere it is read back
+    from the row, still locked by the transaction.
+    """
+    if connection.vendor == "postgresql":
+        quote_name = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {quote_name(Wallet._meta.db_table)} "
+                f"SET {quote_name('balance')} = {quote_name('balance')} + %s "
+                f"WHERE {quote_name('id')} = %s AND {quote_name('balance')} + %s >= 0 "
+                f"RETURNING {quote_name('balance')}",
+                [delta, wallet.pk, delta],
+            )
+            row = cursor.fetchone()
+        return None if row is None else row[0]
+
+    updated = Wallet.objects.filter(pk=wallet.pk, balance__gte=-delta).update(
+        balance=F("balance") + delta
+    )
+    if not updated:
+        return None
+    return Wallet.objects.values_list("balance", flat=True).get(pk=wallet.pk)
+
+
+def _wallet_changed(wallet):
+    """
+    Stand in for the post_save side effects skipped by the direct UPDATE.
+    Must run inside the transaction that changed the wallet.
+    """
+    update_index(Wallet, [wallet])
+    transaction.on_commit(lambda: clear_wallets_cache([wallet.user_id]))
+
+
+def credit_wallet(wallet, amount: Decimal, activity_type="add"):
+    """
+    Atomically add funds to a wallet and log the activity in the same transaction.
+    """
+    with buffered_activities():
+        balance = _apply_balance_delta(wallet, amount)
+        if balance is None:
+            raise Wallet.DoesNotExist("Wallet matching query does not exist.")
+        wallet.balance = balance
+        ledger.deposit(wallet, amount)
+        WalletActivity.log_activity(
+            wallet=wallet, activity_type=activity_type, amount=amount
+        )
+        _wallet_changed(wallet)
+    return wallet.balance
+
+
+def debit_wallet(wallet, amount: Decimal, activity_type="subtract"):
+    """
+    Atomically subtract funds from a wallet and log the activity in the same
+    transaction. Raises InsufficientBalance if the balance does not cover it.
+    """
+    with buffered_activities():
+        balance = _apply_balance_delta(wallet, -amount)
+        if balance is None:
+            raise InsufficientBalance("Insufficient balance.")
+        wallet.balance = balance
+        ledger.withdraw(wallet, amount)
+        WalletActivity.log_activity(
+            wallet=wallet, activity_type=activity_type, amount=amount
+        )
+        _wallet_changed(wallet)
+    return wallet.balance
+
+
+def approve_loans(loan_ids, approval_date=None, chunk_size=500):
+    """
+    Approve and disburse pending loans in a single transaction.
+
+    Loans are updated with bulk_update, each client wallet is credited with
+    one set-based UPDATE per chunk, and the wallet activities, buffered, and
+    the installments are bulk created. Cache invalidation and the search outbox entries are
+    written once for the batch.
+    Loans that are not pending are skipped. Returns the approved loans.
+    """
+    approval_date = approval_date or timezone.now().date()
+    with buffered_activities():
+        loans = list(
+            Loan.objects.select_for_update(of=("self",))
+            .select_related("client")
+            .filter(id__in=loan_ids, status=Loan.Status.PENDING)
+            .order_by("id")
+        )
+        if not loans:
+            return []
+
+        now = timezone.now()
+        credits = defaultdict(Decimal)
+        for loan in loans:
+            loan.approval_date = approval_date
+            loan.status = Loan.Status.IN_PROGRESS
+            loan.total_amount = loan.total_amount_to_pay()
+            if not loan.end_date:
+                loan.end_date = approval_date + relativedelta(
+                    months=loan.duration_months
+                )
+            loan.updated_at = now
+            credits[loan.client_id] += loan.amount
+        Loan.objects.bulk_update(
+            loans,
+            ["approval_date", "status", "total_amount", "end_date", "updated_at"],
+        )
+
+        Wallet.objects.bulk_create(
+            [Wallet(user_id=user_id) for user_id in credits], ignore_conflicts=True
+        )
+        user_ids = list(credits)
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[start : start + chunk_size]
+            Wallet.objects.filter(user_id__in=chunk).update(
+                balance=F("balance")
+                + Case(
+                    *[
+                        When(user_id=user_id, then=Value(credits[user_id]))
+                        for user_id in chunk
+                    ],
+                    output_field=Wallet._meta.get_field("balance"),
+                )
+            )
+        wallets = {
+            wallet.user_id: wallet
+            for wallet in Wallet.objects.select_related("user").filter(
+                user_id__in=user_ids
+            )
+        }
+        for loan in loans:
+            WalletActivity.log_activity(wallets[loan.client_id], "add", loan.amount)
+        # Imported here: numpy is only loaded by processes that approve loans.
+        from .portfolio import PortfolioCalculator
+
+        Installment.objects.bulk_create(
+            PortfolioCalculator.from_loans(loans).build_installments()
+        )
+        ledger.post(_disbursement_entries(loans, wallets))
+        update_index(Loan, loans)
+        update_index(Wallet, list(wallets.values()))
+
+    clear_loans_cache(user_ids)
+    clear_wallets_cache(user_ids)
+    return loans
+
+
+def _disbursement_entries(loans, wallets):
+    """
+    Journal entries of approved loans: the principal paid into the client's
+    wallet and the interest booked as income, both owed on the receivable.
+    """
+    receivables = ledger.loan_accounts(loans)
+    wallet_accounts = ledger.wallet_accounts(wallets.values())
+    fee_income = ledger.system_account(LedgerAccount.Kind.FEE_INCOME)
+    entries = []
+    for loan in loans:
+        receivable = receivables[loan.id]
+        entries.append(
+            LedgerEntry(
+                kind=LedgerEntry.Kind.DISBURSEMENT,
+                debit_account=receivable,
+                credit_account=wallet_accounts[wallets[loan.client_id].id],
+                amount=loan.amount,
+            )
+        )
+        interest = loan.total_amount - loan.amount
+        if interest > 0:
+            entries.append(
+                LedgerEntry(
+                    kind=LedgerEntry.Kind.INTEREST,
+                    debit_account=receivable,
+                    credit_account=fee_income,
+                    amount=interest,
+                )
+            )
+    return entries
@@ -1,17 +1,50 @@
 from django.core.cache import cache
+from django.db import transaction
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
 
+from config.apps.authantification.models import User
+
+from .cache import invalidate_list_cache, token_cache_key
 from .models import Loan, Wallet
 
 
+def clear_loans_cache(user_ids):
+    invalidate_list_cache("loans_list", user_ids)
+
+
+def clear_wallets_cache(user_ids):
+    invalidate_list_cache("wallet_list", user_ids)
+
+
 @receiver([post_delete, post_save], sender=Loan)
-def handle_loan_cache_clear(sender, instance, created, **kwargs):
-    print(" cleaning  loans cache")
-    cache.delete_pattern("*loans_list*")
+def handle_loan_cache_clear(sender, instance, **kwargs):
+    transaction.on_commit(lambda: clear_loans_cache([instance.client_id]))
 
 
 @receiver([post_delete, post_save], sender=Wallet)
 def handler_wallet_cache_clear(sender, instance, **kwargs):
-    print(" cleaning  wallets cache  ")
-    cache.delete_pattern("*wallet_list*")
+    transaction.on_commit(lambda: clear_wallets_cache([instance.user_id]))
+
+
+@receiver(post_delete, sender=Token)
+def handle_token_cache_clear(sender, instance, **kwargs):
+    # The key is the primary key, which delete() clears before the commit.
+    cache_key = token_cache_key(instance.key)
+    transaction.on_commit(lambda: cache.delete(cache_key))
+
+
+@receiver(post_save, sender=User)
+def handle_user_token_cache_clear(sender, instance, update_fields=None, **kwargs):
+    # Cached tokens carry the staff flag and were issued to an active user.
+    if update_fields is not None and not {"is_active", "is_staff"} & update_fields:
+        return
+    cache_keys = [
+        token_cache_key(key)
+        for key in Token.objects.filter(user_id=instance.pk).values_list(
+            "key", flat=True
+        )
+    ]
+    if cache_keys:
+        transaction.on_commit(lambda: cache.delete_many(cache_keys))
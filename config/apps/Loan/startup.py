@@ -0,0 +1,63 @@
+import os
+import re
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+
+# Run in a fresh interpreter: boots Django and prints how long it took.
+PROBE = (
+    "import time; started = time.perf_counter(); import django; "
+    "django.setup(); print(time.perf_counter() - started)"
+)
+IMPORT_LINE = re.compile(r"import time:\s+(?P<self>\d+) \|\s+\d+ \|\s+(?P<module>\S+)")
+
+
+def group(module):
+    """
+    The app or distribution an imported module is accounted to: the project
+    apps by app, everything else by top-level package.
+    """
+    parts = module.split(".")
+    if parts[:2] == ["config", "apps"] and len(parts) > 2:
+        return ".".join(parts[:3])
+    return parts[0]
+
+
+def _probe(role, *flags):
+    env = {
+        **os.environ,
+        "DJANGO_APP_ROLE": role,
+        "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE,
+    }
+    return subprocess.run(
+        [sys.executable, *flags, "-c", PROBE],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def profile_role(role, repeat=3):
+    """
+    Cold start of a process role: the best ``django.setup()`` time out of
+    ``repeat`` fresh interpreters, and the self import time in milliseconds
+    of each app or package, from one more run under ``-X importtime``.
+    """
+    timings = [
+        float(_probe(role).stdout.strip().splitlines()[-1]) for _ in range(repeat)
+    ]
+    imports = Counter()
+    for line in _probe(role, "-X", "importtime").stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            imports[group(match["module"])] += int(match["self"])
+    return {
+        "setup_s": round(min(timings), 3),
+        "imports_ms": {
+            name: round(microseconds / 1000, 1)
+            for name, microseconds in imports.most_common()
+        },
+    }
@@ -0,0 +1,60 @@
+from datetime import date
+
+from celery import shared_task
+
+from config.celery import IdempotentTask
+
+from . import activity, ledger, repayments, services
+
+
+@shared_task(base=IdempotentTask)
+def approve_loans(loan_ids):
+    """
+    Approve and disburse pending loans in the background.
+    """
+    approved = [loan.id for loan in services.approve_loans(loan_ids)]
+    return {"approved": approved, "skipped": sorted(set(loan_ids) - set(approved))}
+
+
+@shared_task(base=IdempotentTask)
+def settle_due_installments(as_of=None, chunk_size=500):
+    """
+    Collect due installments; ``as_of`` is an ISO date, defaulting to today.
+    """
+    as_of = date.fromisoformat(as_of) if as_of else None
+    report = repayments.settle_due_installments(as_of=as_of, chunk_size=chunk_size)
+    report["amount_collected"] = str(report["amount_collected"])
+    return report
+
+
+@shared_task(base=IdempotentTask)
+def sweep_loan_statuses(as_of=None):
+    """
+    Move active loans to REPAID or OVERDUE; ``as_of`` is an ISO date.
+    """
+    as_of = date.fromisoformat(as_of) if as_of else None
+    return repayments.sweep_loan_statuses(as_of=as_of)
+
+
+@shared_task
+def ensure_activity_partitions(ahead=3):
+    """
+    Create the coming monthly partitions of a partitioned activity table.
+    """
+    if not activity.is_partitioned():
+        return []
+    return activity.ensure_partitions(ahead=ahead)
+
+
+@shared_task(base=IdempotentTask)
+def take_balance_snapshots():
+    """
+    Snapshot every ledger account at midnight and reconcile from there.
+    """
+    taken = ledger.take_snapshots()
+    report = ledger.reconcile()
+    return {
+        "snapshots": taken,
+        "mismatched_accounts": [row["id"] for row in report["accounts"]],
+        "mismatched_wallets": [row["wallet_id"] for row in report["wallets"]],
+    }
@@ -1,11 +1,82 @@
+import json
+import sys
+import time
+from base64 import urlsafe_b64encode
+from collections import Counter
 from decimal import Decimal
+from unittest import mock
 
-from django.test import TestCase
+from asgiref.sync import async_to_sync, sync_to_async
+from celery.exceptions import Retry
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
+from elastic_transport import NodeConfig, Transport
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
 
 from config.apps.authantification.models import User
+from config.apps.search.transport import TimedTransport
+from config.db_router import ReplicaRouter, _read_from
+from config.profiling import (
+    collapsed_stacks,
+    profile_requested,
+    recent_profiles,
+    should_record,
+    sign_profile_header,
+    store_profile,
+)
 
-from .models import Loan, Wallet, WalletActivity
+from . import async_views, benchmark, ledger, metrics, services, startup, tasks
+from .activity import buffered_activities
+from .cache import get_cache_stats, get_cache_version, get_task_stats
+from .models import (
+    BalanceSnapshot,
+    Installment,
+    LedgerAccount,
+    LedgerEntry,
+    Loan,
+    Wallet,
+    WalletActivity,
+)
+from .portfolio import PERIODS, PortfolioCalculator
+from .repayments import settle_due_installments, sweep_loan_statuses
+from .serializers import LoanSearchSerializer, LoanSerializer
+from .views import LoanAnalyticsAPIView, LoanSearchAPIView, WalletViewSet
+
+
+def app_queries(captured):
+    """Queries issued by the application, leaving out Silk's own bookkeeping."""
+    return [
+        query
+        for query in captured.captured_queries
+        if "silk_" not in query["sql"] and not query["sql"].startswith("EXPLAIN")
+    ]
+
+
+class QueryBudgetMixin:
+    """
+    Assert that list endpoints issue a bounded number of queries, whatever
+    the number of rows on the page.
+    """
+
+    def assertListQueryBudget(self, client, url, budget):
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(url, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, 200)
+        queries = [
+            query for query in app_queries(captured) if "SAVEPOINT" not in query["sql"]
+        ]
+        self.assertLessEqual(
+            len(queries),
+            budget,
+            f"{url} issued {len(queries)} queries, budget is {budget}:\n"
+            + "\n".join(query["sql"] for query in queries),
+        )
+        return response
 
 
 class LoanModelTestCase(TestCase):
@@ -33,18 +104,19 @@ class LoanModelTestCase(TestCase):
         self.loan.save()
         self.assertEqual(self.loan.remaining_amount(), Decimal("605.00"))
 
-    #     def test_loan_status_update(self):
-    #         """Test status update for fully repaid and overdue loans."""
-    #         # Fully repaid loan
-    #         self.loan.amount_paid = self.loan.total_amount_to_pay()
-    #         self.loan.save()
-    #         self.assertEqual(self.loan.status, Loan.Status.REPAID)
+    def test_loan_status_update(self):
+        """Test status update for fully repaid and overdue loans."""
+        # Fully repaid loan
+        self.loan.amount_paid = self.loan.total_amount_to_pay()
+        self.loan.save()
+        self.assertEqual(self.loan.status, Loan.Status.REPAID)
 
-    # #         # Overdue loan
-    #         self.loan.status = Loan.Status.IN_PROGRESS
-    #         self.loan.end_date = timezone.now().date() - timezone.timedelta(days=1)
-    #         self.loan.save()
-    #         self.assertEqual(self.loan.status, Loan.Status.OVERDUE)
+        # Overdue loan
+        self.loan.status = Loan.Status.IN_PROGRESS
+        self.loan.amount_paid = Decimal("0.00")
+        self.loan.end_date = timezone.now().date() - timezone.timedelta(days=1)
+        self.loan.save()
+        self.assertEqual(self.loan.status, Loan.Status.OVERDUE)
 
     # def test_wallet_creation_on_loan(self):
     #     """Test wallet creation when a loan is created."""
@@ -83,10 +155,22 @@ class WalletModelTestCase(TestCase):
         self.wallet.refresh_from_db()
         self.assertEqual(self.wallet.balance, Decimal("700.00"))
 
-    # def test_wallet_insufficient_balance(self):
-    #     """Test subtracting more than the available balance."""
-    #     with self.assertRaises(ValueError):
-    #         self.wallet.subtract_balance(Decimal("2000.00"))
+    def test_wallet_insufficient_balance(self):
+        """Test subtracting more than the available balance."""
+        with self.assertRaises(ValueError):
+            self.wallet.subtract_balance(Decimal("2000.00"))
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal("1000.00"))
+        self.assertFalse(WalletActivity.objects.filter(wallet=self.wallet).exists())
+
+    def test_wallet_stale_instances_do_not_lose_updates(self):
+        """Test concurrent-style updates through stale instances all apply."""
+        stale = Wallet.objects.get(pk=self.wallet.pk)
+        self.wallet.add_balance(Decimal("500.00"))
+        stale.add_balance(Decimal("250.00"))
+        self.assertEqual(stale.balance, Decimal("1750.00"))
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal("1750.00"))
 
     def test_wallet_activity_logging(self):
         """Test that wallet activities are logged correctly."""
@@ -112,4 +196,1431 @@ class WalletActivityModelTestCase(TestCase):
         self.assertEqual(activity.wallet, self.wallet)
         self.assertEqual(activity.activity_type, "add")
         self.assertEqual(activity.amount, Decimal("200.00"))
-        self.assertIn("Activity: add", activity.description)
+        self.assertIn("Activity: add", activity.get_description())
+
+    def test_buffered_activities_are_written_in_one_insert(self):
+        """Test balance changes in a buffered block share one bulk INSERT."""
+        with CaptureQueriesContext(connection) as captured:
+            with buffered_activities():
+                for _ in range(5):
+                    self.wallet.add_balance(Decimal("10.00"))
+                self.assertFalse(WalletActivity.objects.exists())
+        inserts = [
+            query
+            for query in app_queries(captured)
+            if query["sql"].startswith('INSERT INTO "Loan_walletactivity"')
+        ]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(WalletActivity.objects.filter(wallet=self.wallet).count(), 5)
+
+    def test_buffered_activities_roll_back_with_the_block(self):
+        """Test queued activities are discarded when the block fails."""
+        with self.assertRaises(ValueError):
+            with buffered_activities():
+                self.wallet.add_balance(Decimal("10.00"))
+                self.wallet.subtract_balance(Decimal("5000.00"))
+        self.assertFalse(WalletActivity.objects.exists())
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal("500.00"))
+
+    def test_description_is_derived_at_read_time(self):
+        """Test no description is stored and reading it needs no user query."""
+        WalletActivity.log_activity(self.wallet, "add", Decimal("200.00"))
+        activity = WalletActivity.objects.select_related("wallet__user").get()
+        self.assertIsNone(activity.description)
+        with self.assertNumQueries(0):
+            description = activity.get_description()
+        self.assertEqual(
+            description,
+            f"Wallet: {self.user.email}'s Wallet, Activity: add, Amount: 200.00",
+        )
+
+
+class InstallmentTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="installmentuser",
+            email="installment@example.com",
+            password="password123",
+        )
+        self.wallet = Wallet.objects.create(user=self.user)
+        self.loan = Loan.objects.create(
+            client=self.user,
+            amount=Decimal("1000.00"),
+            interest_rate=10.5,
+            duration_months=12,
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def test_approve_materializes_installments(self):
+        """Test approving a loan persists its payment plan."""
+        response = self.api.post(f"/loans/{self.loan.id}/approve/")
+        self.assertEqual(response.status_code, 200)
+        installments = Installment.objects.filter(loan=self.loan)
+        self.assertEqual(installments.count(), 12)
+        self.assertEqual(
+            sum(installment.amount for installment in installments),
+            Decimal("1105.00"),
+        )
+
+    def test_approve_twice_is_rejected(self):
+        """Test approving a loan that is no longer pending returns 400."""
+        self.api.post(f"/loans/{self.loan.id}/approve/")
+        response = self.api.post(f"/loans/{self.loan.id}/approve/")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Installment.objects.filter(loan=self.loan).count(), 12)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal("1000.00"))
+
+    def test_payment_plan_read_does_not_write(self):
+        """Test serializing a loan only reads the persisted installments."""
+        self.api.post(f"/loans/{self.loan.id}/approve/")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get(f"/loans/{self.loan.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["payment_plan"]), 12)
+        self.assertFalse(
+            any(
+                query["sql"].startswith(
+                    ('INSERT INTO "Loan_', 'UPDATE "Loan_', 'DELETE FROM "Loan_')
+                )
+                for query in queries.captured_queries
+            )
+        )
+
+
+class RepaymentEngineTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="repaymentuser",
+            email="repayment@example.com",
+            password="password123",
+        )
+        self.wallet = Wallet.objects.create(user=self.user)
+        self.loan = Loan.objects.create(
+            client=self.user,
+            amount=Decimal("1000.00"),
+            interest_rate=10.5,
+            duration_months=12,
+            start_date=timezone.now().date() - timezone.timedelta(days=100),
+            status=Loan.Status.IN_PROGRESS,
+        )
+        Installment.objects.bulk_create(
+            PortfolioCalculator.from_loans([self.loan]).build_installments()
+        )
+
+    def test_settle_due_installments_debits_wallet(self):
+        """Test due installments are collected from the wallet in bulk."""
+        self.wallet.add_balance(Decimal("1000.00"))
+        report = settle_due_installments()
+        self.loan.refresh_from_db()
+        self.wallet.refresh_from_db()
+        self.assertEqual(report["loans"], 1)
+        self.assertEqual(report["installments_paid"], 3)
+        self.assertEqual(self.loan.amount_paid, Decimal("276.24"))
+        self.assertEqual(self.wallet.balance, Decimal("723.76"))
+        self.assertEqual(
+            WalletActivity.objects.filter(
+                wallet=self.wallet, activity_type="subtract"
+            ).count(),
+            3,
+        )
+
+    def test_settle_due_installments_is_idempotent(self):
+        """Test a second run neither debits again nor double counts late fees."""
+        settle_due_installments()
+        settle_due_installments()
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.amount_paid, Decimal("0.00"))
+        # 70, 40 and 10 days overdue at 1.5 per day.
+        self.assertEqual(self.loan.late_payment_fee, Decimal("180.00"))
+        self.assertEqual(
+            Installment.objects.filter(
+                loan=self.loan, status=Installment.Status.OVERDUE
+            ).count(),
+            3,
+        )
+
+    def test_overdue_loans_are_still_collected(self):
+        """Test a loan swept to OVERDUE is still charged fees and debited."""
+        Loan.objects.filter(id=self.loan.id).update(
+            end_date=timezone.now().date() - timezone.timedelta(days=1)
+        )
+        self.assertEqual(sweep_loan_statuses()["overdue"], 1)
+        settle_due_installments()
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.status, Loan.Status.OVERDUE)
+        self.assertEqual(self.loan.late_payment_fee, Decimal("180.00"))
+
+        self.wallet.add_balance(Decimal("1000.00"))
+        report = settle_due_installments()
+        self.loan.refresh_from_db()
+        self.assertEqual(report["installments_paid"], 3)
+        self.assertEqual(self.loan.amount_paid, Decimal("276.24"))
+
+
+class PortfolioCalculatorTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="portfoliouser",
+            email="portfolio@example.com",
+            password="password123",
+        )
+        Wallet.objects.create(user=self.user)
+        self.loans = [
+            Loan.objects.create(
+                client=self.user,
+                amount=amount,
+                interest_rate=interest_rate,
+                duration_months=duration_months,
+                payment_schedule=payment_schedule,
+                status=Loan.Status.IN_PROGRESS,
+            )
+            for amount, interest_rate, duration_months, payment_schedule in [
+                (Decimal("1000.00"), 10.5, 12, Loan.PaymentSchedule.MONTHLY),
+                (Decimal("2500.55"), 7.25, 9, Loan.PaymentSchedule.QUARTERLY),
+                (Decimal("99999.99"), 13.3, 36, Loan.PaymentSchedule.ANNUALLY),
+                (Decimal("10.01"), 0.0, 1, Loan.PaymentSchedule.QUARTERLY),
+            ]
+        ]
+        self.calculator = PortfolioCalculator.from_queryset(Loan.objects.order_by("id"))
+
+    def test_totals_match_decimal_path(self):
+        """Test vectorized totals agree to the cent with the model."""
+        for loan, total_cents in zip(self.loans, self.calculator.total_cents):
+            self.assertEqual(
+                Decimal(int(total_cents)).scaleb(-2), loan.total_amount_to_pay()
+            )
+
+    def test_installments_match_decimal_schedule(self):
+        """Test vectorized installments agree with a per-loan Decimal schedule."""
+        installments = self.calculator.build_installments()
+        for loan in Loan.objects.order_by("id"):
+            _, days, months = PERIODS[loan.payment_schedule]
+            periods = max(loan.duration_months // months, 1)
+            total = loan.total_amount_to_pay()
+            payment = round(total / periods, 2)
+            expected = [
+                (loan.start_date + timezone.timedelta(days=days * sequence), payment)
+                for sequence in range(1, periods)
+            ]
+            expected.append(
+                (
+                    loan.start_date + timezone.timedelta(days=days * periods),
+                    total - payment * (periods - 1),
+                )
+            )
+            self.assertEqual(
+                [
+                    (installment.due_date, installment.amount)
+                    for installment in installments
+                    if installment.loan_id == loan.id
+                ],
+                expected,
+            )
+
+
+class BulkApproveTestCase(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            username="staff",
+            email="staff@example.com",
+            password="password123",
+            is_staff=True,
+        )
+        self.clients = [
+            User.objects.create_user(
+                username=f"client{index}",
+                email=f"client{index}@example.com",
+                password="password123",
+            )
+            for index in range(3)
+        ]
+        for user in self.clients:
+            Wallet.objects.create(user=user)
+        self.api = APIClient()
+        self.api.force_authenticate(self.staff)
+
+    def create_loans(self, count):
+        return [
+            Loan.objects.create(
+                client=self.clients[index % len(self.clients)],
+                amount=Decimal("1000.00"),
+                duration_months=12,
+            ).id
+            for index in range(count)
+        ]
+
+    def test_bulk_approve_disburses_loans(self):
+        """Test bulk approval credits wallets and materializes installments."""
+        loan_ids = self.create_loans(4)
+        rejected = Loan.objects.get(id=loan_ids[-1])
+        rejected.status = Loan.Status.CANCELLED
+        rejected.save()
+
+        response = self.api.post(
+            "/loans/bulk_approve/", {"ids": loan_ids}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["approved"], loan_ids[:3])
+        self.assertEqual(response.data["skipped"], loan_ids[3:])
+        for user in self.clients:
+            self.assertEqual(Wallet.objects.get(user=user).balance, Decimal("1000.00"))
+        self.assertEqual(WalletActivity.objects.count(), 3)
+        self.assertEqual(Installment.objects.count(), 36)
+        self.assertFalse(
+            Loan.objects.filter(id__in=loan_ids[:3]).exclude(
+                status=Loan.Status.IN_PROGRESS
+            )
+        )
+
+    def test_bulk_approve_query_count_is_constant(self):
+        """Test the number of queries does not grow with the batch size."""
+        small, large = self.create_loans(3), self.create_loans(9)
+        # The first approval opens the ledger accounts of the client wallets.
+        warmup = self.create_loans(len(self.clients))
+        self.api.post("/loans/bulk_approve/", {"ids": warmup}, format="json")
+        with CaptureQueriesContext(connection) as small_queries:
+            self.api.post("/loans/bulk_approve/", {"ids": small}, format="json")
+        with CaptureQueriesContext(connection) as large_queries:
+            self.api.post("/loans/bulk_approve/", {"ids": large}, format="json")
+        self.assertEqual(
+            len(app_queries(small_queries)), len(app_queries(large_queries))
+        )
+
+    def test_bulk_approve_requires_staff(self):
+        """Test non staff users cannot bulk approve loans."""
+        self.api.force_authenticate(self.clients[0])
+        response = self.api.post(
+            "/loans/bulk_approve/", {"ids": self.create_loans(1)}, format="json"
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class VersionedCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner, self.other = [
+            User.objects.create_user(
+                username=name, email=f"{name}@example.com", password="password123"
+            )
+            for name in ("cacheowner", "cacheother")
+        ]
+        for user in (self.owner, self.other):
+            Wallet.objects.create(user=user)
+        self.api = APIClient()
+
+    def list_loans(self, user):
+        self.api.force_authenticate(user)
+        return self.api.get("/loans/", HTTP_ACCEPT="application/json").json()["count"]
+
+    def test_list_cache_is_scoped_per_user(self):
+        """Test a user's cached list is never served to another user."""
+        Loan.objects.create(
+            client=self.owner, amount=Decimal("100.00"), duration_months=1
+        )
+        self.assertEqual(self.list_loans(self.owner), 1)
+        self.assertEqual(self.list_loans(self.other), 0)
+
+    def test_saving_a_loan_bumps_only_its_owners_generation(self):
+        """Test invalidation moves the owner's scope to a new generation."""
+        self.assertEqual(self.list_loans(self.owner), 0)
+        other_version = get_cache_version(f"loans_list:user:{self.other.pk}")
+        with self.captureOnCommitCallbacks(execute=True):
+            Loan.objects.create(
+                client=self.owner, amount=Decimal("100.00"), duration_months=1
+            )
+        self.assertEqual(self.list_loans(self.owner), 1)
+        self.assertEqual(
+            get_cache_version(f"loans_list:user:{self.other.pk}"), other_version
+        )
+
+    def test_list_response_is_served_from_cache_with_etag(self):
+        """Test a repeated list is a cache hit and honours If-None-Match."""
+        self.api.force_authenticate(self.owner)
+        first = self.api.get("/loans/", HTTP_ACCEPT="application/json")
+        self.assertEqual(first["X-Cache"], "MISS")
+        second = self.api.get("/loans/", HTTP_ACCEPT="application/json")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+        not_modified = self.api.get(
+            "/loans/", HTTP_ACCEPT="application/json", HTTP_IF_NONE_MATCH=first["ETag"]
+        )
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(
+            get_cache_stats(["loans_list"]), {"loans_list": {"hit": 2, "miss": 1}}
+        )
+
+
+class ListQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username="budgetadmin",
+            email="budgetadmin@example.com",
+            password="password123",
+            is_staff=True,
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def create_portfolio(self, count, start=0):
+        for index in range(start, start + count):
+            user = User.objects.create_user(
+                username=f"budget{index}", email=f"budget{index}@example.com"
+            )
+            wallet = Wallet.objects.create(user=user)
+            for _ in range(3):
+                wallet.add_balance(Decimal("10.00"))
+            loan = Loan.objects.create(
+                client=user, amount=Decimal("1000.00"), duration_months=12
+            )
+            Installment.objects.bulk_create(
+                PortfolioCalculator.from_loans([loan]).build_installments()
+            )
+
+    def test_loan_list_query_count_does_not_grow_with_rows(self):
+        """Test the loan list stays within budget for one row and a full page."""
+        self.create_portfolio(1)
+        self.assertListQueryBudget(self.api, "/loans/", 5)
+        self.create_portfolio(9, start=1)
+        response = self.assertListQueryBudget(self.api, "/loans/", 5)
+        self.assertEqual(len(response.json()["results"]), 10)
+
+    def test_wallet_list_prefetches_recent_activities(self):
+        """Test the wallet list nests activities without a query per wallet."""
+        self.create_portfolio(9)
+        response = self.assertListQueryBudget(self.api, "/wallets/", 5)
+        results = response.json()["results"]
+        self.assertEqual(len(results), 9)
+        self.assertEqual([len(wallet["activities"]) for wallet in results], [3] * 9)
+        # Listing no longer creates a wallet for the caller.
+        self.assertFalse(Wallet.objects.filter(user=self.admin).exists())
+        self.assertEqual(
+            [wallet["user"] for wallet in results],
+            list(
+                Wallet.objects.order_by("-user__date_joined", "-id").values_list(
+                    "user", flat=True
+                )
+            ),
+        )
+
+
+class WalletActivityHistoryTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="historyuser", email="history@example.com", password="password123"
+        )
+        self.wallet = Wallet.objects.create(user=self.user)
+        WalletActivity.objects.bulk_create(
+            [
+                WalletActivity.build(self.wallet, "add", Decimal(index))
+                for index in range(1, 8)
+            ]
+        )
+        # Identical timestamps exercise the id tie-breaker of the cursor.
+        WalletActivity.objects.update(timestamp=timezone.now())
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def test_activities_are_paged_with_a_keyset_cursor(self):
+        """Test every activity is returned once, newest first, across pages."""
+        url = f"/wallets/{self.wallet.id}/activities/?page_size=3"
+        seen = []
+        while url:
+            data = self.api.get(url).data
+            seen.extend(activity["id"] for activity in data["results"])
+            url = data["next"]
+        expected = list(
+            WalletActivity.objects.order_by("-timestamp", "-id").values_list(
+                "id", flat=True
+            )
+        )
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor_is_rejected(self):
+        """Test a malformed cursor returns 404 rather than a server error."""
+        response = self.api.get(
+            f"/wallets/{self.wallet.id}/activities/?cursor=not-a-cursor"
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_export_streams_ndjson(self):
+        """Test the export streams one JSON document per activity."""
+        response = self.api.get(f"/wallets/{self.wallet.id}/activities/export/")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 7)
+        self.assertEqual(
+            sorted(Decimal(json.loads(line)["amount"]) for line in lines),
+            [Decimal(index) for index in range(1, 8)],
+        )
+
+
+class LoanCursorPaginationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username="pageadmin",
+            email="pageadmin@example.com",
+            password="password123",
+            is_staff=True,
+        )
+        Wallet.objects.create(user=self.admin)
+        start = timezone.now().date()
+        for index in range(7):
+            Loan.objects.create(
+                client=self.admin,
+                amount=Decimal("100.00"),
+                duration_months=1,
+                start_date=start - timezone.timedelta(days=index % 3),
+            )
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def walk(self, url):
+        seen = []
+        while url:
+            data = self.api.get(url, HTTP_ACCEPT="application/json").json()
+            seen.extend(row["id"] for row in data["results"])
+            url = data["next"]
+        return seen
+
+    def test_cursor_mode_walks_every_loan_once(self):
+        """Test cursor pages follow (start_date, id) without gaps or repeats."""
+        expected = list(
+            Loan.objects.order_by("-start_date", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(self.walk("/loans/?pagination=cursor&page_size=2"), expected)
+
+    def test_cursor_mode_skips_the_count(self):
+        """Test the cursor mode runs no COUNT(*) unless an estimate is asked."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            data = self.api.get(
+                "/loans/?pagination=cursor", HTTP_ACCEPT="application/json"
+            ).json()
+        self.assertNotIn("count", data)
+        self.assertFalse(
+            any("COUNT(" in query["sql"] for query in app_queries(captured))
+        )
+        data = self.api.get(
+            "/loans/?pagination=cursor&count=approximate",
+            HTTP_ACCEPT="application/json",
+        ).json()
+        self.assertEqual(data["count"], 7)
+
+    def test_page_size_is_configurable(self):
+        """Test the page number mode honours page_size."""
+        data = self.api.get("/loans/?page_size=5", HTTP_ACCEPT="application/json")
+        self.assertEqual(len(data.json()["results"]), 5)
+        self.assertEqual(data.json()["count"], 7)
+
+    def test_user_list_supports_cursor_mode(self):
+        """Test the user list pages by (date_joined, id) in cursor mode."""
+        for index in range(4):
+            User.objects.create_user(
+                username=f"pageuser{index}", email=f"pageuser{index}@example.com"
+            )
+        seen = self.walk("/users/users/?pagination=cursor&page_size=2")
+        self.assertEqual(
+            sorted(seen), sorted(User.objects.values_list("id", flat=True))
+        )
+        self.assertEqual(len(seen), 5)
+
+
+class LoanSearchQueryTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="searchuser", email="search@example.com", password="password123"
+        )
+        self.staff = User.objects.create_user(
+            username="searchstaff", email="staff@example.com", is_staff=True
+        )
+
+    def build(self, user, **params):
+        serializer = LoanSearchSerializer(data=params)
+        serializer.is_valid(raise_exception=True)
+        return LoanSearchAPIView().get_search(serializer.validated_data, user).to_dict()
+
+    def test_filters_are_pushed_into_elasticsearch(self):
+        """Test status and range filters run in filter context, scoped to the user."""
+        body = self.build(
+            self.user, status=["PENDING"], amount_min="100", interest_rate_max="12"
+        )
+        filters = body["query"]["bool"]["filter"]
+        self.assertIn({"term": {"client": self.user.id}}, filters)
+        self.assertIn({"terms": {"status": ["PENDING"]}}, filters)
+        self.assertIn({"range": {"amount": {"gte": Decimal("100.00")}}}, filters)
+        self.assertIn({"range": {"interest_rate": {"lte": 12.0}}}, filters)
+        self.assertEqual(body["_source"], LoanSearchAPIView.source_fields)
+        self.assertEqual((body["from"], body["size"]), (0, 20))
+
+    def test_staff_searches_every_client_unless_filtered(self):
+        """Test staff are not scoped to their own loans."""
+        self.assertNotIn("query", self.build(self.staff))
+        body = self.build(self.staff, client=self.user.id)
+        self.assertEqual(
+            body["query"]["bool"]["filter"], [{"term": {"client": self.user.id}}]
+        )
+
+    def test_search_after_replaces_from(self):
+        """Test a cursor pages with search_after and deep from is refused."""
+        cursor = urlsafe_b64encode(json.dumps(["2024-01-01", 7]).encode()).decode()
+        body = self.build(self.user, search_after=cursor)
+        self.assertEqual(body["search_after"], ["2024-01-01", 7])
+        self.assertNotIn("from", body)
+        serializer = LoanSearchSerializer(data={"from": 9990, "page_size": 20})
+        self.assertFalse(serializer.is_valid())
+
+    def test_search_pages_through_the_fake_index(self):
+        """Test the view end to end against the in-memory Elasticsearch."""
+        for index in range(5):
+            Loan.objects.create(
+                client=self.user,
+                amount=Decimal(100 * (index + 1)),
+                duration_months=1,
+                status=Loan.Status.PENDING if index % 2 else Loan.Status.REPAID,
+            )
+        api = APIClient()
+        api.force_authenticate(self.user)
+        with benchmark.fake_elasticsearch():
+            url = "/api/loans/search/?status=REPAID&page_size=2"
+            seen = []
+            while url:
+                data = api.get(url, HTTP_ACCEPT="application/json").json()
+                seen.extend(data["results"])
+                url = data["next"]
+        self.assertEqual(data["count"], 3)
+        self.assertEqual(
+            sorted(Decimal(str(row["amount"])) for row in seen),
+            [Decimal(100), Decimal(300), Decimal(500)],
+        )
+        # Empty fields such as the missing description are left out.
+        self.assertEqual(
+            set(seen[0]), set(LoanSearchAPIView.source_fields) - {"description"}
+        )
+
+
+class LoanAnalyticsTestCase(TestCase):
+    aggregations = {
+        "by_status": {
+            "buckets": [
+                {
+                    "key": "PENDING",
+                    "doc_count": 2,
+                    "total_amount": {"value": 300.0},
+                    "average_amount": {"value": 150.0},
+                }
+            ]
+        },
+        "interest_rate": {"buckets": [{"key": 10.0, "doc_count": 2}]},
+        "start_date": {
+            "buckets": [
+                {
+                    "key_as_string": "2024-01-01",
+                    "doc_count": 2,
+                    "total_amount": {"value": 300.0},
+                }
+            ]
+        },
+        "penalty_rate": {"buckets": [{"key": 1.5, "doc_count": 2}]},
+        "penalty_rate_stats": {"count": 2, "min": 1.5, "max": 1.5},
+        "penalty_rate_percentiles": {"values": {"50.0": 1.5}},
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(
+            username="analyticsstaff", email="analytics@example.com", is_staff=True
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.staff)
+
+    def test_summary_is_aggregated_once_and_cached(self):
+        """Test the aggregations run once per interval within the cache window."""
+        search = mock.Mock()
+        search.execute.return_value.aggregations.to_dict.return_value = (
+            self.aggregations
+        )
+        with mock.patch.object(
+            LoanAnalyticsAPIView, "get_search", return_value=search
+        ) as get_search:
+            first = self.api.get("/api/loans/analytics/").data
+            second = self.api.get("/api/loans/analytics/").data
+        self.assertEqual(get_search.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(first["by_status"][0]["total_amount"], 300.0)
+        self.assertEqual(first["start_date"][0]["period"], "2024-01-01")
+
+    def test_aggregations_request_no_hits(self):
+        """Test the analytics search fetches aggregations only."""
+        body = LoanAnalyticsAPIView().get_search("quarter").to_dict()
+        self.assertEqual(body["size"], 0)
+        self.assertEqual(
+            body["aggs"]["start_date"]["date_histogram"]["calendar_interval"],
+            "quarter",
+        )
+        response = self.api.get("/api/loans/analytics/?interval=week")
+        self.assertEqual(response.status_code, 400)
+
+
+class LoanReportingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="reportuser", email="report@example.com", password="password123"
+        )
+        self.staff = User.objects.create_user(
+            username="reportstaff", email="reportstaff@example.com", is_staff=True
+        )
+        Wallet.objects.create(user=self.user)
+        today = timezone.now().date()
+        self.loans = [
+            Loan.objects.create(
+                client=self.user,
+                amount=Decimal("1000.00"),
+                duration_months=12,
+                amount_paid=Decimal("333.33"),
+                end_date=today - timezone.timedelta(days=5),
+                status=Loan.Status.IN_PROGRESS,
+            ),
+            Loan.objects.create(
+                client=self.user,
+                amount=Decimal("500.00"),
+                duration_months=6,
+                payment_schedule=Loan.PaymentSchedule.QUARTERLY,
+            ),
+            Loan.objects.create(
+                client=self.user,
+                amount=Decimal("200.00"),
+                duration_months=1,
+                amount_paid=Decimal("201.75"),
+                end_date=today - timezone.timedelta(days=30),
+                status=Loan.Status.REPAID,
+            ),
+        ]
+
+    def test_annotations_match_the_model_methods(self):
+        """Test every SQL annotation agrees with its Python counterpart."""
+        for loan in Loan.objects.with_reporting():
+            self.assertEqual(loan.remaining_due, loan.remaining_amount())
+            self.assertEqual(loan.progress, loan.payment_progress())
+            self.assertEqual(loan.overdue, bool(loan.is_overdue()))
+        overdue = Loan.objects.with_reporting().get(id=self.loans[0].id)
+        self.assertEqual(overdue.days_overdue, 5)
+
+    def test_report_is_a_single_grouped_query(self):
+        """Test the report endpoint groups the totals in one query."""
+        api = APIClient()
+        api.force_authenticate(self.staff)
+        with CaptureQueriesContext(connection) as captured:
+            response = api.get("/loans/report/?group_by=status")
+        aggregates = [
+            query for query in app_queries(captured) if "GROUP BY" in query["sql"]
+        ]
+        self.assertEqual(len(aggregates), 1)
+        rows = {row["status"]: row for row in response.data}
+        self.assertEqual(rows["OVERDUE"]["overdue_loans"], 1)
+        self.assertEqual(rows["OVERDUE"]["max_days_overdue"], 5)
+        self.assertEqual(rows["PENDING"]["loans"], 1)
+        self.assertEqual(rows["REPAID"]["overdue_loans"], 0)
+        for group_by in ("payment_schedule", "role", "month"):
+            response = api.get(f"/loans/report/?group_by={group_by}")
+            self.assertEqual(
+                sum(row["loans"] for row in response.data), len(self.loans)
+            )
+
+
+class LoanStatusSweepTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="sweepuser", email="sweep@example.com", password="password123"
+        )
+        Wallet.objects.create(user=self.user)
+        today = timezone.now().date()
+        self.late, self.paid, self.current = Loan.objects.bulk_create(
+            [
+                Loan(
+                    client=self.user,
+                    amount=Decimal("100.00"),
+                    duration_months=1,
+                    total_amount=Decimal("100.88"),
+                    end_date=today - timezone.timedelta(days=1),
+                    status=Loan.Status.IN_PROGRESS,
+                ),
+                Loan(
+                    client=self.user,
+                    amount=Decimal("100.00"),
+                    duration_months=1,
+                    total_amount=Decimal("100.88"),
+                    amount_paid=Decimal("100.88"),
+                    end_date=today - timezone.timedelta(days=1),
+                    status=Loan.Status.IN_PROGRESS,
+                ),
+                Loan(
+                    client=self.user,
+                    amount=Decimal("100.00"),
+                    duration_months=1,
+                    total_amount=Decimal("100.88"),
+                    end_date=today + timezone.timedelta(days=1),
+                    status=Loan.Status.IN_PROGRESS,
+                ),
+            ]
+        )
+
+    def test_sweep_updates_statuses_in_two_statements(self):
+        """Test the sweep issues one UPDATE per target status."""
+        with CaptureQueriesContext(connection) as captured:
+            report = sweep_loan_statuses()
+        updates = [
+            query
+            for query in app_queries(captured)
+            if query["sql"].startswith('UPDATE "Loan_loan"')
+        ]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual((report["repaid"], report["overdue"]), (1, 1))
+        statuses = dict(Loan.objects.values_list("id", "status"))
+        self.assertEqual(statuses[self.late.id], Loan.Status.OVERDUE)
+        self.assertEqual(statuses[self.paid.id], Loan.Status.REPAID)
+        self.assertEqual(statuses[self.current.id], Loan.Status.IN_PROGRESS)
+        self.assertEqual(sweep_loan_statuses()["overdue"], 0)
+
+    def test_sweep_updates_large_books_in_chunks(self):
+        """Test the sweep bounds the ids of each UPDATE by the chunk size."""
+        Loan.objects.bulk_create(
+            [
+                Loan(
+                    client=self.user,
+                    amount=Decimal("100.00"),
+                    duration_months=1,
+                    total_amount=Decimal("100.88"),
+                    end_date=self.late.end_date,
+                    status=Loan.Status.IN_PROGRESS,
+                )
+                for _ in range(4)
+            ]
+        )
+        with CaptureQueriesContext(connection) as captured:
+            report = sweep_loan_statuses(chunk_size=2)
+        updates = [
+            query
+            for query in app_queries(captured)
+            if query["sql"].startswith('UPDATE "Loan_loan"')
+        ]
+        self.assertEqual((report["repaid"], report["overdue"]), (1, 5))
+        self.assertEqual(len(updates), 4)
+        self.assertFalse(
+            Loan.objects.filter(
+                status=Loan.Status.IN_PROGRESS, end_date=self.late.end_date
+            ).exists()
+        )
+
+
+class BackgroundTaskTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(
+            username="taskstaff", email="taskstaff@example.com", is_staff=True
+        )
+        self.client_user = User.objects.create_user(
+            username="taskclient", email="taskclient@example.com"
+        )
+        Wallet.objects.create(user=self.client_user)
+        self.loan = Loan.objects.create(
+            client=self.client_user, amount=Decimal("1000.00"), duration_months=12
+        )
+
+    def test_idempotency_key_runs_a_task_once(self):
+        """Test a repeated idempotency key does not disburse twice."""
+        for _ in range(2):
+            tasks.approve_loans.apply(
+                args=[[self.loan.id]], kwargs={"idempotency_key": "batch-1"}
+            )
+        self.assertEqual(
+            Wallet.objects.get(user=self.client_user).balance, Decimal("1000.00")
+        )
+        stats = get_task_stats([tasks.approve_loans.name])[tasks.approve_loans.name]
+        self.assertEqual(stats["SUCCESS"], 2)
+
+    def test_claimed_idempotency_key_is_retried(self):
+        """Test a delivery of a task still claimed by another run is retried."""
+        cache.set(f"task_idempotency:{tasks.approve_loans.name}:batch-1", "running")
+        with mock.patch.object(
+            tasks.approve_loans, "retry", side_effect=Retry()
+        ) as retry:
+            tasks.approve_loans.apply(
+                args=[[self.loan.id]], kwargs={"idempotency_key": "batch-1"}
+            )
+        retry.assert_called_once_with(countdown=tasks.approve_loans.time_limit)
+        self.assertEqual(
+            Wallet.objects.get(user=self.client_user).balance, Decimal("0.00")
+        )
+
+    def test_bulk_approve_can_be_queued(self):
+        """Test background bulk approval returns 202 with the task id."""
+        api = APIClient()
+        api.force_authenticate(self.staff)
+        with mock.patch.object(tasks.approve_loans, "apply_async") as apply_async:
+            apply_async.return_value.id = "task-1"
+            response = api.post(
+                "/loans/bulk_approve/",
+                {"ids": [self.loan.id], "background": True},
+                format="json",
+                HTTP_IDEMPOTENCY_KEY="key-1",
+            )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data, {"task_id": "task-1"})
+        apply_async.assert_called_once_with(
+            args=[[self.loan.id]], kwargs={"idempotency_key": "key-1"}
+        )
+
+
+class LedgerTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="ledgeruser", email="ledger@example.com", password="password123"
+        )
+        self.wallet = Wallet.objects.create(user=self.user)
+        self.loan = Loan.objects.create(
+            client=self.user,
+            amount=Decimal("1000.00"),
+            interest_rate=10.5,
+            duration_months=12,
+        )
+
+    def test_wallet_changes_are_journaled(self):
+        """Test credits and debits post entries that keep the balances equal."""
+        self.wallet.add_balance(Decimal("500.00"))
+        self.wallet.subtract_balance(Decimal("200.00"))
+        with self.assertRaises(ValueError):
+            self.wallet.subtract_balance(Decimal("1000.00"))
+        account = LedgerAccount.objects.get(wallet=self.wallet)
+        self.assertEqual(account.balance, Decimal("300.00"))
+        self.assertEqual(
+            list(account.debits.values_list("kind", flat=True)),
+            [LedgerEntry.Kind.WITHDRAWAL],
+        )
+        report = ledger.reconcile(full=True)
+        self.assertEqual((report["accounts"], report["wallets"]), ([], []))
+
+    def test_disbursement_and_repayments_move_the_receivable(self):
+        """Test approval books the receivable and repayments reduce it."""
+        (loan,) = services.approve_loans([self.loan.id])
+        receivable = LedgerAccount.objects.get(loan=loan)
+        self.assertEqual(receivable.balance, loan.total_amount)
+        fee_income = ledger.system_account(LedgerAccount.Kind.FEE_INCOME)
+        self.assertEqual(
+            ledger.balance_at(fee_income, timezone.now()),
+            loan.total_amount - loan.amount,
+        )
+
+        Installment.objects.filter(loan=loan, sequence=1).update(
+            due_date=timezone.now().date() - timezone.timedelta(days=1)
+        )
+        settle_due_installments()
+        loan.refresh_from_db()
+        receivable.refresh_from_db()
+        self.assertEqual(receivable.balance, loan.total_amount - loan.amount_paid)
+        report = ledger.reconcile(full=True)
+        self.assertEqual((report["accounts"], report["wallets"]), ([], []))
+
+    def test_existing_accounts_are_only_read(self):
+        """Test postings to existing accounts create and look up no accounts."""
+        self.wallet.add_balance(Decimal("10.00"))
+        with CaptureQueriesContext(connection) as captured:
+            self.wallet.add_balance(Decimal("10.00"))
+        # Besides the balance UPDATE, only the wallet's account is read.
+        account_queries = [
+            query["sql"]
+            for query in app_queries(captured)
+            if '"Loan_ledgeraccount"' in query["sql"]
+            and not query["sql"].startswith("UPDATE")
+        ]
+        self.assertEqual(len(account_queries), 1)
+        self.assertIn('"wallet_id" IN', account_queries[0])
+
+    def test_point_in_time_balance_starts_from_the_snapshot(self):
+        """Test past balances combine the snapshot with the later entries."""
+        self.wallet.add_balance(Decimal("100.00"))
+        cutoff = timezone.now()
+        self.assertEqual(ledger.take_snapshots(cutoff), LedgerAccount.objects.count())
+        self.assertEqual(ledger.take_snapshots(cutoff), 0)
+        self.wallet.add_balance(Decimal("50.00"))
+        account = LedgerAccount.objects.get(wallet=self.wallet)
+        BalanceSnapshot.objects.filter(account=account).update(balance=Decimal("70.00"))
+        # The entries before the cutoff are no longer read.
+        self.assertEqual(ledger.balance_at(account, cutoff), Decimal("70.00"))
+        self.assertEqual(ledger.balance_at(account, timezone.now()), Decimal("120.00"))
+
+        with CaptureQueriesContext(connection) as captured:
+            report = ledger.reconcile()
+        self.assertEqual(len(app_queries(captured)), 3)
+        self.assertEqual([row["id"] for row in report["accounts"]], [account.id])
+        self.assertEqual(report["accounts"][0]["expected"], Decimal("120.00"))
+        self.assertEqual(ledger.reconcile(full=True)["accounts"], [])
+
+    def test_deleting_journaled_objects_is_a_conflict(self):
+        """Test objects with ledger accounts answer a delete with a 409."""
+        staff = User.objects.create_user(
+            username="ledgerstaff", email="ledgerstaff@example.com", is_staff=True
+        )
+        api = APIClient()
+        api.force_authenticate(staff)
+        self.wallet.add_balance(Decimal("10.00"))
+        for url in (f"/wallets/{self.wallet.id}/", f"/users/users/{self.user.id}/"):
+            response = api.delete(url, HTTP_ACCEPT="application/json")
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(response.data["detail"].code, "has_ledger_history")
+        self.assertTrue(Wallet.objects.filter(id=self.wallet.id).exists())
+
+        response = api.delete(f"/loans/{self.loan.id}/")
+        self.assertEqual(response.status_code, 204)
+
+    def test_entries_are_immutable(self):
+        """Test journal entries can be neither changed nor deleted."""
+        self.wallet.add_balance(Decimal("10.00"))
+        entry = LedgerEntry.objects.get()
+        entry.amount = Decimal("20.00")
+        with self.assertRaises(ValueError):
+            entry.save()
+        with self.assertRaises(ValueError):
+            entry.delete()
+
+
+@override_settings(
+    DATABASE_REPLICA_ALIAS="default",
+    DATABASE_ROUTERS=["config.db_router.ReplicaRouter"],
+)
+class ReplicaRoutingTestCase(TestCase):
+    """
+    The primary stands in for the replica alias, so the routed reads can be
+    observed without a second database.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="replicauser", email="replica@example.com", password="password123"
+        )
+        self.wallet = Wallet.objects.create(user=self.user)
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def routed_reads(self, method, url, **kwargs):
+        """Databases the wallet activities of a request were read from."""
+        routed = []
+
+        def db_for_read(router, model, **hints):
+            if model is WalletActivity:
+                routed.append(_read_from.get())
+            return _read_from.get()
+
+        with mock.patch.object(ReplicaRouter, "db_for_read", db_for_read):
+            response = getattr(self.api, method)(
+                url, HTTP_ACCEPT="application/json", **kwargs
+            )
+        self.assertLess(response.status_code, 400)
+        return set(routed)
+
+    def test_read_only_actions_use_the_replica(self):
+        """Test list reads are routed to the replica and reset afterwards."""
+        self.assertEqual(
+            self.routed_reads("get", f"/wallets/{self.wallet.id}/"), {"default"}
+        )
+        self.assertIsNone(_read_from.get())
+
+    def test_routing_is_reset_when_a_view_raises(self):
+        """Test an unhandled error does not leave later reads on the replica."""
+        self.api.raise_request_exception = True
+        with mock.patch.object(
+            WalletViewSet, "retrieve", side_effect=RuntimeError("boom")
+        ):
+            with self.assertRaises(RuntimeError):
+                self.api.get(f"/wallets/{self.wallet.id}/")
+        self.assertIsNone(_read_from.get())
+        self.assertIsNone(ReplicaRouter().db_for_read(WalletActivity))
+
+    def test_writers_are_pinned_to_the_primary(self):
+        """Test a user reads from the primary right after writing."""
+        self.routed_reads(
+            "post", f"/wallets/{self.wallet.id}/add_balance/", data={"amount": "5"}
+        )
+        self.assertEqual(
+            self.routed_reads("get", f"/wallets/{self.wallet.id}/"), {None}
+        )
+
+
+class BenchmarkTestCase(TestCase):
+    def test_scenarios_report_latency_and_queries(self):
+        """Test the harness drives the endpoints and reports each scenario."""
+        staff = benchmark.seed(users=3, loans_per_user=2, activities_per_wallet=2)
+        results = benchmark.run(
+            staff,
+            names=["loans.retrieve", "loans.approve", "wallets.subtract_balance"],
+            iterations=3,
+            warmup=1,
+            allocations=True,
+        )
+        self.assertEqual(
+            set(results),
+            {"loans.retrieve", "loans.approve", "wallets.subtract_balance"},
+        )
+        for result in results.values():
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+            self.assertGreater(result["queries"], 0)
+            self.assertIn("alloc_peak_kib", result)
+
+    def test_compare_flags_extra_queries_and_slower_p95(self):
+        """Test regressions are reported against the baseline only."""
+        baseline = {"loans.list": {"p95_ms": 10.0, "queries": 3}}
+        self.assertEqual(
+            benchmark.compare({"loans.list": {"p95_ms": 11.0, "queries": 3}}, baseline),
+            [],
+        )
+        regressions = benchmark.compare(
+            {
+                "loans.list": {"p95_ms": 13.0, "queries": 4},
+                "loans.search": {"p95_ms": 99.0, "queries": 0},
+            },
+            baseline,
+        )
+        self.assertEqual(len(regressions), 2)
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        metrics.registry.flush()
+        cache.clear()
+        self.staff = User.objects.create_user(
+            username="metricsstaff",
+            email="metricsstaff@example.com",
+            password="password123",
+            is_staff=True,
+        )
+        Wallet.objects.create(user=self.staff)
+        self.api = APIClient()
+        self.api.force_authenticate(self.staff)
+
+    def scrape(self):
+        self.api.force_login(self.staff)
+        response = self.api.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode().splitlines()
+
+    def test_requests_are_counted_per_view(self):
+        """Test latency, status, queries and cache lookups reach /metrics."""
+        self.api.get("/loans/", HTTP_ACCEPT="application/json")
+        self.api.get("/loans/", HTTP_ACCEPT="application/json")
+        lines = self.scrape()
+        labels = 'view="loan-list",method="GET"'
+        self.assertIn(f'http_requests_total{{{labels},status="2xx"}} 2', lines)
+        self.assertIn(
+            f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', lines
+        )
+        self.assertIn(f"http_request_duration_seconds_count{{{labels}}} 2", lines)
+        self.assertIn(f'cache_lookups_total{{{labels},result="hit"}} 1', lines)
+        self.assertIn(f'cache_lookups_total{{{labels},result="miss"}} 1', lines)
+        self.assertIn(
+            'list_cache_lookups_total{list="loans_list",result="hit"} 1', lines
+        )
+        (queries,) = [
+            line for line in lines if line.startswith(f"db_queries_total{{{labels}")
+        ]
+        self.assertGreater(int(queries.split()[-1]), 0)
+
+    def test_metrics_require_staff_or_the_scrape_token(self):
+        """Test anonymous scrapes are refused unless they carry the token."""
+        anonymous = APIClient()
+        self.assertEqual(anonymous.get("/metrics").status_code, 403)
+        with override_settings(METRICS_TOKEN="scrape-token"):
+            self.assertEqual(
+                anonymous.get(
+                    "/metrics", HTTP_AUTHORIZATION="Bearer wrong"
+                ).status_code,
+                403,
+            )
+            self.assertEqual(
+                anonymous.get(
+                    "/metrics", HTTP_AUTHORIZATION="Bearer scrape-token"
+                ).status_code,
+                200,
+            )
+
+    def test_elasticsearch_calls_are_timed(self):
+        """Test calls through the timed transport count towards the request."""
+        counters = Counter()
+        token = metrics._current.set(counters)
+        try:
+            with mock.patch.object(Transport, "perform_request", return_value="ok"):
+                transport = TimedTransport([NodeConfig("http", "localhost", 9200)])
+                self.assertEqual(transport.perform_request("GET", "/"), "ok")
+        finally:
+            metrics._current.reset(token)
+        self.assertEqual(counters["es_calls"], 1)
+        self.assertIn("es_us", counters)
+
+    @override_settings(SILKY_INTERCEPT_PERCENT=0)
+    def test_silk_only_records_sampled_or_requested_requests(self):
+        """Test Silk and cProfile skip requests without a signed header."""
+        factory = RequestFactory()
+        plain = factory.get("/loans/")
+        requested = factory.get("/loans/", HTTP_X_PROFILE=sign_profile_header())
+        forged = factory.get("/loans/", HTTP_X_PROFILE="profile:forged:signature")
+        self.assertFalse(should_record(plain))
+        self.assertFalse(should_record(forged))
+        self.assertTrue(should_record(requested))
+        self.assertTrue(profile_requested(requested))
+        with override_settings(SILKY_INTERCEPT_PERCENT=100):
+            self.assertTrue(should_record(plain))
+            self.assertFalse(profile_requested(plain))
+
+
+@override_settings(PROFILE_INTERVAL_MS=1, PROFILE_SAMPLE_RATE=0)
+class ProfilingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(
+            username="profilestaff",
+            email="profilestaff@example.com",
+            password="password123",
+            is_staff=True,
+        )
+        Wallet.objects.create(user=self.staff)
+        self.loan = Loan.objects.create(
+            client=self.staff, amount=Decimal("1200.00"), duration_months=12
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.staff)
+
+    def retrieve_slowly(self, **headers):
+        original = LoanSerializer.get_payment_plan
+
+        def slow_payment_plan(serializer, obj):
+            time.sleep(0.05)
+            return original(serializer, obj)
+
+        with mock.patch.object(LoanSerializer, "get_payment_plan", slow_payment_plan):
+            response = self.api.get(
+                f"/loans/{self.loan.id}/", HTTP_ACCEPT="application/json", **headers
+            )
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(PROFILE_SLOW_REQUEST_MS=20)
+    def test_slow_requests_are_captured_as_collapsed_stacks(self):
+        """Test a request over the threshold keeps its sampled stacks."""
+        self.api.get("/loans/", HTTP_ACCEPT="application/json")
+        self.retrieve_slowly()
+        (profile,) = self.api.get("/api/profiles/?view=loan-detail").json()
+        self.assertEqual(profile["reason"], "slow")
+        self.assertGreater(profile["samples"], 0)
+
+        response = self.api.get(f"/api/profiles/{profile['id']}/stacks/")
+        self.assertEqual(response["Content-Type"], "text/plain; charset=utf-8")
+        lines = response.content.decode().splitlines()
+        self.assertTrue(any("slow_payment_plan" in line for line in lines))
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertIn(";", stack)
+        self.assertGreater(int(count), 0)
+
+    @override_settings(PROFILE_SLOW_REQUEST_MS=1000)
+    def test_fast_requests_are_not_sampled(self):
+        """Test requests under the threshold never have their stacks read."""
+        with mock.patch(
+            "config.profiling.sys._current_frames", wraps=sys._current_frames
+        ) as current_frames:
+            self.retrieve_slowly()
+            time.sleep(0.02)
+        current_frames.assert_not_called()
+        self.assertEqual(recent_profiles(), [])
+
+    @override_settings(PROFILE_SLOW_REQUEST_MS=0)
+    def test_signed_header_captures_a_request(self):
+        """Test only a validly signed header turns the sampler on."""
+        self.retrieve_slowly(HTTP_X_PROFILE="forged")
+        self.assertEqual(recent_profiles(), [])
+        self.retrieve_slowly(HTTP_X_PROFILE=sign_profile_header())
+        self.assertEqual([p["reason"] for p in recent_profiles()], ["header"])
+
+    @override_settings(SILKY_MAX_RECORDED_REQUESTS=2)
+    def test_ring_buffer_evicts_the_oldest_profile(self):
+        """Test the buffer keeps the latest profiles only."""
+        ids = [
+            store_profile({"view": "loan-detail", "reason": "sample"}, {"a;b": 1})
+            for _ in range(3)
+        ]
+        self.assertEqual([p["id"] for p in recent_profiles()], ids[:0:-1])
+        self.assertIsNone(collapsed_stacks(ids[0]))
+        self.assertEqual(collapsed_stacks(ids[2]), "a;b 1\n")
+        response = self.api.get(f"/api/profiles/{ids[0]}/stacks/")
+        self.assertEqual(response.status_code, 404)
+
+
+class StartupProfileTestCase(TestCase):
+    def test_worker_role_boots_without_search_client_or_numpy(self):
+        """Test the worker role leaves the lazily loaded packages out."""
+        profile = startup.profile_role("worker", repeat=1)
+        self.assertGreater(profile["setup_s"], 0)
+        self.assertIn("config.apps.Loan", profile["imports_ms"])
+        for package in ("elasticsearch", "numpy", "silk", "drf_spectacular"):
+            self.assertNotIn(package, profile["imports_ms"])
+
+    def test_imports_are_grouped_by_app(self):
+        """Test project modules are accounted to their app."""
+        self.assertEqual(startup.group("config.apps.Loan.models"), "config.apps.Loan")
+        self.assertEqual(startup.group("elasticsearch.dsl.query"), "elasticsearch")
+
+
+class AsyncViewsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="asyncuser", email="async@example.com", password="password123"
+        )
+        self.other = User.objects.create_user(
+            username="asyncother", email="asyncother@example.com"
+        )
+        start = timezone.now().date()
+        for index in range(5):
+            Loan.objects.create(
+                client=self.user,
+                amount=Decimal(100 * (index + 1)),
+                duration_months=1,
+                start_date=start - timezone.timedelta(days=index),
+                status=Loan.Status.PENDING if index % 2 else Loan.Status.REPAID,
+            )
+        self.other_loan = Loan.objects.create(
+            client=self.other, amount=Decimal("50.00"), duration_months=1
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.auth = {"headers": {"Authorization": f"Token {self.token.key}"}}
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def sync_json(self, url):
+        return self.api.get(url, HTTP_ACCEPT="application/json").json()
+
+    def committed(self, write, *args, **kwargs):
+        """Run a write and its on_commit callbacks, on the ORM's thread."""
+        with self.captureOnCommitCallbacks(execute=True):
+            return write(*args, **kwargs)
+
+    async def test_list_matches_the_cursor_pages_and_is_cached(self):
+        """Test the async list pages, scopes and caches like the DRF list."""
+        response = await self.async_client.get("/async/loans/?page_size=2", **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Cache"], "MISS")
+        data = response.json()
+        expected = await sync_to_async(self.sync_json)(
+            "/loans/?pagination=cursor&page_size=2"
+        )
+        self.assertEqual(data["results"], expected["results"])
+
+        seen, url = [], "/async/loans/?page_size=2"
+        while url:
+            page = (await self.async_client.get(url, **self.auth)).json()
+            seen.extend(row["id"] for row in page["results"])
+            url = page["next"]
+        self.assertEqual(len(seen), 5)
+        self.assertNotIn(self.other_loan.id, seen)
+
+        cached = await self.async_client.get("/async/loans/?page_size=2", **self.auth)
+        self.assertEqual(cached["X-Cache"], "HIT")
+        self.assertEqual(cached.content, response.content)
+        await sync_to_async(self.committed)(
+            Loan.objects.create,
+            client=self.user,
+            amount=Decimal("10.00"),
+            duration_months=1,
+        )
+        refreshed = await self.async_client.get(
+            "/async/loans/?page_size=2", **self.auth
+        )
+        self.assertEqual(refreshed["X-Cache"], "MISS")
+
+    async def test_detail_is_scoped_to_the_user(self):
+        """Test a loan renders as in the DRF view and others' loans are hidden."""
+        loan = await Loan.objects.filter(client=self.user).afirst()
+        response = await self.async_client.get(f"/async/loans/{loan.id}/", **self.auth)
+        self.assertEqual(
+            response.json(), await sync_to_async(self.sync_json)(f"/loans/{loan.id}/")
+        )
+        response = await self.async_client.get(
+            f"/async/loans/{self.other_loan.id}/", **self.auth
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_requests_need_a_valid_token_or_session(self):
+        """Test anonymous and deleted tokens are refused, sessions accepted."""
+        response = await self.async_client.get("/async/loans/")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response["WWW-Authenticate"], "Token")
+        self.assertEqual(
+            (await self.async_client.get("/async/loans/", **self.auth)).status_code,
+            200,
+        )
+        await sync_to_async(self.committed)(self.token.delete)
+        response = await self.async_client.get("/async/loans/", **self.auth)
+        self.assertEqual(response.status_code, 401)
+        await self.async_client.aforce_login(self.user)
+        self.assertEqual(
+            (await self.async_client.get("/async/loans/")).status_code, 200
+        )
+
+    async def test_banned_and_demoted_users_drop_their_cached_token(self):
+        """Test changing a user's active or staff flag clears the token cache."""
+        self.user.is_staff = True
+        await sync_to_async(self.committed)(self.user.save)
+        response = await self.async_client.get(
+            f"/async/loans/{self.other_loan.id}/", **self.auth
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.user.is_staff = False
+        await sync_to_async(self.committed)(self.user.save, update_fields=["is_staff"])
+        response = await self.async_client.get(
+            f"/async/loans/{self.other_loan.id}/", **self.auth
+        )
+        self.assertEqual(response.status_code, 404)
+
+        self.user.is_active = False
+        await sync_to_async(self.committed)(self.user.save)
+        response = await self.async_client.get("/async/loans/", **self.auth)
+        self.assertEqual(response.status_code, 401)
+
+    def test_search_matches_the_sync_view(self):
+        """Test the async search returns the DRF search body, page by page."""
+        with benchmark.fake_elasticsearch():
+            url = "?status=REPAID&page_size=2"
+            while url:
+                expected = self.sync_json(f"/api/loans/search/{url}")
+                data = async_to_sync(self.async_client.get)(
+                    f"/async/loans/search/{url}", **self.auth
+                ).json()
+                self.assertEqual(data["count"], 3)
+                self.assertEqual(data["results"], expected["results"])
+                url = data["next"] and "?" + data["next"].split("?", 1)[1]
+
+    @override_settings(ASYNC_SEARCH_CONCURRENCY=0, ASYNC_QUEUE_TIMEOUT=0.01)
+    def test_search_is_refused_when_every_slot_is_taken(self):
+        """Test requests waiting too long for Elasticsearch get a 503."""
+        slots = async_views.Slots("ASYNC_SEARCH_CONCURRENCY")
+        with benchmark.fake_elasticsearch(), mock.patch.object(
+            async_views, "search_slots", slots
+        ):
+            response = async_to_sync(self.async_client.get)(
+                "/async/loans/search/", **self.auth
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+    async def test_async_requests_are_counted(self):
+        """Test the metrics middleware counts requests served under ASGI."""
+        metrics.registry.flush()
+        await self.async_client.get("/async/loans/", **self.auth)
+        await sync_to_async(metrics.registry.flush)()
+        key = "metrics:async_loan_list|GET"
+        self.assertEqual(await cache.aget(f"{key}:status_2xx"), 1)
+        self.assertGreater(await cache.aget(f"{key}:db_calls"), 0)
+        self.assertEqual(await cache.aget(f"{key}:cache_miss"), 1)
@@ -1,8 +1,17 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-
-from .views import LoanSearchAPIView, LoanViewSet, WalletViewSet
+from .async_views import AsyncLoanDetailView, AsyncLoanListView, AsyncLoanSearchView
+from .views import (
+    CacheStatsAPIView,
+    LoanAnalyticsAPIView,
+    LoanSearchAPIView,
+    LoanViewSet,
+    ProfileListAPIView,
+    ProfileStacksAPIView,
+    WalletViewSet,
+    metrics,
+)
 
 # Create a router and register viewsets
 router = DefaultRouter()
@@ -11,12 +20,35 @@ router.register(r"wallets", WalletViewSet, basename="wallet")
 
 
 # Include the router URLs
-urlpatterns =[
+urlpatterns = [
     path("api/loans/search/", LoanSearchAPIView.as_view(), name="loan_search_api"),
+    # Async variants of the read-only loan endpoints, served by uvicorn.
+    path("async/loans/", AsyncLoanListView.as_view(), name="async_loan_list"),
+    path(
+        "async/loans/<int:id>/",
+        AsyncLoanDetailView.as_view(),
+        name="async_loan_detail",
+    ),
+    path(
+        "async/loans/search/",
+        AsyncLoanSearchView.as_view(),
+        name="async_loan_search",
+    ),
+    path(
+        "api/loans/analytics/",
+        LoanAnalyticsAPIView.as_view(),
+        name="loan_analytics_api",
+    ),
+    path("api/cache/stats/", CacheStatsAPIView.as_view(), name="cache_stats_api"),
+    path("metrics", metrics, name="metrics"),
+    path("api/profiles/", ProfileListAPIView.as_view(), name="profile_list_api"),
+    path(
+        "api/profiles/<int:pk>/stacks/",
+        ProfileStacksAPIView.as_view(),
+        name="profile_stacks_api",
+    ),
     path("", include(router.urls)),
     # path('search/', LoanSearchView.as_view(), name='loan-search'),,
-    path("auth/",include("dj_rest_auth.urls")),
-    path("register/",  include('dj_rest_auth.registration.urls')),
-
-  
+    path("auth/", include("dj_rest_auth.urls")),
+    path("register/", include("dj_rest_auth.registration.urls")),
 ]
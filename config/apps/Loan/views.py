@@ -1,24 +1,51 @@
-from datetime import datetime
+import hmac
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from decimal import Decimal
 
-from django.shortcuts import render
 import django_filters
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from elasticsearch_dsl.query import MultiMatch
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.shortcuts import render
+from django.utils.translation import gettext_lazy as _
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from rest_framework.views import APIView
-from django.utils.translation import gettext_lazy as _
 
+from config.celery import app as celery_app
+from config.db_router import ReplicaReadMixin
+from config.profiling import collapsed_stacks, recent_profiles
+
+from . import tasks
+from .cache import CachedListMixin, get_cache_stats
 from .documents import LoanDocument
-from .models import Loan, Wallet
-from .serializers import LoanSerializer, LoansforelasticSerializer, WalletSerializer
+from .ledger import LedgerProtectedDestroyMixin
+from .metrics import render as render_metrics
+from .models import Loan, LoanQuerySet, Wallet, WalletActivity
+from .pagination import KeysetCursorPagination, LoanPagination
+from .serializers import (
+    BulkApproveSerializer,
+    LoanSearchSerializer,
+    LoanSerializer,
+    WalletActivitySerializer,
+    WalletSerializer,
+)
+from .services import InsufficientBalance, approve_loans
 
 
-class LoanViewSet(viewsets.ModelViewSet):
+class LoanViewSet(
+    CachedListMixin,
+    LedgerProtectedDestroyMixin,
+    ReplicaReadMixin,
+    viewsets.ModelViewSet,
+):
     """
     A viewset for viewing and editing Loan instances.
     """
@@ -32,12 +59,9 @@ class LoanViewSet(viewsets.ModelViewSet):
     lookup_field = "id"
     ordering = ["-start_date"]
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
-
-    @method_decorator(
-        cache_page(60 * 15, key_prefix="loans_list")
-    )  # Cache for 15 minutes
-    def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+    pagination_class = LoanPagination
+    list_cache_prefix = "loans_list"
+    replica_actions = ("list", "retrieve", "report")
 
     def get_queryset(self):
         """
@@ -45,9 +69,12 @@ class LoanViewSet(viewsets.ModelViewSet):
         Admin users can see all loans.
         """
         user = self.request.user
+        queryset = Loan.objects.select_related("client__wallet").prefetch_related(
+            "installments"
+        )
         if user.is_staff:
-            return Loan.objects.all()
-        return Loan.objects.filter(client=user)
+            return queryset
+        return queryset.filter(client=user)
 
     def perform_create(self, serializer):
         """
@@ -59,12 +86,8 @@ class LoanViewSet(viewsets.ModelViewSet):
     def approve(self, request, id=None):
         try:
             loan = self.get_object()
-            current_date = datetime.now().date()
-            if loan.status == loan.Status.PENDING:
-                loan.approval_date = current_date
-                loan.status = loan.Status.IN_PROGRESS
-                loan._update_wallet_balance()
-                loan.save()
+            # approve_loans re-checks the status under a row lock.
+            if approve_loans([loan.id]):
                 return Response(
                     {"message": "Loan approved successfully"}, status=status.HTTP_200_OK
                 )
@@ -77,6 +100,49 @@ class LoanViewSet(viewsets.ModelViewSet):
                 {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=["post"], permission_classes=[IsAdminUser])
+    def bulk_approve(self, request):
+        """
+        Approve and disburse a list of pending loans in one transaction.
+        With ``background`` set the batch is queued and the task id returned;
+        an ``Idempotency-Key`` header makes retried requests run it once.
+        """
+        serializer = BulkApproveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        loan_ids = serializer.validated_data["ids"]
+        if serializer.validated_data["background"]:
+            result = tasks.approve_loans.apply_async(
+                args=[loan_ids],
+                kwargs={"idempotency_key": request.headers.get("Idempotency-Key")},
+            )
+            return Response({"task_id": result.id}, status=status.HTTP_202_ACCEPTED)
+        approved = [loan.id for loan in approve_loans(loan_ids)]
+        return Response(
+            {
+                "approved": approved,
+                "skipped": sorted(set(loan_ids) - set(approved)),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAdminUser])
+    def report(self, request):
+        """
+        Portfolio totals computed by the database, grouped by ``group_by``
+        (status, payment_schedule, role or month).
+        """
+        group_by = request.query_params.get("group_by", "status")
+        if group_by not in LoanQuerySet.REPORT_GROUPS:
+            return Response(
+                {
+                    "error": "group_by must be one of "
+                    f"{', '.join(LoanQuerySet.REPORT_GROUPS)}."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        queryset = self.filter_queryset(Loan.objects.all())
+        return Response(list(queryset.report(group_by)), status=status.HTTP_200_OK)
+
     @action(detail=True, methods=["post"])
     def reject(self, request, id=None):
         try:
@@ -97,7 +163,12 @@ class LoanViewSet(viewsets.ModelViewSet):
             )
 
 
-class WalletViewSet(viewsets.ModelViewSet):
+class WalletViewSet(
+    CachedListMixin,
+    LedgerProtectedDestroyMixin,
+    ReplicaReadMixin,
+    viewsets.ModelViewSet,
+):
     """
     A viewset for viewing and editing Wallet instances.
     """
@@ -111,12 +182,8 @@ class WalletViewSet(viewsets.ModelViewSet):
     lookup_field = "id"
     ordering = ["-user__date_joined"]
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
-
-    @method_decorator(
-        cache_page(60 * 15, key_prefix="wallet_list")
-    )  # Cache for 15 minutes
-    def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+    list_cache_prefix = "wallet_list"
+    replica_actions = ("list", "retrieve", "activities", "get_wallet_balance")
 
     def get_queryset(self):
         """
@@ -124,12 +191,70 @@ class WalletViewSet(viewsets.ModelViewSet):
         Admin users can see all wallets.
         """
         user = self.request.user
-        if not Wallet.objects.filter(user=user).exists():
-            Wallet.objects.create(user=user)
+        queryset = Wallet.objects.select_related("user").order_by(
+            "-user__date_joined", "-id"
+        )
+        if self.action in ("list", "retrieve"):
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "activities",
+                    queryset=WalletActivity.objects.order_by("-timestamp", "-id")[
+                        : WalletSerializer.recent_activities_limit
+                    ],
+                    to_attr="recent_activities",
+                )
+            )
         if user.is_staff:
-            return Wallet.objects.all()
-        return Wallet.objects.filter(user=user)
-    
+            return queryset
+        return queryset.filter(user=user)
+
+    @action(detail=True, methods=["get"])
+    def activities(self, request, id=None):
+        """
+        Activity history of a wallet, newest first, with keyset pagination.
+        """
+        wallet = self.get_object()
+        paginator = KeysetCursorPagination()
+        page = paginator.paginate_queryset(
+            WalletActivity.objects.filter(wallet=wallet), request, view=self
+        )
+        for activity in page:
+            activity.wallet = wallet
+        serializer = WalletActivitySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=["get"], url_path="activities/export")
+    def export_activities(self, request, id=None):
+        """
+        Stream the full activity history of a wallet as NDJSON, one activity
+        per line, reading the rows with a server-side iterator.
+        """
+        wallet = self.get_object()
+        rows = (
+            WalletActivity.objects.filter(wallet=wallet)
+            .order_by("-timestamp", "-id")
+            .values(*WalletActivitySerializer.Meta.fields)
+            .iterator(chunk_size=2000)
+        )
+
+        def lines():
+            for row in rows:
+                row["description"] = row["description"] or (
+                    WalletActivity.format_description(
+                        wallet.user.email, row["activity_type"], row["amount"]
+                    )
+                )
+                yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+        response = StreamingHttpResponse(
+            lines(),
+            content_type="application/x-ndjson",
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="wallet-{wallet.id}-activities.ndjson"'
+        )
+        return response
+
     @action(detail=True, methods=["get"])
     def get_wallet_balance(self, request, pk=None):
         wallet = self.get_object()
@@ -149,7 +274,6 @@ class WalletViewSet(viewsets.ModelViewSet):
                 )
             wallet_serializer = self.get_serializer(wallet)
             wallet_serializer.add_balance(amount)
-            wallet.save()
             return Response(
                 {"message": f"Added {amount} to wallet.", "balance": wallet.balance},
                 status=status.HTTP_200_OK,
@@ -169,14 +293,8 @@ class WalletViewSet(viewsets.ModelViewSet):
                     {"error": "Amount must be greater than zero."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            if wallet.balance < amount:
-                return Response(
-                    {"error": "Insufficient balance."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
             wallet_serializer = self.get_serializer(wallet)
             wallet_serializer.subtract_balance(amount)
-            wallet.save()
             return Response(
                 {
                     "message": f"Subtracted {amount} from wallet.",
@@ -184,6 +302,11 @@ class WalletViewSet(viewsets.ModelViewSet):
                 },
                 status=status.HTTP_200_OK,
             )
+        except InsufficientBalance:
+            return Response(
+                {"error": "Insufficient balance."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         except Exception as e:
             return Response(
                 {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -191,25 +314,265 @@ class WalletViewSet(viewsets.ModelViewSet):
 
 
 class LoanSearchAPIView(APIView):
+    """
+    Full text and filtered loan search served from Elasticsearch.
+
+    Filters run in the bool query's filter context, non-staff users are
+    scoped to their own loans, and only the listed ``_source`` fields are
+    fetched and returned as-is without touching the database. Shallow pages
+    use ``from``; the ``next`` link carries a ``search_after`` cursor so deep
+    pages cost the same as the first one.
+    """
+
+    permission_classes = [IsAuthenticated]
+    source_fields = [
+        "id",
+        "amount",
+        "interest_rate",
+        "status",
+        "description",
+        "start_date",
+    ]
+
     def get(self, request):
-        query = request.GET.get("q", "")  # Get the search query from the URL parameter
-
-        if query:
-            # Perform a multi-match search on the Elasticsearch index
-            search_results = LoanDocument.search().query(
-                MultiMatch(
-                    query=query,
-                    fields=["amount", "interest_rate", "status", "description"],
-                )
+        params = self.get_params(request.query_params)
+        response = self.get_search(params, request.user).execute()
+        return Response(
+            self.get_results(request, params, response), status=status.HTTP_200_OK
+        )
+
+    def get_params(self, query_params):
+        params = LoanSearchSerializer(data=query_params)
+        params.is_valid(raise_exception=True)
+        return params.validated_data
+
+    def get_results(self, request, params, response):
+        """
+        The page of results of a search response, with the link to the next.
+        """
+        results = [hit.to_dict() for hit in response.hits]
+        next_link = None
+        if len(response.hits) == params["page_size"]:
+            cursor = urlsafe_b64encode(
+                json.dumps(list(response.hits[-1].meta.sort)).encode()
+            ).decode()
+            next_link = replace_query_param(
+                remove_query_param(request.build_absolute_uri(), "from"),
+                "search_after",
+                cursor,
             )
+        return {
+            "count": response.hits.total.value,
+            "next": next_link,
+            "results": results,
+        }
+
+    def get_search(self, params, user):
+        """
+        Build the Elasticsearch request for validated query parameters.
+        """
+        search = LoanDocument.search().source(self.source_fields)
+        if params.get("q"):
+            search = search.query(
+                "multi_match",
+                query=params["q"],
+                fields=["description", "status"],
+                lenient=True,
+            )
+            search = search.sort("_score", {"id": "desc"})
         else:
-            search_results = (
-                LoanDocument.search()
-            )  # Return all results if no query is provided
+            search = search.sort({"start_date": "desc"}, {"id": "desc"})
+
+        if not user.is_staff:
+            search = search.filter("term", client=user.id)
+        elif params.get("client"):
+            search = search.filter("term", client=params["client"])
+        if params.get("status"):
+            search = search.filter("terms", status=sorted(params["status"]))
+        for field in ("amount", "interest_rate"):
+            bounds = {}
+            if params.get(f"{field}_min") is not None:
+                bounds["gte"] = params[f"{field}_min"]
+            if params.get(f"{field}_max") is not None:
+                bounds["lte"] = params[f"{field}_max"]
+            if bounds:
+                search = search.filter("range", **{field: bounds})
+
+        if params.get("search_after"):
+            try:
+                search_after = json.loads(urlsafe_b64decode(params["search_after"]))
+            except ValueError:
+                raise ValidationError({"search_after": "Invalid cursor."})
+            search = search.extra(search_after=search_after)
+        else:
+            search = search.extra(from_=params["from"])
+        return search.extra(size=params["page_size"])
+
+
+class LoanAnalyticsAPIView(APIView):
+    """
+    Portfolio summaries computed by Elasticsearch aggregations.
+
+    A single ``size=0`` search returns amount totals per status, the interest
+    and penalty rate distributions and a start date histogram. The summary is
+    cached for ``cache_timeout`` seconds per interval.
+    """
+
+    permission_classes = [IsAdminUser]
+    cache_timeout = 60
+    intervals = ["month", "quarter", "year"]
+    interest_rate_bucket = 1
+    penalty_rate_bucket = 0.5
+
+    def get(self, request):
+        interval = request.query_params.get("interval", "month")
+        if interval not in self.intervals:
+            return Response(
+                {"error": f"interval must be one of {', '.join(self.intervals)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        cache_key = f"loan_analytics:{interval}"
+        summary = cache.get(cache_key)
+        if summary is None:
+            response = self.get_search(interval).execute()
+            summary = self.summarize(response.aggregations.to_dict())
+            cache.set(cache_key, summary, self.cache_timeout)
+        return Response(summary, status=status.HTTP_200_OK)
+
+    def get_search(self, interval):
+        search = LoanDocument.search().extra(size=0, track_total_hits=True)
+        by_status = search.aggs.bucket("by_status", "terms", field="status")
+        by_status.metric("total_amount", "sum", field="amount")
+        by_status.metric("average_amount", "avg", field="amount")
+        search.aggs.bucket(
+            "interest_rate",
+            "histogram",
+            field="interest_rate",
+            interval=self.interest_rate_bucket,
+        )
+        search.aggs.bucket(
+            "start_date",
+            "date_histogram",
+            field="start_date",
+            calendar_interval=interval,
+            format="yyyy-MM-dd",
+        ).metric("total_amount", "sum", field="amount")
+        search.aggs.bucket(
+            "penalty_rate",
+            "histogram",
+            field="penalty_rate",
+            interval=self.penalty_rate_bucket,
+        )
+        search.aggs.metric("penalty_rate_stats", "stats", field="penalty_rate")
+        search.aggs.metric(
+            "penalty_rate_percentiles",
+            "percentiles",
+            field="penalty_rate",
+            percents=[50, 90, 99],
+        )
+        return search
+
+    def summarize(self, aggregations):
+        """
+        Flatten raw aggregation results into the response payload.
+        """
+        return {
+            "by_status": [
+                {
+                    "status": bucket["key"],
+                    "count": bucket["doc_count"],
+                    "total_amount": bucket["total_amount"]["value"],
+                    "average_amount": bucket["average_amount"]["value"],
+                }
+                for bucket in aggregations["by_status"]["buckets"]
+            ],
+            "interest_rate": [
+                {"from": bucket["key"], "count": bucket["doc_count"]}
+                for bucket in aggregations["interest_rate"]["buckets"]
+            ],
+            "start_date": [
+                {
+                    "period": bucket["key_as_string"],
+                    "count": bucket["doc_count"],
+                    "total_amount": bucket["total_amount"]["value"],
+                }
+                for bucket in aggregations["start_date"]["buckets"]
+            ],
+            "penalty_rate": {
+                "histogram": [
+                    {"from": bucket["key"], "count": bucket["doc_count"]}
+                    for bucket in aggregations["penalty_rate"]["buckets"]
+                ],
+                "stats": aggregations["penalty_rate_stats"],
+                "percentiles": aggregations["penalty_rate_percentiles"]["values"],
+            },
+        }
+
+
+class CacheStatsAPIView(APIView):
+    """
+    Hit and miss counters of the cached list endpoints.
+    """
+
+    permission_classes = [IsAdminUser]
+    cached_lists = ["loans_list", "wallet_list", "user_list", "role_list"]
+
+    def get(self, request):
+        return Response(get_cache_stats(self.cached_lists), status=status.HTTP_200_OK)
+
+
+class ProfileListAPIView(APIView):
+    """
+    Profiles captured by the stack sampler, newest first, optionally
+    filtered by ``view`` and ``reason`` (header, sample or slow).
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        profiles = recent_profiles()
+        for field in ("view", "reason"):
+            value = request.query_params.get(field)
+            if value:
+                profiles = [profile for profile in profiles if profile[field] == value]
+        return Response(profiles, status=status.HTTP_200_OK)
+
+
+class ProfileStacksAPIView(APIView):
+    """
+    Collapsed stacks of a captured profile, ready for flamegraph.pl or
+    speedscope.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, pk):
+        stacks = collapsed_stacks(pk)
+        if stacks is None:
+            return Response(
+                {"detail": _("Profile not found or already evicted.")},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return HttpResponse(stacks, content_type="text/plain; charset=utf-8")
+
+
+def metrics(request):
+    """
+    Request, query, search, cache and task counters for Prometheus.
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get("Authorization", "")
+    scraper = bool(token) and hmac.compare_digest(authorization, f"Bearer {token}")
+    if not (scraper or request.user.is_staff):
+        return HttpResponseForbidden()
+    task_names = sorted(
+        name for name in celery_app.tasks if not name.startswith("celery.")
+    )
+    return HttpResponse(
+        render_metrics(CacheStatsAPIView.cached_lists, task_names),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
 
-        # Serialize the results
-        loans = [LoansforelasticSerializer(hit).data for hit in search_results]
-        return Response(loans, status=status.HTTP_200_OK)
 
 def index(request):
     context={
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AuthantificationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "config.apps.authantification"
+
+    def ready(self):
+        from . import signals  # noqa: F401
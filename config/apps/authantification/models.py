@@ -28,5 +28,10 @@ class User(AbstractUser):
         "username"
     ]  # Fields required when creating a superuser (username is removed)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=["date_joined", "id"]),
+        ]
+
     def __str__(self):
         return self.email
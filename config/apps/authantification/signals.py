@@ -0,0 +1,17 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from config.apps.Loan.cache import invalidate_list_cache
+
+from .models import Role, User
+
+
+@receiver([post_delete, post_save], sender=User)
+def handle_user_cache_clear(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_list_cache("user_list", [instance.pk]))
+
+
+@receiver([post_delete, post_save], sender=Role)
+def handle_role_cache_clear(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_list_cache("role_list", []))
@@ -4,14 +4,21 @@ from rest_framework import viewsets
 from.models import User,Role
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from config.apps.Loan.cache import STAFF_SCOPE, CachedListMixin
+from config.apps.Loan.ledger import LedgerProtectedDestroyMixin
 from config.apps.Loan.models import Loan,Wallet,WalletActivity
+from config.apps.Loan.pagination import UserPagination
 from config.apps.Loan.serializers import *
+from config.db_router import ReplicaReadMixin
 from rest_framework.permissions import IsAdminUser,IsAuthenticated
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 import django_filters.rest_framework
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(
+    CachedListMixin,
+    LedgerProtectedDestroyMixin,
+    ReplicaReadMixin,
+    viewsets.ModelViewSet,
+):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
@@ -21,12 +28,9 @@ class UserViewSet(viewsets.ModelViewSet):
     lookup_field = 'id'
     ordering = ['-date_joined']
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
-    
-    @method_decorator(
-        cache_page(60 * 15, key_prefix="user_list")
-    )  # Cache for 15 minutes
-    def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+    pagination_class = UserPagination
+    list_cache_prefix = "user_list"
+
     def get_queryset(self):
         if self.request.user.is_staff:
             return User.objects.all()
@@ -63,20 +67,18 @@ class UserViewSet(viewsets.ModelViewSet):
         })
 
 
-class RoleViewSet(viewsets.ModelViewSet):
+class RoleViewSet(CachedListMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Role.objects.all()
     serializer_class = RoleSerializer
     permission_classes=[IsAdminUser]
     lookup_field = 'id'
     ordering = ['id']
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
-    
-    @method_decorator(
-        cache_page(60 * 15, key_prefix="role_list")
-    )  # Cache for 15 minutes
-    def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
-    
+    list_cache_prefix = "role_list"
+
+    def get_list_cache_scope(self, request):
+        # Roles are not filtered per user, every admin shares one scope.
+        return f"{self.list_cache_prefix}:{STAFF_SCOPE}"
 
 
 # Custom View for verifying email
@@ -1,3 +1,5 @@
-from django.contrib import admin  # noqa: F401
+from django.contrib import admin
 
-# Register your models here.
+from .models import IndexOutbox
+
+admin.site.register(IndexOutbox)
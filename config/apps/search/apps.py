@@ -1,6 +1,15 @@
-from django.apps import AppConfig
+from django.apps import AppConfig, apps
 
 
 class SearchConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "config.apps.search"
+
+    def ready(self):
+        from .signals import OutboxSignalProcessor
+
+        self.signal_processor = OutboxSignalProcessor()
+        if apps.is_installed("django_elasticsearch_dsl"):
+            from .registry import configure_connections
+
+            configure_connections()
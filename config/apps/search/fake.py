@@ -0,0 +1,168 @@
+import json
+from collections import defaultdict
+from functools import cmp_to_key
+from types import SimpleNamespace
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def _sortable(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _compare(left, right):
+    left, right = _sortable(left), _sortable(right)
+    if left == right:
+        return 0
+    if left is None:
+        return 1
+    if right is None:
+        return -1
+    try:
+        return -1 if left < right else 1
+    except TypeError:
+        return -1 if str(left) < str(right) else 1
+
+
+class FakeElasticsearch:
+    """
+    In-memory stand-in for the Elasticsearch client, registered in place of
+    a connection so search views run without a cluster.
+
+    Documents are prepared by their search document exactly as they would be
+    indexed. ``search`` supports the queries the API builds: ``bool`` with
+    ``must`` and ``filter`` clauses of ``term``, ``terms``, ``range`` and
+    ``multi_match``, sorting, ``from``/``size``, ``search_after`` and
+    ``_source`` filtering. Anything else raises NotImplementedError.
+    """
+
+    def __init__(self):
+        self.indices = defaultdict(dict)
+
+    def index_documents(self, document, objects):
+        instance = document()
+        index = self.indices[document._index._name]
+        for obj in objects:
+            source = instance.prepare(obj)
+            index[str(obj.pk)] = json.loads(json.dumps(source, cls=DjangoJSONEncoder))
+
+    def search(self, index=None, body=None, **params):
+        body = {**(body or {}), **params}
+        names = index if isinstance(index, (list, tuple)) else [index]
+        hits = [
+            {"_index": name, "_id": pk, "_score": 1.0, "_source": source}
+            for name in names
+            for pk, source in self.indices[name].items()
+            if self._matches(body.get("query", {}), source)
+        ]
+
+        sort = [self._sort_key(spec) for spec in body.get("sort", [])]
+        for hit in hits:
+            hit["sort"] = [
+                hit["_score"] if field == "_score" else hit["_source"].get(field)
+                for field, _ in sort
+            ]
+
+        def order(left, right):
+            for position, (_, descending) in enumerate(sort):
+                result = _compare(left["sort"][position], right["sort"][position])
+                if result:
+                    return -result if descending else result
+            return 0
+
+        hits.sort(key=cmp_to_key(order))
+        total = len(hits)
+        if body.get("search_after"):
+            after = {"sort": body["search_after"]}
+            hits = [hit for hit in hits if order(hit, after) > 0]
+        start = body.get("from", 0)
+        page = hits[start : start + body.get("size", 10)]
+
+        fields = body.get("_source")
+        for hit in page:
+            if isinstance(fields, list):
+                hit["_source"] = {
+                    field: hit["_source"].get(field)
+                    for field in fields
+                    if field in hit["_source"]
+                }
+            if not sort:
+                del hit["sort"]
+        return SimpleNamespace(
+            body={
+                "took": 0,
+                "timed_out": False,
+                "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+                "hits": {
+                    "total": {"value": total, "relation": "eq"},
+                    "max_score": 1.0 if total else None,
+                    "hits": page,
+                },
+            }
+        )
+
+    @staticmethod
+    def _sort_key(spec):
+        if isinstance(spec, str):
+            return spec, spec == "_score"
+        ((field, order),) = spec.items()
+        if isinstance(order, dict):
+            order = order.get("order", "asc")
+        return field, order == "desc"
+
+    def _matches(self, query, source):
+        if not query or "match_all" in query:
+            return True
+        ((kind, clause),) = query.items()
+        if kind == "bool":
+            clauses = []
+            for occurrence in ("must", "filter"):
+                value = clause.get(occurrence, [])
+                clauses.extend(value if isinstance(value, list) else [value])
+            return all(self._matches(sub, source) for sub in clauses)
+        if kind == "term":
+            ((field, value),) = clause.items()
+            if isinstance(value, dict):
+                value = value["value"]
+            return _compare(source.get(field), value) == 0
+        if kind == "terms":
+            ((field, values),) = clause.items()
+            return any(_compare(source.get(field), value) == 0 for value in values)
+        if kind == "range":
+            ((field, bounds),) = clause.items()
+            value = source.get(field)
+            if value is None:
+                return False
+            checks = {
+                "gte": lambda result: result >= 0,
+                "gt": lambda result: result > 0,
+                "lte": lambda result: result <= 0,
+                "lt": lambda result: result < 0,
+            }
+            return all(
+                checks[op](_compare(value, bound)) for op, bound in bounds.items()
+            )
+        if kind == "multi_match":
+            terms = str(clause["query"]).lower().split()
+            text = " ".join(
+                str(source.get(field) or "") for field in clause.get("fields", [])
+            ).lower()
+            return any(term in text for term in terms)
+        raise NotImplementedError(f"The fake Elasticsearch has no {kind} query.")
+
+
+class FakeAsyncElasticsearch:
+    """
+    A FakeElasticsearch behind the interface of ``AsyncElasticsearch``.
+    """
+
+    def __init__(self, fake):
+        self.fake = fake
+
+    async def search(self, *args, **kwargs):
+        return self.fake.search(*args, **kwargs)
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from config.apps.search.outbox import drain, outbox_lag
+
+
+class Command(BaseCommand):
+    help = "Send pending search index changes to Elasticsearch in bulk batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Outbox entries per bulk request. Defaults to SEARCH_OUTBOX_BATCH_SIZE.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the outbox is empty.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once the outbox is drained instead of polling forever.",
+        )
+
+    def handle(self, *args, **options):
+        processed = drain(
+            batch_size=options["batch_size"],
+            poll_interval=options["poll_interval"],
+            once=options["once"],
+            stdout=self.stdout,
+        )
+        lag = outbox_lag()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed {processed} changes; {lag['pending']} pending, "
+                f"{lag['failed']} failed, lag {lag['lag_seconds']:.1f}s."
+            )
+        )
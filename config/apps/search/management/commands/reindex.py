@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from config.apps.search.reindex import CATCH_UP_FILTERS, get_document, rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild search indexes into fresh versioned indexes and swap their "
+        "aliases with no downtime."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "models",
+            nargs="*",
+            default=list(CATCH_UP_FILTERS),
+            help="Model labels to rebuild, e.g. Loan.Loan. Defaults to all documents.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of indexing processes.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows fetched and documents sent per bulk request.",
+        )
+        parser.add_argument(
+            "--range-size",
+            type=int,
+            default=100_000,
+            help="Primary key range handed to a worker at a time.",
+        )
+        parser.add_argument(
+            "--keep-old",
+            action="store_true",
+            help="Keep the indexes that the alias pointed to before.",
+        )
+
+    def handle(self, *args, **options):
+        for label in options["models"]:
+            try:
+                get_document(label)
+            except LookupError as exc:
+                raise CommandError(str(exc))
+
+        for label in options["models"]:
+            report = rebuild(
+                label,
+                workers=options["workers"],
+                chunk_size=options["chunk_size"],
+                range_size=options["range_size"],
+                keep_old=options["keep_old"],
+            )
+            elapsed = report["elapsed"]
+            rate = report["indexed"] / elapsed if elapsed else 0
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{label}: indexed {report['indexed']} documents into "
+                    f"{report['index']} in {elapsed:.2f}s ({rate:.0f} docs/s), "
+                    f"replaying {report['replayed']} changes."
+                )
+            )
@@ -1,3 +1,27 @@
-from django.db import models  # NOQA: F401
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 
-# Create your models here.
+
+class IndexOutbox(models.Model):
+    """
+    A pending change of an indexed model, written in the same transaction as
+    the change itself and drained into Elasticsearch by the outbox worker.
+    """
+
+    model = models.CharField(max_length=100)  # Model label, e.g. "Loan.loan"
+    object_id = models.BigIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+
+    class Meta:
+        verbose_name = _("Index outbox entry")
+        verbose_name_plural = _("Index outbox entries")
+        indexes = [
+            models.Index(fields=["available_at", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id} ({self.attempts} attempts)"
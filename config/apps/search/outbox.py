@@ -0,0 +1,252 @@
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+from .models import IndexOutbox
+from .registry import document_registry, index_alias
+
+
+def _setting(name, default):
+    return getattr(settings, f"SEARCH_OUTBOX_{name}", default)
+
+
+def enqueue(model, object_ids):
+    """
+    Record that the given objects changed and must be reindexed.
+
+    Runs in the caller's transaction, so the outbox only ever holds changes
+    that were committed. Duplicates are coalesced by the worker.
+    """
+    if not object_ids or not getattr(settings, "ELASTICSEARCH_DSL_AUTOSYNC", True):
+        return
+    label = model._meta.label
+    IndexOutbox.objects.bulk_create(
+        [
+            IndexOutbox(model=label, object_id=object_id)
+            for object_id in object_ids
+            if object_id is not None
+        ]
+    )
+
+
+def update_index(model, objects):
+    """
+    Queue a batch of model instances for reindexing in the search outbox.
+    Used by bulk code paths that bypass the post_save signal processor; call
+    it inside the writing transaction so the change and its outbox entries
+    commit together.
+    """
+    enqueue(model, [obj.pk for obj in objects])
+
+
+def _rebuilding_key(label):
+    return f"search_outbox:rebuilding:{label}"
+
+
+def begin_rebuild(model):
+    """
+    Keep the entries of ``model`` indexed from now on, for ``end_rebuild`` to
+    replay into the index that replaces the live one. Returns the high-water
+    mark of the outbox, the last entry the new index is loaded after.
+    """
+    cache.set(
+        _rebuilding_key(model._meta.label),
+        True,
+        timeout=_setting("REBUILD_TIMEOUT", 60 * 60 * 24),
+    )
+    return IndexOutbox.objects.aggregate(last=Max("id"))["last"] or 0
+
+
+def end_rebuild(model, high_water):
+    """
+    Replay every entry of ``model`` written after ``high_water``, deletes
+    included, now that the alias points to the rebuilt index.
+    """
+    cache.delete(_rebuilding_key(model._meta.label))
+    return IndexOutbox.objects.filter(
+        model=model._meta.label, id__gt=high_water
+    ).update(available_at=timezone.now())
+
+
+def outbox_lag(now=None):
+    """
+    Pending and dead entries, and the age in seconds of the oldest pending one.
+    """
+    now = now or timezone.now()
+    pending = IndexOutbox.objects.filter(attempts__lt=_setting("MAX_ATTEMPTS", 8))
+    stats = pending.aggregate(pending=Count("id"), oldest=Min("created_at"))
+    oldest = stats["oldest"]
+    return {
+        "pending": stats["pending"],
+        "failed": IndexOutbox.objects.count() - stats["pending"],
+        "lag_seconds": (now - oldest).total_seconds() if oldest else 0.0,
+    }
+
+
+def _build_actions(entries):
+    """
+    Coalesce outbox entries to one bulk action per document and object: the
+    current row is indexed, or deleted from the index if it no longer exists.
+    Returns the actions and, for each action key, the entries it settles.
+    """
+    object_ids = defaultdict(set)
+    settles = defaultdict(list)
+    for entry in entries:
+        object_ids[entry.model].add(entry.object_id)
+        settles[entry.model, entry.object_id].append(entry)
+
+    actions = []
+    for label, ids in object_ids.items():
+        model = apps.get_model(label)
+        objects = model._default_manager.in_bulk(ids)
+        for document_class in document_registry().get_documents([model]):
+            document = document_class()
+            for object_id in sorted(ids):
+                instance = objects.get(object_id)
+                if instance is None:
+                    action = {
+                        "_op_type": "delete",
+                        "_index": document._index._name,
+                        "_id": object_id,
+                    }
+                elif document.should_index_object(instance):
+                    action = document._prepare_action(instance, "index")
+                else:
+                    continue
+                actions.append(action)
+    return actions, settles
+
+
+def _failed_keys(errors, model_by_index):
+    """
+    Keys of the objects whose bulk item failed. A delete of a document that is
+    already missing from the index is not a failure. Items name the versioned
+    index behind the alias the document was sent to.
+    """
+    failed = {}
+    for error in errors:
+        op_type, item = next(iter(error.items()))
+        if op_type == "delete" and item.get("status") == 404:
+            continue
+        key = (model_by_index[index_alias(item["_index"])], int(item["_id"]))
+        failed[key] = str(item.get("error", item.get("status")))
+    return failed
+
+
+def _reschedule(failures, now):
+    """
+    Push failed entries back with exponential backoff, keeping the error.
+    """
+    base = _setting("BACKOFF_SECONDS", 2)
+    ceiling = _setting("MAX_BACKOFF_SECONDS", 600)
+    entries = []
+    for entry, error in failures:
+        entry.attempts += 1
+        entry.available_at = now + timedelta(
+            seconds=min(base * 2 ** (entry.attempts - 1), ceiling)
+        )
+        entry.last_error = error[:2000]
+        entries.append(entry)
+    IndexOutbox.objects.bulk_update(entries, ["attempts", "available_at", "last_error"])
+
+
+@transaction.atomic
+def process_batch(batch_size=None):
+    """
+    Claim up to ``batch_size`` due entries, send the coalesced changes through
+    the bulk API and drop the entries that were indexed. Failed entries are
+    retried with exponential backoff until ``SEARCH_OUTBOX_MAX_ATTEMPTS``.
+    Returns the number of claimed entries and of failed ones.
+
+    Entries are claimed with SKIP LOCKED, so several workers can drain the
+    outbox side by side.
+    """
+    # The client is only imported by the processes that index, on first use.
+    from django_elasticsearch_dsl.apps import DEDConfig
+    from elasticsearch import helpers
+    from elasticsearch.dsl.connections import connections
+    from elasticsearch.exceptions import TransportError
+
+    batch_size = batch_size or _setting("BATCH_SIZE", 500)
+    now = timezone.now()
+    entries = list(
+        IndexOutbox.objects.select_for_update(skip_locked=True)
+        .filter(available_at__lte=now, attempts__lt=_setting("MAX_ATTEMPTS", 8))
+        .order_by("id")[:batch_size]
+    )
+    if not entries:
+        return 0, 0
+
+    actions, settles = _build_actions(entries)
+    model_by_index = {
+        document._index._name: document.django.model._meta.label
+        for document in document_registry().get_documents()
+    }
+    failed = {}
+    if actions:
+        try:
+            _, errors = helpers.bulk(
+                connections.get_connection(),
+                actions,
+                chunk_size=batch_size,
+                raise_on_error=False,
+                refresh=DEDConfig.auto_refresh_enabled(),
+            )
+        except (TransportError, ConnectionError) as exc:
+            _reschedule([(entry, repr(exc)) for entry in entries], now)
+            return len(entries), len(entries)
+        failed = _failed_keys(errors, model_by_index)
+
+    # Entries of a model being rebuilt are kept, out of the way, until the
+    # rebuild replays them; if it never does they come due again on their own.
+    rebuilding = {
+        key.rsplit(":", 1)[1]
+        for key in cache.get_many(
+            [_rebuilding_key(label) for label in {entry.model for entry in entries}]
+        )
+    }
+    done = []
+    kept = []
+    failures = []
+    for key, key_entries in settles.items():
+        if key in failed:
+            failures.extend((entry, failed[key]) for entry in key_entries)
+        elif key[0] in rebuilding:
+            kept.extend(entry.id for entry in key_entries)
+        else:
+            done.extend(entry.id for entry in key_entries)
+    IndexOutbox.objects.filter(id__in=done).delete()
+    IndexOutbox.objects.filter(id__in=kept).update(
+        available_at=now + timedelta(seconds=_setting("REBUILD_TIMEOUT", 60 * 60 * 24))
+    )
+    if failures:
+        _reschedule(failures, now)
+    return len(entries), len(failures)
+
+
+def drain(batch_size=None, poll_interval=1.0, once=False, stdout=None):
+    """
+    Process outbox batches until it is empty (``once``) or forever.
+    """
+    processed = 0
+    while True:
+        started = time.perf_counter()
+        claimed, failed = process_batch(batch_size)
+        processed += claimed
+        if claimed and stdout is not None:
+            elapsed = time.perf_counter() - started
+            stdout.write(
+                f"Indexed {claimed - failed}/{claimed} changes in {elapsed:.2f}s, "
+                f"lag {outbox_lag()['lag_seconds']:.1f}s"
+            )
+        if not claimed:
+            if once:
+                return processed
+            time.sleep(poll_interval)
@@ -0,0 +1,75 @@
+import functools
+import re
+
+from django.apps import apps
+from django.conf import settings
+
+VERSION_SUFFIX = re.compile(r"-\d{14}$")
+
+
+def versioned_index_name(alias, at):
+    """
+    Name of an index built for ``alias`` at ``at``; the alias points at it
+    once it is loaded.
+    """
+    return f"{alias}-{at:%Y%m%d%H%M%S}"
+
+
+def index_alias(index_name):
+    """
+    The alias of a versioned index, as documents know it; other names are
+    returned unchanged.
+    """
+    return VERSION_SUFFIX.sub("", index_name)
+
+
+def configure_connections():
+    """
+    Configure the Elasticsearch connections from ``ELASTICSEARCH_DSL``,
+    timing every call for the metrics endpoint.
+
+    Each alias gets a sync client and an ``AsyncElasticsearch`` client for
+    the async views. Clients are created on first use, so the async one only
+    opens its connection pool in the event loop that queries it; the pool
+    holds a connection per concurrent search, or the pool would queue them.
+    """
+    from elasticsearch.dsl import async_connections
+    from elasticsearch.dsl.connections import connections
+
+    from .transport import TimedAsyncTransport, TimedTransport
+
+    connections.configure(
+        **{
+            alias: {"transport_class": TimedTransport, **config}
+            for alias, config in settings.ELASTICSEARCH_DSL.items()
+        }
+    )
+    async_connections.connections.configure(
+        **{
+            alias: {
+                "transport_class": TimedAsyncTransport,
+                "connections_per_node": settings.ASYNC_SEARCH_CONCURRENCY,
+                **config,
+            }
+            for alias, config in settings.ELASTICSEARCH_DSL.items()
+        }
+    )
+
+
+@functools.cache
+def document_registry():
+    """
+    The registry of search documents, with the Elasticsearch client loaded.
+
+    The api role installs django_elasticsearch_dsl, which discovers the
+    ``documents`` modules of every app when apps load. The worker and
+    migrate roles leave it out to boot without the client; there the first
+    caller, usually the outbox worker, discovers them instead.
+    """
+    from django_elasticsearch_dsl import autodiscover
+    from django_elasticsearch_dsl.registries import registry
+
+    if not apps.is_installed("django_elasticsearch_dsl"):
+        autodiscover()
+        configure_connections()
+    return registry
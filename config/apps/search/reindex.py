@@ -0,0 +1,167 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.db import connections as db_connections
+from django.db.models import Max, Min
+from django.utils import timezone
+from django_elasticsearch_dsl.apps import DEDConfig
+from elasticsearch import helpers
+from elasticsearch.dsl.connections import connections
+
+from .outbox import begin_rebuild, end_rebuild
+from .registry import configure_connections, document_registry, versioned_index_name
+
+# Settings applied while a fresh index is bulk loaded. Those of the live
+# index are restored before the alias is swapped to it.
+LOAD_SETTINGS = {"refresh_interval": "-1", "number_of_replicas": 0}
+
+
+def get_document(label):
+    for document in document_registry().get_documents():
+        if document.django.model._meta.label == label:
+            return document
+    raise LookupError(f"No search document is registered for {label}.")
+
+
+def pk_ranges(queryset, size):
+    """
+    Split a queryset into half-open primary key ranges of ``size`` ids.
+    """
+    bounds = queryset.aggregate(low=Min("pk"), high=Max("pk"))
+    if bounds["low"] is None:
+        return []
+    return [
+        (start, start + size)
+        for start in range(bounds["low"], bounds["high"] + 1, size)
+    ]
+
+
+def live_settings(client, alias, document):
+    """
+    The values of ``LOAD_SETTINGS`` to restore once an index is loaded: those
+    of the index behind ``alias``, else the configured ones, else None, which
+    resets a setting to the cluster default.
+    """
+    configured = {**DEDConfig.default_index_settings(), **document._index._settings}
+    restore = {key: configured.get(key) for key in LOAD_SETTINGS}
+    if client.indices.exists(index=alias):
+        for index in client.indices.get_settings(index=alias).values():
+            current = index["settings"]["index"]
+            restore.update(
+                {key: current[key] for key in LOAD_SETTINGS if key in current}
+            )
+    return restore
+
+
+def _init_worker():
+    # Forked workers must not share the parent's database or HTTP sockets.
+    db_connections.close_all()
+    configure_connections()
+
+
+def index_range(label, index_name, start, end, chunk_size):
+    """
+    Bulk index the rows of one primary key range into ``index_name``.
+    Rows are streamed with a server-side iterator. Returns the indexed count.
+    """
+    document = get_document(label)()
+    rows = (
+        document.get_queryset()
+        .filter(pk__gte=start, pk__lt=end)
+        .order_by("pk")
+        .iterator(chunk_size=chunk_size)
+    )
+
+    def actions():
+        for row in rows:
+            if document.should_index_object(row):
+                action = document._prepare_action(row, "index")
+                action["_index"] = index_name
+                yield action
+
+    indexed, _ = helpers.bulk(
+        connections.get_connection(), actions(), chunk_size=chunk_size
+    )
+    return indexed
+
+
+def rebuild(label, workers=4, chunk_size=2000, range_size=100_000, keep_old=False):
+    """
+    Build a fresh versioned index for a document and swap its alias to it.
+
+    The new index is created from the document mapping, loaded by a process
+    pool with refresh disabled and no replicas, switched back to the settings
+    of the live index, and then atomically takes over the alias. The changes
+    queued in the search outbox meanwhile, deletes included, are replayed
+    into it afterwards. Returns a report with the index name, the indexed
+    count and the elapsed time in seconds.
+    """
+    document = get_document(label)
+    model = document.django.model
+    alias = document._index._name
+    client = connections.get_connection()
+    started_at = timezone.now()
+    started = time.perf_counter()
+    restore = live_settings(client, alias, document)
+    high_water = begin_rebuild(model)
+
+    index_name = versioned_index_name(alias, started_at)
+    try:
+        index = document._index.clone(name=index_name)
+        index.settings(**LOAD_SETTINGS)
+        index.create(using=client)
+
+        ranges = pk_ranges(document().get_queryset(), range_size)
+        indexed = 0
+        if ranges:
+            db_connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_worker,
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        index_range, label, index_name, start, end, chunk_size
+                    )
+                    for start, end in ranges
+                ]
+                for future in as_completed(futures):
+                    indexed += future.result()
+
+        client.indices.put_settings(index=index_name, settings=restore)
+        client.indices.refresh(index=index_name)
+        old_indices = _swap_alias(client, alias, index_name)
+        if not keep_old:
+            for old_index in old_indices:
+                client.indices.delete(index=old_index)
+    finally:
+        replayed = end_rebuild(model, high_water)
+
+    return {
+        "index": index_name,
+        "indexed": indexed,
+        "replaced": old_indices,
+        "replayed": replayed,
+        "elapsed": time.perf_counter() - started,
+    }
+
+
+def _swap_alias(client, alias, index_name):
+    """
+    Point ``alias`` at ``index_name`` in one atomic update. A concrete index
+    still using the alias name, as created before versioned indexes, is
+    removed in the same request. Returns the indexes that were replaced.
+    """
+    actions = [{"add": {"index": index_name, "alias": alias}}]
+    replaced = []
+    if client.indices.exists_alias(name=alias):
+        replaced = list(client.indices.get_alias(name=alias))
+        actions = [
+            {"remove": {"index": old_index, "alias": alias}} for old_index in replaced
+        ] + actions
+    elif client.indices.exists(index=alias):
+        actions.insert(0, {"remove_index": {"index": alias}})
+    client.indices.update_aliases(actions=actions)
+    return replaced
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.db import models
+
+from .outbox import enqueue
+
+
+class OutboxSignalProcessor:
+    """
+    Record saves and deletes of indexed models in the outbox instead of
+    calling Elasticsearch inside the request. The outbox worker
+    (``process_search_outbox``) sends them in bulk.
+
+    Connected by the search app in every role. Indexed models are read from
+    ``SEARCH_INDEXED_MODELS`` rather than the document registry, so saving
+    a model never loads the Elasticsearch client.
+    """
+
+    def __init__(self):
+        self.setup()
+
+    def setup(self):
+        models.signals.post_save.connect(self.handle_save)
+        models.signals.post_delete.connect(self.handle_delete)
+
+    def teardown(self):
+        models.signals.post_save.disconnect(self.handle_save)
+        models.signals.post_delete.disconnect(self.handle_delete)
+
+    def handle_save(self, sender, instance, **kwargs):
+        if sender._meta.label in settings.SEARCH_INDEXED_MODELS:
+            enqueue(sender, [instance.pk])
+
+    def handle_delete(self, sender, instance, **kwargs):
+        # The worker deletes documents whose row no longer exists.
+        self.handle_save(sender, instance)
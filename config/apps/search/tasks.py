@@ -0,0 +1,11 @@
+from celery import shared_task
+
+from .outbox import drain
+
+
+@shared_task(ignore_result=True)
+def process_search_outbox(batch_size=None):
+    """
+    Drain the search outbox into Elasticsearch until it is empty.
+    """
+    return drain(batch_size=batch_size, once=True)
@@ -1,3 +1,203 @@
-from django.test import TestCase  # noqa: F401
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.test import TestCase, override_settings
+from elasticsearch.exceptions import ConnectionError
+
+from config.apps.authantification.models import User
+from config.apps.Loan.models import Loan, Wallet, WalletActivity
+
+from .models import IndexOutbox
+from .outbox import begin_rebuild, end_rebuild, outbox_lag, process_batch
+from .registry import document_registry
+from .reindex import _swap_alias, get_document, index_range, live_settings, pk_ranges
+
+
+@override_settings(
+    ELASTICSEARCH_DSL_AUTOSYNC=True, ELASTICSEARCH_DSL_AUTO_REFRESH=False
+)
+class IndexOutboxTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="outboxuser", email="outbox@example.com", password="password123"
+        )
+        self.wallet = Wallet.objects.create(user=self.user)
+        self.loan = Loan.objects.create(
+            client=self.user, amount=Decimal("100.00"), duration_months=1
+        )
+
+    def test_saves_are_queued_instead_of_indexed(self):
+        """Test a save writes an outbox entry and makes no Elasticsearch call."""
+        IndexOutbox.objects.all().delete()
+        with mock.patch("elasticsearch.helpers.bulk") as bulk:
+            self.loan.description = "Updated"
+            self.loan.save()
+        bulk.assert_not_called()
+        self.assertTrue(
+            IndexOutbox.objects.filter(model="Loan.Loan", object_id=self.loan.id)
+        )
+
+    def test_indexed_models_setting_matches_the_documents(self):
+        """Test the outbox signals cover exactly the models with a document."""
+        self.assertEqual(
+            sorted(settings.SEARCH_INDEXED_MODELS),
+            sorted(model._meta.label for model in document_registry().get_models()),
+        )
+
+    def test_worker_coalesces_entries_into_one_bulk_request(self):
+        """Test repeated changes of one object are sent as a single action."""
+        for _ in range(3):
+            self.loan.save()
+        with mock.patch("elasticsearch.helpers.bulk", return_value=(0, [])) as bulk:
+            claimed, failed = process_batch(batch_size=100)
+        self.assertEqual(bulk.call_count, 1)
+        actions = list(bulk.call_args.args[1])
+        loan_actions = [action for action in actions if action["_index"] == "loans"]
+        self.assertEqual(len(loan_actions), 1)
+        self.assertEqual(loan_actions[0]["_op_type"], "index")
+        self.assertEqual(failed, 0)
+        self.assertFalse(IndexOutbox.objects.exists())
+
+    def test_deleted_objects_are_removed_from_the_index(self):
+        """Test an entry whose row is gone becomes a delete action."""
+        loan_id = self.loan.id
+        self.loan.delete()
+        with mock.patch("elasticsearch.helpers.bulk", return_value=(0, [])) as bulk:
+            process_batch()
+        actions = [
+            action
+            for action in bulk.call_args.args[1]
+            if action["_index"] == "loans" and action["_id"] == loan_id
+        ]
+        self.assertEqual([action["_op_type"] for action in actions], ["delete"])
+
+    def test_failures_are_retried_with_backoff(self):
+        """Test a failed bulk request keeps the entries and delays them."""
+        pending = IndexOutbox.objects.count()
+        with mock.patch(
+            "elasticsearch.helpers.bulk",
+            side_effect=ConnectionError("down"),
+        ):
+            claimed, failed = process_batch()
+        self.assertEqual((claimed, failed), (pending, pending))
+        entry = IndexOutbox.objects.order_by("id").first()
+        self.assertEqual(entry.attempts, 1)
+        self.assertGreater(entry.available_at, entry.created_at)
+        self.assertEqual(process_batch(), (0, 0))
+        self.assertEqual(outbox_lag()["pending"], pending)
+
+    def test_failed_items_of_versioned_indexes_are_retried(self):
+        """Test a bulk error naming the index behind the alias is rescheduled."""
+        IndexOutbox.objects.all().delete()
+        self.loan.save()
+        error = {
+            "index": {
+                "_index": "loans-20240101000000",
+                "_id": str(self.loan.id),
+                "status": 429,
+                "error": "rejected",
+            }
+        }
+        with mock.patch("elasticsearch.helpers.bulk", return_value=(0, [error])):
+            self.assertEqual(process_batch(), (1, 1))
+        entry = IndexOutbox.objects.get()
+        self.assertEqual((entry.attempts, entry.last_error), (1, "rejected"))
+
+    def test_changes_during_a_rebuild_are_replayed(self):
+        """Test entries indexed while a rebuild runs are replayed after it."""
+        IndexOutbox.objects.all().delete()
+        high_water = begin_rebuild(Loan)
+        self.addCleanup(end_rebuild, Loan, high_water)
+        loan_id = self.loan.id
+        self.loan.delete()
+        with mock.patch("elasticsearch.helpers.bulk", return_value=(0, [])):
+            process_batch()
+        kept = IndexOutbox.objects.get(model="Loan.Loan", object_id=loan_id)
+        self.assertGreater(kept.id, high_water)
+        self.assertFalse(IndexOutbox.objects.exclude(model="Loan.Loan").exists())
+        with mock.patch("elasticsearch.helpers.bulk", return_value=(0, [])) as bulk:
+            self.assertEqual(process_batch(), (0, 0))
+
+        self.assertEqual(end_rebuild(Loan, high_water), 1)
+        with mock.patch("elasticsearch.helpers.bulk", return_value=(0, [])) as bulk:
+            self.assertEqual(process_batch(), (1, 0))
+        self.assertEqual(
+            [action["_op_type"] for action in bulk.call_args.args[1]], ["delete"]
+        )
+        self.assertFalse(IndexOutbox.objects.exists())
+
+    def test_bulk_paths_queue_their_objects(self):
+        """Test wallet credits queue the wallet and its new activity."""
+        IndexOutbox.objects.all().delete()
+        self.wallet.add_balance(Decimal("10.00"))
+        queued = set(IndexOutbox.objects.values_list("model", flat=True))
+        self.assertEqual(queued, {"Loan.Wallet", "Loan.WalletActivity"})
+        self.assertTrue(WalletActivity.objects.filter(wallet=self.wallet).exists())
+
+
+class ReindexTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="reindexuser", email="reindex@example.com", password="password123"
+        )
+        self.wallet = Wallet.objects.create(user=self.user)
+        WalletActivity.objects.bulk_create(
+            [WalletActivity.build(self.wallet, "add", Decimal(i)) for i in range(5)]
+        )
+
+    def test_pk_ranges_cover_every_row(self):
+        """Test primary key ranges are contiguous and cover the table."""
+        queryset = WalletActivity.objects.all()
+        ranges = pk_ranges(queryset, 2)
+        ids = list(queryset.values_list("pk", flat=True))
+        self.assertEqual(ranges[0][0], min(ids))
+        self.assertGreater(ranges[-1][1], max(ids))
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+        self.assertEqual(pk_ranges(Loan.objects.all(), 2), [])
+
+    def test_index_range_targets_the_versioned_index(self):
+        """Test a worker sends its range to the new index, not the alias."""
+        ids = sorted(WalletActivity.objects.values_list("pk", flat=True))
+        with mock.patch(
+            "config.apps.search.reindex.helpers.bulk", return_value=(3, [])
+        ) as bulk:
+            index_range("Loan.WalletActivity", "wallet_activities-1", ids[0], ids[3], 2)
+        actions = list(bulk.call_args.args[1])
+        self.assertEqual([action["_id"] for action in actions], ids[:3])
+        self.assertEqual(
+            {action["_index"] for action in actions}, {"wallet_activities-1"}
+        )
+        self.assertEqual(actions[0]["_source"]["amount"], Decimal(0))
+
+    def test_live_index_settings_are_restored(self):
+        """Test the loaded index gets the settings of the index it replaces."""
+        document = get_document("Loan.Loan")
+        client = mock.Mock()
+        client.indices.exists.return_value = True
+        client.indices.get_settings.return_value = {
+            "loans-1": {"settings": {"index": {"number_of_replicas": "0"}}}
+        }
+        self.assertEqual(
+            live_settings(client, "loans", document),
+            {"refresh_interval": None, "number_of_replicas": "0"},
+        )
+        client.indices.exists.return_value = False
+        self.assertEqual(
+            live_settings(client, "loans", document),
+            {"refresh_interval": None, "number_of_replicas": None},
+        )
+
+    def test_alias_swap_is_a_single_update(self):
+        """Test the old index leaves the alias in the same request."""
+        client = mock.Mock()
+        client.indices.exists_alias.return_value = True
+        client.indices.get_alias.return_value = {"loans-1": {}}
+        self.assertEqual(_swap_alias(client, "loans", "loans-2"), ["loans-1"])
+        client.indices.update_aliases.assert_called_once_with(
+            actions=[
+                {"remove": {"index": "loans-1", "alias": "loans"}},
+                {"add": {"index": "loans-2", "alias": "loans"}},
+            ]
+        )
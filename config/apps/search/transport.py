@@ -0,0 +1,25 @@
+from elastic_transport import AsyncTransport, Transport
+
+from config.apps.Loan.metrics import timed
+
+
+class TimedTransport(Transport):
+    """
+    Transport that adds the time of every Elasticsearch call to the metrics
+    of the request being served.
+    """
+
+    def perform_request(self, *args, **kwargs):
+        with timed("es"):
+            return super().perform_request(*args, **kwargs)
+
+
+class TimedAsyncTransport(AsyncTransport):
+    """
+    ``TimedTransport`` for the ``AsyncElasticsearch`` client of the async
+    views.
+    """
+
+    async def perform_request(self, *args, **kwargs):
+        with timed("es"):
+            return await super().perform_request(*args, **kwargs)
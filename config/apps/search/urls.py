@@ -6,4 +6,5 @@ from . import views
 
 urlpatterns = [
     path("create-index/", views.create_index, name="create_index"),
+    path("outbox/", views.outbox_status, name="outbox_status"),
 ]
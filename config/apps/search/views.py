@@ -1,5 +1,7 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.http import JsonResponse
 
+from .outbox import outbox_lag
 from .utils.elasticsearch_client import create_index_with_mappings
 
 # Create your views here.
@@ -17,3 +19,11 @@ def create_index(request):
         )
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
+
+
+@staff_member_required
+def outbox_status(request):
+    """
+    Indexing lag: pending and failed outbox entries and the oldest age.
+    """
+    return JsonResponse(outbox_lag())
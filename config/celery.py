@@ -0,0 +1,74 @@
+import logging
+import os
+import time
+
+from celery import Celery, Task
+from celery.signals import task_postrun, task_prerun
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.django.development")
+
+app = Celery("config")
+app.config_from_object("django.conf:settings", namespace="CELERY")
+app.autodiscover_tasks()
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TIMEOUT = 60 * 60 * 24
+
+
+class IdempotentTask(Task):
+    """
+    Task that runs at most once per ``idempotency_key`` keyword argument.
+
+    The key is claimed in the cache before running, for no longer than the
+    task's time limit, and marked done for a day once the task succeeds. A
+    delivery that finds the key done is skipped; one that finds it claimed
+    is retried after the claim lapses, so a task whose worker died is run
+    again rather than dropped. The claim is released if the task fails so it
+    can be retried.
+    """
+
+    time_limit = 60 * 30
+
+    def __call__(self, *args, idempotency_key=None, **kwargs):
+        if idempotency_key is None:
+            return super().__call__(*args, **kwargs)
+
+        from django.core.cache import cache
+
+        cache_key = f"task_idempotency:{self.name}:{idempotency_key}"
+        if not cache.add(cache_key, "running", timeout=self.time_limit):
+            if cache.get(cache_key) == "done":
+                logger.info(
+                    "Skipping %s, key %s already done", self.name, idempotency_key
+                )
+                return None
+            raise self.retry(countdown=self.time_limit)
+        try:
+            result = super().__call__(*args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+        cache.set(cache_key, "done", timeout=IDEMPOTENCY_TIMEOUT)
+        return result
+
+
+_task_started = {}
+
+
+@task_prerun.connect
+def _start_task_timer(task_id, task, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _record_task_timing(task_id, task, state, **kwargs):
+    started_at = _task_started.pop(task_id, None)
+    if started_at is None:
+        return
+    elapsed = time.perf_counter() - started_at
+    logger.info("Task %s[%s] %s in %.3fs", task.name, task_id, state, elapsed)
+
+    from config.apps.Loan.cache import record_task_timing
+
+    record_task_timing(task.name, state, elapsed)
@@ -0,0 +1,87 @@
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+_read_from = ContextVar("read_database", default=None)
+
+
+class ReplicaRouter:
+    """
+    Send reads to the replica while a ``ReplicaReadMixin`` view is serving a
+    read-only action; everything else, writes included, uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_from.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+def replica_configured():
+    return getattr(settings, "DATABASE_REPLICA_ALIAS", None) in settings.DATABASES
+
+
+def _pin_key(user):
+    return f"replica_pin:{user.pk}"
+
+
+class ReplicaReadMixin:
+    """
+    Serve the read-only actions of a viewset from the read replica.
+
+    A user who just wrote is pinned to the primary for
+    ``DATABASE_REPLICA_PIN_SECONDS`` so their next reads see the change.
+    Without a replica configured this is a no-op.
+    """
+
+    replica_actions = ("list", "retrieve")
+
+    def use_replica(self, request):
+        return (
+            replica_configured()
+            and request.method in SAFE_METHODS
+            and self.action in self.replica_actions
+            and not (
+                request.user.is_authenticated and cache.get(_pin_key(request.user))
+            )
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        # Reset here rather than in finalize_response, which an exception
+        # the view does not handle skips.
+        self._replica_token = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self._replica_token is not None:
+                _read_from.reset(self._replica_token)
+                self._replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.use_replica(request):
+            self._replica_token = _read_from.set(settings.DATABASE_REPLICA_ALIAS)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (
+            self._replica_token is None
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and replica_configured()
+            and request.user.is_authenticated
+        ):
+            cache.set(
+                _pin_key(request.user),
+                1,
+                getattr(settings, "DATABASE_REPLICA_PIN_SECONDS", 5),
+            )
+        return super().finalize_response(request, response, *args, **kwargs)
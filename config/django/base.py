@@ -1,10 +1,13 @@
 import os
 from datetime import timedelta
+from django.core.exceptions import ImproperlyConfigured
 from django.utils.translation import gettext_lazy as _
 from config.env import BASE_DIR, env
 from config.settings.cache_redis import *  # noqa
 from config.settings.celery import *  # noqa
+from config.settings.concurrency import *  # noqa
 from config.settings.cors import *  # noqa
+from config.settings.metrics import *  # noqa
 
 # from config.settings.sentry import *  # noqa
 from config.settings.sessions import *  # noqa
@@ -13,8 +16,32 @@ from config.settings.silk import *  # noqa
 env.read_env(os.path.join(BASE_DIR, ".env"))
 
 # Application definition
+# Each process loads the apps of its role, from DJANGO_APP_ROLE: "api" serves
+# HTTP, "worker" runs Celery and management commands, "migrate" applies
+# migrations. Every role installs every app with models; the others only
+# serve HTTP and would just slow the boot of workers down.
+DJANGO_APP_ROLE = env.str("DJANGO_APP_ROLE", default="api")
+APP_ROLES = ("api", "worker", "migrate")
+if DJANGO_APP_ROLE not in APP_ROLES:
+    raise ImproperlyConfigured(f"DJANGO_APP_ROLE must be one of {', '.join(APP_ROLES)}.")
+
+API_ONLY_APPS = [
+    "django.contrib.staticfiles",
+    "rest_framework",
+    "django_filters",
+    "django_elasticsearch_dsl",
+    "dj_rest_auth",
+    "dj_rest_auth.registration",
+    "corsheaders",
+    "drf_spectacular",
+    "drf_spectacular_sidecar",
+]
 INSTALLED_APPS = [
-    "django.contrib.admin",
+    # Without the api role the admin is kept for its models only; its
+    # admin.py modules are not discovered.
+    "django.contrib.admin"
+    if DJANGO_APP_ROLE == "api"
+    else "django.contrib.admin.apps.SimpleAdminConfig",
     "django.contrib.auth",
     "django.contrib.contenttypes",
     "django.contrib.sessions",
@@ -24,6 +51,8 @@ INSTALLED_APPS = [
     "django_filters",
     "rest_framework.authtoken",
     "silk",
+    # Must stay before config.apps.search, whose ready() configures the
+    # connections after it.
     "django_elasticsearch_dsl",
     "django.contrib.sites",
     "dj_rest_auth",
@@ -32,17 +61,21 @@ INSTALLED_APPS = [
     "allauth.account",
     "allauth.socialaccount",
     "dj_rest_auth.registration",
-    "django_extensions",
-    "django",
     "config.apps.Loan",
     "corsheaders",
     "drf_spectacular",
     "drf_spectacular_sidecar",
     "config.apps.search",
 ]
+if DJANGO_APP_ROLE != "api":
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in API_ONLY_APPS]
+if DJANGO_APP_ROLE == "worker":
+    INSTALLED_APPS.remove("silk")
 SITE_ID = 1
 
 MIDDLEWARE = [
+    "config.apps.Loan.metrics.MetricsMiddleware",
+    "config.profiling.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     'django.middleware.locale.LocaleMiddleware',
@@ -51,13 +84,23 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "silk.middleware.SilkyMiddleware",
+    "config.profiling.SilkMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "allauth.account.middleware.AccountMiddleware",
  
 ]
+if DJANGO_APP_ROLE != "api":
+    MIDDLEWARE = [
+        middleware
+        for middleware in MIDDLEWARE
+        if middleware
+        not in ("config.profiling.SilkMiddleware", "corsheaders.middleware.CorsMiddleware")
+    ]
 
 ROOT_URLCONF = "config.urls"
+if DJANGO_APP_ROLE != "api":
+    # Nothing is served, so system checks need not import every view.
+    ROOT_URLCONF = "config.worker_urls"
 
 TEMPLATES = [
     {
@@ -193,11 +236,6 @@ ACCOUNT_EMAIL_REQUIRED = False
 ACCOUNT_EMAIL_VERIFICATION = "optional"
 ACCOUNT_LOGIN_METHODS = {'username', 'email'}
 
-SILKY_AUTHENTICATION = True  # Enables authentication for Silk views
-SILKY_AUTHORISATION = True  # Enables authorization for Silk views
-SILKY_META = True  # Logs meta details about requests
-SILKY_PYTHON_PROFILER = True  # Enables Python profiling
-SILKY_MAX_RECORDED_REQUESTS = 1000  # Limit on the number of requests to store
 
 
 # Elasticsearch settings
@@ -211,6 +249,19 @@ ELASTICSEARCH_DSL = {
     },
 }
 
+# Saves only write to the search outbox; process_search_outbox indexes them.
+# The outbox signals are connected by the search app in every role, so
+# django_elasticsearch_dsl's own processor is the no-op base one. The indexed
+# models are listed here so saving one never loads the search documents.
+ELASTICSEARCH_DSL_SIGNAL_PROCESSOR = "django_elasticsearch_dsl.signals.BaseSignalProcessor"
+SEARCH_INDEXED_MODELS = ["Loan.Loan", "Loan.Wallet", "Loan.WalletActivity"]
+SEARCH_OUTBOX_BATCH_SIZE = 500
+SEARCH_OUTBOX_MAX_ATTEMPTS = 8
+SEARCH_OUTBOX_BACKOFF_SECONDS = 2
+SEARCH_OUTBOX_MAX_BACKOFF_SECONDS = 600
+# Longest a rebuild keeps the changes it replays into the new index.
+SEARCH_OUTBOX_REBUILD_TIMEOUT = 60 * 60 * 24
+
 
 
 # If you want to use a different cache backend, you can modify this settings accordingly.
@@ -12,6 +12,9 @@ SECRET_KEY = env(
 DEBUG = env.bool("DJANGO_DEBUG", default=True)
 ALLOWED_HOSTS = env.list("ALLOWED_HOSTS", default=["*"])
 
+# Shell helpers are only installed for local development.
+INSTALLED_APPS = [*INSTALLED_APPS, "django_extensions"]
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
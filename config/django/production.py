@@ -2,6 +2,9 @@ from config.env import env
 
 from .base import *  # noqa: F401
 
+# PostgreSQL with persistent connections and optional replica routing.
+from config.settings.database import *  # noqa  # isort: skip
+
 # SECURITY WARNING: keep the secret key used in production secret!
 
 SECRET_KEY = env(
@@ -12,13 +15,6 @@ SECRET_KEY = env(
 DEBUG = env.bool("DJANGO_DEBUG", default=False)
 ALLOWED_HOSTS = env.list("ALLOWED_HOSTS", default=["*"])
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "loans.sqlite3",
-    }
-}
-
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_HOST = "smtp.gmail.com"
 EMAIL_PORT = 587
@@ -0,0 +1,39 @@
+from config.env import env
+
+from .base import *  # noqa: F401
+
+# Settings for the test suite and the benchmark_api command: no Redis,
+# Elasticsearch or SMTP server is needed, and nothing is profiled so the
+# measured requests only pay for the application itself.
+
+SECRET_KEY = "django-insecure-test-settings-only"
+DEBUG = False
+ALLOWED_HOSTS = ["*"]
+
+DATABASES = {
+    "default": env.db(
+        "DATABASE_URL", default=f"sqlite:///{BASE_DIR / 'loans-test.sqlite3'}"
+    ),
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+
+CELERY_TASK_ALWAYS_EAGER = True
+CELERY_BROKER_URL = "memory://"
+CELERY_RESULT_BACKEND = "cache+memory://"
+
+ELASTICSEARCH_DSL_AUTOSYNC = False
+ELASTICSEARCH_DSL_AUTO_REFRESH = False
+
+SILKY_INTERCEPT_PERCENT = 0
+SILKY_PYTHON_PROFILER = False
+SILKY_META = False
+PROFILE_SAMPLE_RATE = 0
+PROFILE_SLOW_REQUEST_MS = 0
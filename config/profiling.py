@@ -0,0 +1,256 @@
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.utils import timezone
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_SALT = "config.profiling"
+CURSOR_KEY = "profiles:cursor"
+
+
+def sign_profile_header():
+    """
+    A value for the ``X-Profile`` header, valid for ``PROFILE_HEADER_MAX_AGE``
+    seconds. Only holders of the SECRET_KEY can mint one.
+    """
+    return signing.TimestampSigner(salt=PROFILE_SALT).sign("profile")
+
+
+def profile_requested(request):
+    """
+    Whether a request carries a valid, unexpired signed ``X-Profile`` header.
+    """
+    header = request.headers.get(PROFILE_HEADER)
+    if not header:
+        return False
+    try:
+        signing.TimestampSigner(salt=PROFILE_SALT).unsign(
+            header, max_age=settings.PROFILE_HEADER_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def should_record(request):
+    """
+    Whether Silk records a request: those asking to be profiled and a
+    ``SILKY_INTERCEPT_PERCENT`` sample of the others.
+    """
+    if profile_requested(request):
+        return True
+    return random.random() * 100 < settings.SILKY_INTERCEPT_PERCENT
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}.{code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """
+    Background thread that samples, every ``PROFILE_INTERVAL_MS``, the stack
+    of each thread serving a profiled request.
+
+    Unlike cProfile nothing runs inside the profiled code, so a request pays
+    the same whether it is sampled or not; the cost is the sampling thread
+    taking the GIL for a moment per tick. A thread can be armed with a delay,
+    in which case it is only sampled once the delay has passed, and a tick
+    with no thread due reads no stacks. Stacks are keyed by thread, so it
+    profiles sync workers, one request per thread.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = {}
+        self.thread = None
+
+    def start(self, ident, delay=0):
+        """
+        Sample the stacks of thread ``ident``, from ``delay`` seconds on.
+        """
+        with self.lock:
+            self.active[ident] = (time.monotonic() + delay, Counter())
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name="stack-sampler", daemon=True
+                )
+                self.thread.start()
+
+    def stop(self, ident):
+        with self.lock:
+            _, stacks = self.active.pop(ident, (None, Counter()))
+        return stacks
+
+    def run(self):
+        while True:
+            time.sleep(settings.PROFILE_INTERVAL_MS / 1000)
+            now = time.monotonic()
+            with self.lock:
+                idents = [
+                    ident for ident, (due, _) in self.active.items() if due <= now
+                ]
+            if not idents:
+                continue
+            frames = sys._current_frames()
+            stacks = {
+                ident: _collapse(frames[ident]) for ident in idents if ident in frames
+            }
+            del frames
+            with self.lock:
+                for ident, stack in stacks.items():
+                    if ident in self.active:
+                        self.active[ident][1][stack] += 1
+
+
+sampler = StackSampler()
+
+
+def _slot(profile_id):
+    return profile_id % settings.SILKY_MAX_RECORDED_REQUESTS
+
+
+def store_profile(summary, stacks):
+    """
+    Keep a captured profile in the ring buffer shared by every worker.
+
+    The buffer has ``SILKY_MAX_RECORDED_REQUESTS`` slots; each profile takes
+    the next one, overwriting the oldest. Returns the id of the profile.
+    """
+    try:
+        profile_id = cache.incr(CURSOR_KEY)
+    except ValueError:
+        cache.add(CURSOR_KEY, 0, timeout=None)
+        profile_id = cache.incr(CURSOR_KEY)
+    slot = _slot(profile_id)
+    cache.set_many(
+        {
+            f"profiles:{slot}": {**summary, "id": profile_id},
+            f"profiles:{slot}:stacks": (profile_id, dict(stacks)),
+        },
+        timeout=None,
+    )
+    return profile_id
+
+
+def recent_profiles():
+    """
+    Summaries of the profiles still in the ring buffer, newest first.
+    """
+    keys = [f"profiles:{slot}" for slot in range(settings.SILKY_MAX_RECORDED_REQUESTS)]
+    profiles = cache.get_many(keys).values()
+    return sorted(profiles, key=lambda profile: profile["id"], reverse=True)
+
+
+def collapsed_stacks(profile_id):
+    """
+    A profile as collapsed stacks, one ``frame;frame;frame count`` line per
+    distinct stack, as read by flamegraph.pl and speedscope. Returns None
+    once the profile has been evicted.
+    """
+    stored = cache.get(f"profiles:{_slot(profile_id)}:stacks")
+    if stored is None or stored[0] != profile_id:
+        return None
+    stacks = stored[1]
+    return "".join(
+        f"{stack} {count}\n"
+        for stack, count in sorted(stacks.items(), key=lambda item: -item[1])
+    )
+
+
+class ProfilingMiddleware:
+    """
+    Sample the stacks of a request when it is one of every
+    ``PROFILE_SAMPLE_RATE`` requests, carries a signed ``X-Profile`` header,
+    or turns out slower than ``PROFILE_SLOW_REQUEST_MS``.
+
+    With a threshold set, the other requests are armed to be sampled from the
+    moment they pass it, so a fast request is never sampled and a slow one
+    keeps the stacks of the time past the threshold. Stacks are keyed
+    by thread, which says nothing about a request sharing the event loop with
+    hundreds of others, so under ASGI requests pass through unprofiled.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def reason(self, request):
+        if profile_requested(request):
+            return "header"
+        rate = settings.PROFILE_SAMPLE_RATE
+        if rate and random.randrange(rate) == 0:
+            return "sample"
+        return None
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.get_response(request)
+        reason = self.reason(request)
+        threshold = settings.PROFILE_SLOW_REQUEST_MS
+        if reason is None and not threshold:
+            return self.get_response(request)
+
+        ident = threading.get_ident()
+        sampler.start(ident, delay=0 if reason else threshold / 1000)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            stacks = sampler.stop(ident)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        if reason is None and elapsed_ms >= threshold:
+            reason = "slow"
+        if reason is not None:
+            match = request.resolver_match
+            store_profile(
+                {
+                    "method": request.method,
+                    "path": request.path,
+                    "view": match.view_name if match else None,
+                    "status": response.status_code,
+                    "elapsed_ms": round(elapsed_ms, 3),
+                    "reason": reason,
+                    "samples": sum(stacks.values()),
+                    "captured_at": timezone.now().isoformat(),
+                },
+                stacks,
+            )
+        return response
+
+
+class SilkMiddleware:
+    """
+    Silk, which only runs synchronously, in the sync middleware chain.
+
+    Under ASGI, Silk would make Django serve every request through
+    ``sync_to_async`` in a single thread, so requests skip it there. Silk
+    still records the requests of the WSGI workers.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __new__(cls, get_response):
+        if iscoroutinefunction(get_response):
+            return get_response
+        from silk.middleware import SilkyMiddleware
+
+        return SilkyMiddleware(get_response)
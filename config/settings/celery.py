@@ -0,0 +1,55 @@
+from celery.schedules import crontab
+from kombu import Queue
+
+from config.env import env
+
+CELERY_BROKER_URL = env("CELERY_BROKER_URL", default="redis://redis:6379/0")
+CELERY_RESULT_BACKEND = env("CELERY_RESULT_BACKEND", default="redis://redis:6379/2")
+CELERY_TIMEZONE = "UTC"
+CELERY_TASK_SERIALIZER = "json"
+CELERY_RESULT_SERIALIZER = "json"
+CELERY_ACCEPT_CONTENT = ["json"]
+CELERY_RESULT_EXPIRES = 60 * 60 * 24
+
+# Tasks are acknowledged once they finish, so a crashed worker hands them to
+# another one; every task is safe to run twice (see IdempotentTask).
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+CELERY_TASK_DEFAULT_QUEUE = "default"
+CELERY_TASK_QUEUES = [
+    Queue("default"),
+    Queue("indexing"),
+    Queue("repayments"),
+]
+# Exact task names take precedence over the glob patterns: bulk approvals are
+# user facing and must not wait behind the nightly repayment runs.
+CELERY_TASK_ROUTES = {
+    "config.apps.Loan.tasks.approve_loans": {"queue": "default"},
+    "config.apps.search.tasks.*": {"queue": "indexing"},
+    "config.apps.Loan.tasks.*": {"queue": "repayments"},
+}
+
+CELERY_BEAT_SCHEDULE = {
+    "process-search-outbox": {
+        "task": "config.apps.search.tasks.process_search_outbox",
+        "schedule": 5.0,
+    },
+    "sweep-loan-statuses": {
+        "task": "config.apps.Loan.tasks.sweep_loan_statuses",
+        "schedule": crontab(hour=0, minute=30),
+    },
+    "settle-due-installments": {
+        "task": "config.apps.Loan.tasks.settle_due_installments",
+        "schedule": crontab(hour=1, minute=0),
+    },
+    "ensure-activity-partitions": {
+        "task": "config.apps.Loan.tasks.ensure_activity_partitions",
+        "schedule": crontab(day_of_month=1, hour=0, minute=0),
+    },
+    "take-balance-snapshots": {
+        "task": "config.apps.Loan.tasks.take_balance_snapshots",
+        "schedule": crontab(hour=0, minute=15),
+    },
+}
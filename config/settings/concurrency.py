@@ -0,0 +1,16 @@
+from config.env import env
+
+# The async endpoints under /async/ are served by uvicorn workers, each
+# running many requests on one event loop. Per worker, at most
+# ASYNC_SEARCH_CONCURRENCY Elasticsearch queries and ASYNC_DB_CONCURRENCY
+# database calls run at once; each ORM call holds a thread and a database
+# connection while it runs. Requests wait up to ASYNC_QUEUE_TIMEOUT seconds
+# for a slot, then get a 503.
+ASYNC_SEARCH_CONCURRENCY = env.int("ASYNC_SEARCH_CONCURRENCY", default=200)
+ASYNC_DB_CONCURRENCY = env.int("ASYNC_DB_CONCURRENCY", default=20)
+ASYNC_QUEUE_TIMEOUT = env.float("ASYNC_QUEUE_TIMEOUT", default=5.0)
+
+# Token lookups of the async endpoints are cached so a search needs no
+# database round trip. Deleted tokens are dropped from the cache at once;
+# a deactivated user keeps access for at most this long.
+ASYNC_AUTH_CACHE_SECONDS = env.int("ASYNC_AUTH_CACHE_SECONDS", default=60)
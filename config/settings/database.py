@@ -0,0 +1,45 @@
+from config.env import env
+
+# PostgreSQL, configured from DATABASE_URL and an optional DATABASE_REPLICA_URL.
+# Connections are kept open across requests and checked before reuse, so
+# each worker holds one connection instead of reconnecting per request.
+DATABASE_CONN_MAX_AGE = env.int("DATABASE_CONN_MAX_AGE", default=600)
+
+# Behind pgbouncer in transaction pooling mode a connection may change
+# backend between transactions: named server-side cursors do not survive
+# that, and startup options such as statement_timeout are rejected.
+DATABASE_PGBOUNCER = env.bool("DATABASE_PGBOUNCER", default=False)
+DATABASE_STATEMENT_TIMEOUT = env.int("DATABASE_STATEMENT_TIMEOUT", default=30_000)
+
+# Reads of a user are served by the primary for this long after they wrote,
+# so they never miss their own changes while the replica catches up.
+DATABASE_REPLICA_ALIAS = "replica"
+DATABASE_REPLICA_PIN_SECONDS = env.int("DATABASE_REPLICA_PIN_SECONDS", default=5)
+
+
+def database(url):
+    config = env.db_url_config(url)
+    config.update(
+        CONN_MAX_AGE=DATABASE_CONN_MAX_AGE,
+        CONN_HEALTH_CHECKS=True,
+        DISABLE_SERVER_SIDE_CURSORS=DATABASE_PGBOUNCER,
+        OPTIONS={"connect_timeout": env.int("DATABASE_CONNECT_TIMEOUT", default=5)},
+    )
+    if not DATABASE_PGBOUNCER:
+        config["OPTIONS"][
+            "options"
+        ] = f"-c statement_timeout={DATABASE_STATEMENT_TIMEOUT}"
+    return config
+
+
+DATABASES = {
+    "default": database(
+        env("DATABASE_URL", default="postgres://loans:loans@db:5432/loans")
+    ),
+}
+DATABASE_ROUTERS = []
+
+if env("DATABASE_REPLICA_URL", default=None):
+    DATABASES[DATABASE_REPLICA_ALIAS] = database(env("DATABASE_REPLICA_URL"))
+    DATABASES[DATABASE_REPLICA_ALIAS]["TEST"] = {"MIRROR": "default"}
+    DATABASE_ROUTERS = ["config.db_router.ReplicaRouter"]
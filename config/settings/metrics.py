@@ -0,0 +1,10 @@
+from config.env import env
+
+# Request metrics are counted in each worker and added to the shared cache
+# at most every METRICS_FLUSH_SECONDS, so a request never waits on Redis for
+# its own bookkeeping. /metrics flushes the serving worker before reading.
+METRICS_FLUSH_SECONDS = env.float("METRICS_FLUSH_SECONDS", default=10.0)
+
+# Prometheus scrapes /metrics with "Authorization: Bearer <METRICS_TOKEN>";
+# staff users can read it from a logged in session.
+METRICS_TOKEN = env.str("METRICS_TOKEN", default="")
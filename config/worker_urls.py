@@ -0,0 +1,2 @@
+# URLconf of the worker and migrate roles, which serve no HTTP requests.
+urlpatterns = []
@@ -9,6 +9,11 @@ server {
         alias /vol/media/;
     }
 
+    location /async/ {
+        proxy_pass http://${ASYNC_APP_HOST}:${ASYNC_APP_PORT};
+        include    /etc/nginx/proxy_params;
+    }
+
     location / {
         proxy_pass http://${APP_HOST}:${APP_PORT};
         include    /etc/nginx/proxy_params;